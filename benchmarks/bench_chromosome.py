@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for decoding sequence out of a Chromosome.
+
+Usage:
+    python benchmarks/bench_chromosome.py
+"""
+
+import timeit
+
+import numpy as np
+
+from locuspocus import Chromosome
+
+
+def main(length=10_000_000):
+    rng = np.random.default_rng(42)
+    chrom = Chromosome("bench", rng.choice([1, 3, 5, 7], size=length).astype(np.uint8))
+    cases = [
+        ("single base", lambda: chrom[length // 2], 100_000),
+        ("10 kb slice", lambda: chrom[1_000_000 : 1_010_000 - 1], 1_000),
+        ("1 Mb slice", lambda: chrom[1_000_000 : 2_000_000 - 1], 50),
+        (
+            "1 Mb slice (array)",
+            lambda: chrom.fetch(1_000_000, 2_000_000 - 1, output="array"),
+            50,
+        ),
+    ]
+    for label, fn, number in cases:
+        seconds = timeit.timeit(fn, number=number) / number
+        print(f"{label:<20} {seconds * 1e6:>12.2f} us")
+
+
+if __name__ == "__main__":
+    main()
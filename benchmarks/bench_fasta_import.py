@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for importing a FASTA file, serially and with worker processes.
+
+Usage:
+    python benchmarks/bench_fasta_import.py
+"""
+
+import os
+import tempfile
+import time
+
+import minus80 as m80
+import numpy as np
+
+from locuspocus import Fasta
+
+
+def main(n_chroms=8, length=2_000_000):
+    rng = np.random.default_rng(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        fasta_file = os.path.join(tmp, "bench.fa")
+        with open(fasta_file, "w") as OUT:
+            for i in range(n_chroms):
+                seq = rng.choice(list("ACGTNacgt"), length)
+                OUT.write(f">chr{i}\n")
+                for start in range(0, length, 60):
+                    OUT.write("".join(seq[start : start + 60]) + "\n")
+        for processes in (None, 2, 4):
+            if m80.exists("Fasta", "bench_import"):
+                m80.delete("Fasta", "bench_import")
+            start = time.perf_counter()
+            Fasta.from_file("bench_import", fasta_file, processes=processes)
+            seconds = time.perf_counter() - start
+            print(f"processes={str(processes):<6} {seconds:>10.2f} s")
+        m80.delete("Fasta", "bench_import")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,21 @@
 __version__ = "1.1.0"
 
-__all__ = ["Locus", "RefLoci", "Fasta", "Chromosome", "Loci", "Term", "Ontology"]
+__all__ = [
+    "Locus",
+    "RefLoci",
+    "Fasta",
+    "SharedFasta",
+    "Chromosome",
+    "Loci",
+    "Term",
+    "Ontology",
+]
 
 import logging
 
 from .chromosome import Chromosome
 from .fasta import Fasta
+from .shared import SharedFasta
 
 from .locus import Locus
 from .loci import Loci
@@ -0,0 +1,246 @@
+"""
+Random access into BGZF (bgzip) compressed files.
+
+A BGZF file is a series of gzip members (blocks) each holding at
+most 64 KiB of uncompressed data, so it can be read by any gzip
+reader. The .gzi index (written by `bgzip -i`) maps the compressed
+offset of each block to the uncompressed offset of its first byte:
+
+    uint64 n
+    (uint64 compressed offset, uint64 uncompressed offset) * n
+
+all little endian. The first block (0,0) is implied and not stored.
+"""
+
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from collections import OrderedDict
+
+__all__ = ["read_gzi", "write_gzi", "build_gzi", "BgzfReader", "BgzfWriter"]
+
+# The largest uncompressed payload bgzip puts in a block
+MAX_BLOCK_SIZE = 0xFF00
+
+# The empty block that marks the end of a BGZF file
+EOF_BLOCK = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+_GZIP_MAGIC = b"\x1f\x8b\x08\x04"
+
+
+def read_gzi(gzi_file):
+    """
+    Read a .gzi index
+
+    Returns
+    -------
+    An (n,2) uint64 array of (compressed, uncompressed) block
+    offsets, including the implied first block
+    """
+    with open(gzi_file, "rb") as IN:
+        (n,) = struct.unpack("<Q", IN.read(8))
+        entries = np.frombuffer(IN.read(16 * n), dtype="<u8").reshape(-1, 2)
+    return np.vstack(([[0, 0]], entries)).astype(np.uint64)
+
+
+def write_gzi(index, gzi_file):
+    """
+    Write a block index (see `read_gzi`) to a .gzi file
+    """
+    entries = np.asarray(index, dtype="<u8").reshape(-1, 2)[1:]
+    with open(gzi_file, "wb") as OUT:
+        OUT.write(struct.pack("<Q", len(entries)))
+        OUT.write(entries.tobytes())
+
+
+def _block_header(handle, coffset):
+    """
+    Read the header of the block at a compressed offset.
+
+    Returns
+    -------
+    (header length, total block size), (0,0) at the end of the file
+
+    Raises
+    ------
+    `ValueError` if the file is not BGZF compressed
+    """
+    header = os.pread(handle.fileno(), 12, coffset)
+    if len(header) == 0:
+        return 0, 0
+    if header[:4] != _GZIP_MAGIC:
+        raise ValueError("File is not BGZF compressed (try bgzip)")
+    (xlen,) = struct.unpack("<H", header[10:12])
+    extra = os.pread(handle.fileno(), xlen, coffset + 12)
+    # Walk the extra subfields looking for BC (the block size)
+    i = 0
+    while i + 4 <= len(extra):
+        slen = struct.unpack("<H", extra[i + 2 : i + 4])[0]
+        if extra[i : i + 2] == b"BC" and slen == 2:
+            return 12 + xlen, struct.unpack("<H", extra[i + 4 : i + 6])[0] + 1
+        i += 4 + slen
+    raise ValueError("File is not BGZF compressed (try bgzip)")
+
+
+def build_gzi(filename):
+    """
+    Build the block index of a BGZF file by walking the block
+    headers, only the sizes at the end of each block are read.
+
+    Returns
+    -------
+    An (n,2) uint64 array, see `read_gzi`
+    """
+    index = []
+    coffset, uoffset = 0, 0
+    with open(filename, "rb") as handle:
+        while True:
+            _, bsize = _block_header(handle, coffset)
+            if bsize == 0:
+                break
+            (isize,) = struct.unpack(
+                "<I", os.pread(handle.fileno(), 4, coffset + bsize - 4)
+            )
+            if isize > 0:
+                index.append((coffset, uoffset))
+            coffset += bsize
+            uoffset += isize
+    if len(index) == 0 or index[0][0] != 0:
+        index.insert(0, (0, 0))
+    return np.array(index, dtype=np.uint64).reshape(-1, 2)
+
+
+class BgzfReader(object):
+    """
+    Reads byte ranges (in uncompressed coordinates) out of a BGZF
+    file, only decompressing the blocks that overlap the range.
+    Recently used blocks are kept in a small cache.
+    """
+
+    def __init__(self, filename, gzi_file=None, cache_blocks=64):
+        """
+        Parameters
+        ----------
+        filename : str
+            The path to the BGZF file
+        gzi_file : str (default: None)
+            The path to the block index, defaults to filename + '.gzi'.
+            The index is built and written if it does not exist.
+        cache_blocks : int (default: 64)
+            The number of decompressed blocks (up to 64 KiB each)
+            to keep in memory
+        """
+        self.filename = str(filename)
+        self.gzi_file = self.filename + ".gzi" if gzi_file is None else str(gzi_file)
+        self._handle = open(self.filename, "rb")
+        if os.path.exists(self.gzi_file):
+            index = read_gzi(self.gzi_file)
+        else:
+            index = build_gzi(self.filename)
+            write_gzi(index, self.gzi_file)
+        self._coffsets = index[:, 0].astype(np.int64)
+        self._uoffsets = index[:, 1].astype(np.int64)
+        self.cache_blocks = cache_blocks
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _block(self, coffset):
+        """
+        Returns (decompressed block, compressed size of the block)
+        """
+        with self._lock:
+            if coffset in self._cache:
+                self._cache.move_to_end(coffset)
+                return self._cache[coffset]
+        hlen, bsize = _block_header(self._handle, coffset)
+        if bsize == 0:
+            return b"", 0
+        raw = os.pread(self._handle.fileno(), bsize - hlen - 8, coffset + hlen)
+        block = (zlib.decompress(raw, -15), bsize)
+        with self._lock:
+            self._cache[coffset] = block
+            while len(self._cache) > self.cache_blocks:
+                self._cache.popitem(last=False)
+        return block
+
+    def read(self, offset, size):
+        """
+        Read size bytes starting at an uncompressed offset
+        """
+        i = int(np.searchsorted(self._uoffsets, offset, side="right")) - 1
+        coffset = int(self._coffsets[i])
+        skip = offset - int(self._uoffsets[i])
+        chunks = []
+        while size > 0:
+            data, bsize = self._block(coffset)
+            if bsize == 0:
+                break
+            chunk = data[skip : skip + size]
+            chunks.append(chunk)
+            size -= len(chunk)
+            skip = max(0, skip - len(data))
+            coffset += bsize
+        return b"".join(chunks)
+
+    def close(self):
+        self._handle.close()
+
+
+class BgzfWriter(object):
+    """
+    Writes a BGZF compressed file while keeping track of
+    the block index (see `write_gzi`)
+    """
+
+    def __init__(self, filename, compresslevel=6):
+        self._handle = open(filename, "wb")
+        self.compresslevel = compresslevel
+        self._buffer = bytearray()
+        self._coffset = 0
+        self._uoffset = 0
+        self.index = []
+
+    def tell(self):
+        """
+        Returns the uncompressed offset of the next byte written
+        """
+        return self._uoffset + len(self._buffer)
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= MAX_BLOCK_SIZE:
+            self._write_block(bytes(self._buffer[:MAX_BLOCK_SIZE]))
+            del self._buffer[:MAX_BLOCK_SIZE]
+
+    def _write_block(self, data):
+        compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15)
+        cdata = compressor.compress(data) + compressor.flush()
+        bsize = 18 + len(cdata) + 8
+        header = _GZIP_MAGIC + struct.pack(
+            "<IBBHBBHH", 0, 0, 0xFF, 6, 66, 67, 2, bsize - 1
+        )
+        self._handle.write(header)
+        self._handle.write(cdata)
+        self._handle.write(struct.pack("<II", zlib.crc32(data), len(data)))
+        self.index.append((self._coffset, self._uoffset))
+        self._coffset += bsize
+        self._uoffset += len(data)
+
+    def close(self):
+        if len(self._buffer) > 0:
+            self._write_block(bytes(self._buffer))
+            self._buffer.clear()
+        self._handle.write(EOF_BLOCK)
+        self._handle.close()
+        if len(self.index) == 0:
+            self.index.append((0, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,22 +1,17 @@
 import reprlib
 import numpy as np
 
-from enum import Enum
-
-
-class Nucleotide(Enum):
-    A = 1
-    a = 2
-    C = 3
-    c = 4
-    G = 5
-    g = 6
-    T = 7
-    t = 8
-    U = 9
-    u = 10
-    N = 11
-    n = 12
+from .codec import (
+    Nucleotide,
+    SEQ_DTYPE,
+    DECODE_TABLE,
+    DIGESTS,
+    encode,
+    decode,
+    decode_bytes,
+    digest,
+)
+from .motifs import kmer_counts, find_motif
 
 
 class Chromosome(object):
@@ -40,34 +35,114 @@ class Chromosome(object):
 
     def __init__(self, name, seq, *args):
         self.name = name
-        # create the enumeration
+        # create the enumeration, stored as one byte per base
         if isinstance(seq, np.ndarray):
+            self.seq = seq.astype(SEQ_DTYPE, copy=False)
+        elif hasattr(seq, "__array__"):
+            # Lazy sequences (e.g. read from an indexed file) are kept as is
             self.seq = seq
         else:
-            self.seq = np.array([Nucleotide[x].value for x in seq])
+            self.seq = encode(seq)
         self._attrs = list(args)
+        # Sequence digests, filled in when computed or when loaded
+        # from a Fasta, see `digest`
+        self._digests = {}
 
     def __getitem__(self, pos):
         if isinstance(pos, slice):
-            if pos.start < 1:
-                raise ValueError("Genetic coordinates cannot start less than 1")
-            return "".join(
-                [Nucleotide(x).name for x in self.seq[max(0, pos.start - 1) : pos.stop]]
-            )
+            start = 1 if pos.start is None else pos.start
+            return self.fetch(start, pos.stop)
         # chromosomes start at 1, python strings start at 0
         else:
             if pos < 1:
                 raise ValueError("Genetic coordinates cannot start less than 1")
-            return Nucleotide(self.seq[int(pos) - 1]).name
+            return chr(DECODE_TABLE[self.seq[int(pos) - 1]])
+
+    def fetch(self, start, end=None, output="str"):
+        """
+        Fetch the sequence between two (1 indexed, inclusive) positions.
+
+        Parameters
+        ----------
+        start : int
+            The start position
+        end : int (default: None)
+            The end position, defaults to the end of the chromosome
+        output : str (default: 'str')
+            The type of the returned sequence, one of:
+            'str' : a string
+            'bytes' : ASCII bytes
+            'array' : a numpy view of the encoded sequence (see Nucleotide)
+        """
+        if start < 1:
+            raise ValueError("Genetic coordinates cannot start less than 1")
+        codes = self.seq[start - 1 : end]
+        if output == "str":
+            return decode(codes)
+        elif output == "bytes":
+            return decode_bytes(codes)
+        elif output == "array":
+            return codes
+        else:
+            raise ValueError("output must be one of: 'str','bytes','array'")
 
     def __len__(self):
         return len(self.seq)
 
+    def digest(self, kind="sha512t24u"):
+        """
+        Returns a digest of the (upper case) sequence, computed
+        once per chromosome.
+
+        Parameters
+        ----------
+        kind : str (default: 'sha512t24u')
+            One of 'md5' or 'sha512t24u' (the refget digest)
+        """
+        if kind not in DIGESTS:
+            raise ValueError(f"kind must be one of {DIGESTS}")
+        if kind not in self._digests:
+            self._digests.update(digest(self.seq))
+        return self._digests[kind]
+
+    def kmer_counts(self, k, start=1, end=None, canonical=False):
+        """
+        Count the k-mers between two (1 indexed, inclusive) positions
+        without decoding the sequence, see `motifs.kmer_counts`
+
+        Returns
+        -------
+        An array of 4**k counts, see `motifs.kmer_labels`
+        """
+        return kmer_counts(self.fetch(start, end, output="array"), k, canonical)
+
+    def find_motif(self, motif, start=1, end=None, strand="both"):
+        """
+        Find the occurrences of an (IUPAC) motif between two (1 indexed,
+        inclusive) positions on one or both strands, see
+        `motifs.find_motif`
+
+        Returns
+        -------
+        (positions, strands): the (1 indexed) leftmost positions of
+        the hits and a '+'/'-' array
+        """
+        starts, strands = find_motif(
+            self.fetch(start, end, output="array"), motif, strand
+        )
+        return starts + start, strands
+
     def __repr__(self):
         return "Chromosome({})".format(reprlib.repr("".join(self[1:100])))
 
     def __eq__(self, obj):
-        if self.name == obj.name and all(self.seq == obj.seq):
-            return True
-        else:
+        if self.name != obj.name or len(self) != len(obj):
             return False
+        # Known digests (e.g. of chromosomes loaded from a Fasta) rule out
+        # different sequences without reading them. Digests ignore case, so
+        # equal digests still need the full comparison.
+        other_digests = getattr(obj, "_digests", {})
+        for kind, value in self._digests.items():
+            if other_digests.get(kind, value) != value:
+                return False
+        return np.array_equal(self.seq, obj.seq)
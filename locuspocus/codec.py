@@ -0,0 +1,385 @@
+"""
+Compact encodings for nucleotide sequences.
+
+Sequences are held in memory as one byte (uint8) per base using the
+values of the Nucleotide enumeration, which covers the IUPAC codes in
+upper and lower case and the gap characters '-' and '.'. For storage,
+sequences can also be packed into 2 bits per base (A,C,G,T) with the
+bases that do not fit into 2 bits (N, U, R, ...) and soft-masked
+(lowercase) bases kept aside as lists of runs.
+"""
+
+import base64
+import hashlib
+
+import numpy as np
+
+from enum import Enum
+from itertools import product
+
+__all__ = [
+    "Nucleotide",
+    "SEQ_DTYPE",
+    "encode",
+    "decode",
+    "decode_bytes",
+    "reverse_complement",
+    "translate",
+    "pack_2bit",
+    "unpack_2bit",
+    "DIGESTS",
+    "SequenceDigest",
+    "digest",
+]
+
+
+class Nucleotide(Enum):
+    A = 1
+    a = 2
+    C = 3
+    c = 4
+    G = 5
+    g = 6
+    T = 7
+    t = 8
+    U = 9
+    u = 10
+    N = 11
+    n = 12
+    # The remaining IUPAC ambiguity codes
+    R = 13
+    r = 14
+    Y = 15
+    y = 16
+    S = 17
+    s = 18
+    W = 19
+    w = 20
+    K = 21
+    k = 22
+    M = 23
+    m = 24
+    B = 25
+    b = 26
+    D = 27
+    d = 28
+    H = 29
+    h = 30
+    V = 31
+    v = 32
+    # Gaps have no lower case, their codes are odd like
+    # all upper case codes (see `is_lower`)
+    GAP = 33
+    DOT = 35
+
+    @property
+    def symbol(self):
+        """
+        The character of the nucleotide in a FASTA file
+        """
+        return _GAP_SYMBOLS.get(self.name, self.name)
+
+
+_GAP_SYMBOLS = {"GAP": "-", "DOT": "."}
+
+
+# The in memory dtype for encoded sequences
+SEQ_DTYPE = np.uint8
+
+# Lookup table mapping an ASCII byte to its code, 0 for invalid bytes
+ENCODE_LUT = np.zeros(256, dtype=SEQ_DTYPE)
+for _n in Nucleotide:
+    ENCODE_LUT[ord(_n.symbol)] = _n.value
+
+# Translation table (for bytes.translate) mapping a code to its ASCII byte
+DECODE_TABLE = bytearray(b"?" * 256)
+for _n in Nucleotide:
+    DECODE_TABLE[_n.value] = ord(_n.symbol)
+DECODE_TABLE = bytes(DECODE_TABLE)
+
+# Lookup table mapping a code to the code of its complement
+_COMPLEMENTS = dict(zip("ACGTURYSWKMBVDHN", "TGCAAYRSWMKVBHDN"))
+COMPLEMENT_LUT = np.zeros(256, dtype=SEQ_DTYPE)
+for _base, _comp in _COMPLEMENTS.items():
+    COMPLEMENT_LUT[Nucleotide[_base].value] = Nucleotide[_comp].value
+    COMPLEMENT_LUT[Nucleotide[_base.lower()].value] = Nucleotide[_comp.lower()].value
+for _n in (Nucleotide.GAP, Nucleotide.DOT):
+    COMPLEMENT_LUT[_n.value] = _n.value
+
+# Maps a code to its composition class: 0 for A/T/U/W (weak),
+# 1 for G/C/S (strong), 2 otherwise
+BASE_CLASS_LUT = np.full(256, 2, dtype=np.uint8)
+for _base in "ATUW":
+    BASE_CLASS_LUT[[Nucleotide[_base].value, Nucleotide[_base.lower()].value]] = 0
+for _base in "GCS":
+    BASE_CLASS_LUT[[Nucleotide[_base].value, Nucleotide[_base.lower()].value]] = 1
+
+# The standard genetic code (NCBI table 1), codons in TCAG order
+STANDARD_CODE = "FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"
+
+# Maps an upper case code to its index in a codon (A,C,G,T/U), 4 otherwise
+_CODON_INDEX = np.full(256, 4, dtype=np.uint8)
+for _i, _base in enumerate("ACGT"):
+    _CODON_INDEX[Nucleotide[_base].value] = _i
+    _CODON_INDEX[Nucleotide[_base.lower()].value] = _i
+_CODON_INDEX[Nucleotide.U.value] = _CODON_INDEX[Nucleotide.u.value] = 3
+
+# The upper case codes that can be packed into 2 bits, in 2 bit order
+_PACKABLE = np.array(
+    [Nucleotide.A.value, Nucleotide.C.value, Nucleotide.G.value, Nucleotide.T.value],
+    dtype=SEQ_DTYPE,
+)
+# Maps an upper case code to its 2 bit value (0 for codes that cannot be packed)
+_TO_2BIT = np.zeros(256, dtype=np.uint8)
+_TO_2BIT[_PACKABLE] = np.arange(4, dtype=np.uint8)
+
+
+def encode(seq) -> np.ndarray:
+    """
+    Encode a sequence into a code array with a single table lookup.
+
+    Parameters
+    ----------
+    seq : str, bytes, bytearray or iterable of single characters
+        The nucleotide sequence
+
+    Returns
+    -------
+    A uint8 array of codes (see Nucleotide)
+
+    Raises
+    ------
+    `KeyError` if the sequence contains an invalid character
+    """
+    if isinstance(seq, str):
+        seq = seq.encode("ascii", errors="replace")
+    elif not isinstance(seq, (bytes, bytearray, memoryview)):
+        seq = "".join(seq).encode("ascii", errors="replace")
+    codes = ENCODE_LUT[np.frombuffer(seq, dtype=np.uint8)]
+    if len(codes) > 0 and not codes.all():
+        bad = np.frombuffer(seq, dtype=np.uint8)[codes == 0]
+        raise KeyError(
+            f"Invalid nucleotide(s): {bytes(np.unique(bad)).decode(errors='replace')}"
+        )
+    return codes
+
+
+def decode_bytes(codes: np.ndarray) -> bytes:
+    """
+    Decode a code array into ASCII bytes in one vectorized step
+    """
+    return (
+        np.ascontiguousarray(codes, dtype=SEQ_DTYPE).tobytes().translate(DECODE_TABLE)
+    )
+
+
+def decode(codes: np.ndarray) -> str:
+    """
+    Decode a code array into a string in one vectorized step
+    """
+    return decode_bytes(codes).decode("ascii")
+
+
+def reverse_complement(codes: np.ndarray) -> np.ndarray:
+    """
+    Reverse complement an encoded sequence with a single table
+    lookup, soft-masking (case) is preserved.
+    """
+    return COMPLEMENT_LUT[np.asarray(codes, dtype=SEQ_DTYPE)[::-1]]
+
+
+def _codon_lut(genetic_code):
+    """
+    Returns a 65 entry lookup table mapping 16*b1 + 4*b2 + b3 (bases
+    in ACGT order) to an amino acid byte, codons containing any other
+    base are caught by the last entry, 'X'.
+    """
+    lut = np.full(65, ord("X"), dtype=np.uint8)
+    for aa, (b1, b2, b3) in zip(genetic_code, product("TCAG", repeat=3)):
+        lut[16 * "ACGT".index(b1) + 4 * "ACGT".index(b2) + "ACGT".index(b3)] = ord(aa)
+    return lut
+
+
+def _codon_index(codes: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Returns the codon table index of the codons starting at each
+    position in starts, see `translate`
+    """
+    bases = _CODON_INDEX[np.asarray(codes, dtype=SEQ_DTYPE)]
+    b1, b2, b3 = (bases[starts + i].astype(np.int64) for i in range(3))
+    index = 16 * b1 + 4 * b2 + b3
+    index[(b1 == 4) | (b2 == 4) | (b3 == 4)] = 64
+    return index
+
+
+def translate(codes: np.ndarray, genetic_code: str = STANDARD_CODE) -> str:
+    """
+    Translate an encoded sequence into a protein sequence with a
+    single table lookup over all of its codons. Trailing bases that
+    do not make a full codon are ignored.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        An encoded sequence (see Nucleotide)
+    genetic_code : str (default: the standard code)
+        The 64 amino acids of the genetic code, codons in TCAG
+        order (as in NCBI translation tables)
+
+    Returns
+    -------
+    The protein sequence, codons with ambiguous bases are 'X'
+    """
+    starts = np.arange(0, len(codes) - 2, 3)
+    return _codon_lut(genetic_code)[_codon_index(codes, starts)].tobytes().decode()
+
+
+# The sequence digests, computed over the upper case sequence
+DIGESTS = ("md5", "sha512t24u")
+
+
+class SequenceDigest(object):
+    """
+    Incrementally computes the digests (see DIGESTS) of an encoded
+    sequence. Sequences are normalized to upper case first, so
+    soft-masking does not change the digests. sha512t24u is the
+    refget (GA4GH) digest: the first 24 bytes of the SHA-512 digest
+    encoded as url safe base64.
+    """
+
+    def __init__(self):
+        self._md5 = hashlib.md5()
+        self._sha512 = hashlib.sha512()
+
+    def update(self, codes):
+        data = decode_bytes(codes).upper()
+        self._md5.update(data)
+        self._sha512.update(data)
+
+    def hexdigests(self):
+        """
+        Returns a dict of the digests, see DIGESTS
+        """
+        return {
+            "md5": self._md5.hexdigest(),
+            "sha512t24u": base64.urlsafe_b64encode(self._sha512.digest()[:24]).decode(
+                "ascii"
+            ),
+        }
+
+
+def digest(codes: np.ndarray, chunk_size: int = 2**22) -> dict:
+    """
+    Compute the digests of an encoded sequence, see SequenceDigest
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        An encoded sequence (see Nucleotide)
+    chunk_size : int (default: 4 MiB)
+        The number of bases normalized at a time
+
+    Returns
+    -------
+    A dict of the md5 and sha512t24u digests
+    """
+    digester = SequenceDigest()
+    for i in range(0, len(codes), chunk_size):
+        digester.update(codes[i : i + chunk_size])
+    return digester.hexdigests()
+
+
+def is_lower(codes: np.ndarray) -> np.ndarray:
+    # lowercase bases have even codes
+    return (codes % 2 == 0) & (codes > 0)
+
+
+def _runs(mask: np.ndarray) -> np.ndarray:
+    """
+    Returns a (n,2) array of [start,end) intervals where mask is True
+    """
+    edges = np.diff(np.concatenate(([False], mask, [False])).astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return np.column_stack((starts, ends)).astype(np.int64)
+
+
+def pack_2bit(codes: np.ndarray):
+    """
+    Pack an encoded sequence into 2 bits per base.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        An encoded sequence (see Nucleotide)
+
+    Returns
+    -------
+    A tuple containing:
+        packed : np.ndarray (uint8)
+            The sequence packed 4 bases per byte. Bases that
+            cannot be packed are stored as A.
+        exceptions : np.ndarray (int64, shape=(n,3))
+            Runs of bases that cannot be packed: [start,end,code),
+            where code is the upper case code of the run.
+        lower : np.ndarray (int64, shape=(n,2))
+            Runs of lower case (soft-masked) bases: [start,end)
+    """
+    codes = np.asarray(codes, dtype=SEQ_DTYPE)
+    lower = is_lower(codes)
+    upper = codes - lower.astype(SEQ_DTYPE)
+    # Find runs of bases that are not A,C,G or T, split runs when the code changes
+    unpackable = ~np.isin(upper, _PACKABLE)
+    exceptions = _runs(unpackable)
+    if len(exceptions) > 0:
+        change = np.flatnonzero(
+            unpackable[1:] & unpackable[:-1] & (upper[1:] != upper[:-1])
+        )
+        bounds = np.sort(
+            np.concatenate((exceptions[:, 0], exceptions[:, 1], change + 1, change + 1))
+        ).reshape(-1, 2)
+        exceptions = np.column_stack((bounds, upper[bounds[:, 0]])).astype(np.int64)
+    else:
+        exceptions = np.empty((0, 3), dtype=np.int64)
+    # Pack 4 bases per byte
+    twobit = _TO_2BIT[upper]
+    padded = np.zeros(-(-len(twobit) // 4) * 4, dtype=np.uint8)
+    padded[: len(twobit)] = twobit
+    padded = padded.reshape(-1, 4)
+    packed = (
+        (padded[:, 0] << 6) | (padded[:, 1] << 4) | (padded[:, 2] << 2) | padded[:, 3]
+    ).astype(np.uint8)
+    return packed, exceptions, _runs(lower)
+
+
+def unpack_2bit(
+    packed: np.ndarray, length: int, exceptions: np.ndarray, lower: np.ndarray
+) -> np.ndarray:
+    """
+    Unpack a sequence packed by `pack_2bit`
+
+    Parameters
+    ----------
+    packed : np.ndarray
+        The packed sequence
+    length : int
+        The number of bases in the sequence
+    exceptions : np.ndarray
+        The runs of bases that could not be packed
+    lower : np.ndarray
+        The runs of lower case bases
+
+    Returns
+    -------
+    The encoded sequence (see Nucleotide)
+    """
+    packed = np.asarray(packed, dtype=np.uint8)
+    twobit = np.empty((len(packed), 4), dtype=np.uint8)
+    for i, shift in enumerate((6, 4, 2, 0)):
+        twobit[:, i] = (packed >> shift) & 3
+    codes = _PACKABLE[twobit.reshape(-1)[:length]]
+    for start, end, code in exceptions:
+        codes[start:end] = code
+    for start, end in lower:
+        codes[start:end] += 1
+    return codes
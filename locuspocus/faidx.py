@@ -0,0 +1,272 @@
+"""
+Direct access to uncompressed or BGZF compressed FASTA files
+through a samtools compatible (.fai) index.
+
+Each line of a .fai index describes one sequence with 5 tab
+separated columns:
+
+    name    length    offset    linebases    linewidth
+
+where offset is the byte offset of the first base, linebases the
+number of bases per line and linewidth the number of bytes per
+line (including the newline). Together they allow the byte offset
+of any base to be calculated without reading the file. For BGZF
+compressed files the offsets are uncompressed offsets, which are
+mapped to compressed blocks with the .gzi index (see bgzf).
+"""
+
+import gzip
+import os
+import threading
+
+import numpy as np
+
+from collections import namedtuple
+
+from .bgzf import BgzfReader
+from .chromosome import Chromosome
+from .codec import SEQ_DTYPE, encode
+
+__all__ = ["FaiRecord", "build_fai", "read_fai", "write_fai", "IndexedFasta"]
+
+
+FaiRecord = namedtuple(
+    "FaiRecord", ["name", "length", "offset", "linebases", "linewidth"]
+)
+
+
+def _is_gzipped(filename):
+    with open(filename, "rb") as IN:
+        return IN.read(2) == b"\x1f\x8b"
+
+
+def build_fai(fasta_file):
+    """
+    Build the index records of a FASTA file.
+
+    Parameters
+    ----------
+    fasta_file : str
+        The path to the FASTA file, BGZF compressed files
+        are indexed by their uncompressed offsets
+
+    Returns
+    -------
+    A list of FaiRecords in file order
+
+    Raises
+    ------
+    `ValueError` if a sequence does not have a constant
+    line length (only its last line may be shorter)
+    """
+    records = []
+    opener = gzip.open if _is_gzipped(fasta_file) else open
+    with opener(fasta_file, "rb") as IN:
+        pos = 0
+        name = None
+        for line in IN:
+            if line.startswith(b">"):
+                if name is not None:
+                    records.append(
+                        FaiRecord(name, length, offset, linebases, linewidth)
+                    )
+                name = line[1:].split()[0].decode()
+                offset = pos + len(line)
+                length, linebases, linewidth = 0, 0, 0
+                # Set once a short (or empty) line is seen, it must be the last
+                short = False
+            else:
+                bases = len(line.rstrip(b"\r\n"))
+                if name is None:
+                    if bases > 0:
+                        raise ValueError(f"{fasta_file} does not start with a header")
+                elif bases > 0:
+                    if short or (linebases and bases > linebases):
+                        raise ValueError(
+                            f"'{name}' in {fasta_file} has lines of different lengths"
+                        )
+                    if not linebases:
+                        linebases, linewidth = bases, len(line)
+                    elif bases < linebases or len(line) != linewidth:
+                        short = True
+                    length += bases
+                else:
+                    short = True
+            pos += len(line)
+        if name is not None:
+            records.append(FaiRecord(name, length, offset, linebases, linewidth))
+    return records
+
+
+def write_fai(records, fai_file):
+    """
+    Write index records to a .fai file
+    """
+    with open(fai_file, "w") as OUT:
+        for record in records:
+            print(*record, sep="\t", file=OUT)
+
+
+def read_fai(fai_file):
+    """
+    Read the records of a .fai file
+    """
+    records = []
+    with open(fai_file) as IN:
+        for line in IN:
+            name, *fields = line.rstrip("\n").split("\t")[:5]
+            records.append(FaiRecord(name, *map(int, fields)))
+    return records
+
+
+class FaidxSequence(object):
+    """
+    An encoded sequence that is read from an indexed FASTA
+    file on demand. Slicing returns a uint8 code array (see
+    Nucleotide) just like the in memory sequence arrays, only
+    the bytes spanning the slice are read from disk.
+    """
+
+    def __init__(self, fasta, record):
+        self._fasta = fasta
+        self.record = record
+
+    def __len__(self):
+        return self.record.length
+
+    @property
+    def nbytes(self):
+        # Nothing is held in memory
+        return 0
+
+    def _file_offset(self, i):
+        """
+        The byte offset of the i-th (0 indexed) base
+        """
+        record = self.record
+        return (
+            record.offset
+            + (i // record.linebases) * record.linewidth
+            + i % record.linebases
+        )
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                raise ValueError("Only contiguous slices are supported")
+            if stop <= start:
+                return np.empty(0, dtype=SEQ_DTYPE)
+            start_offset = self._file_offset(start)
+            raw = self._fasta._read(
+                start_offset, self._file_offset(stop - 1) + 1 - start_offset
+            )
+            return encode(raw.translate(None, b"\r\n"))
+        i = int(item)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("sequence index out of range")
+        return encode(self._fasta._read(self._file_offset(i), 1))[0]
+
+    def __array__(self, dtype=None):
+        seq = self[:]
+        return seq if dtype is None else seq.astype(dtype)
+
+
+class IndexedFasta(object):
+    """
+    A read only Fasta that serves chromosomes directly out of a
+    FASTA file using its .fai index. Nothing is imported, sequences
+    are read from the file as they are sliced. BGZF (bgzip)
+    compressed files are also supported, only the compressed
+    blocks overlapping a slice are decompressed.
+
+    >>> from locuspocus import Fasta
+    >>> x = Fasta.from_indexed_file('example.fa')
+    >>> x['chr1'][1000:2000]
+    """
+
+    def __init__(
+        self, fasta_file, fai_file=None, rebuild=False, gzi_file=None, cache_blocks=64
+    ):
+        """
+        Parameters
+        ----------
+        fasta_file : str
+            The path to an uncompressed or BGZF compressed FASTA file
+        fai_file : str (default: None)
+            The path to the index, defaults to fasta_file + '.fai'
+        rebuild : bool (default: False)
+            Rebuild the index even if it already exists. A missing
+            index is always built.
+        gzi_file : str (default: None)
+            BGZF only, the path to the block index, defaults to
+            fasta_file + '.gzi'. Built if it does not exist.
+        cache_blocks : int (default: 64)
+            BGZF only, the number of decompressed blocks to cache
+        """
+        self.fasta_file = str(fasta_file)
+        self.fai_file = self.fasta_file + ".fai" if fai_file is None else str(fai_file)
+        # Open the file first, non BGZF gzip files fail before being indexed
+        if _is_gzipped(self.fasta_file):
+            self._bgzf = BgzfReader(
+                self.fasta_file, gzi_file=gzi_file, cache_blocks=cache_blocks
+            )
+            self._handle = None
+        else:
+            self._bgzf = None
+            self._handle = open(self.fasta_file, "rb")
+        self._lock = threading.Lock()
+        if rebuild or not os.path.exists(self.fai_file):
+            write_fai(build_fai(self.fasta_file), self.fai_file)
+        self._records = {r.name: r for r in read_fai(self.fai_file)}
+
+    def _read(self, offset, size):
+        if self._bgzf is not None:
+            return self._bgzf.read(offset, size)
+        if hasattr(os, "pread"):
+            return os.pread(self._handle.fileno(), size, offset)
+        with self._lock:  # pragma: no cover
+            self._handle.seek(offset)
+            return self._handle.read(size)
+
+    def close(self):
+        if self._bgzf is not None:
+            self._bgzf.close()
+        else:
+            self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def chrom_names(self):
+        """
+        Returns an iterable of chromosome names in file order
+        """
+        return iter(self._records)
+
+    def __iter__(self):
+        for name in self._records:
+            yield self[name]
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, obj):
+        if isinstance(obj, Chromosome):
+            obj = obj.name
+        return obj in self._records
+
+    def __getitem__(self, chrom_name):
+        try:
+            record = self._records[chrom_name]
+        except KeyError:
+            raise ValueError(f"{chrom_name} not in {self.fasta_file}")
+        return Chromosome(chrom_name, FaidxSequence(self, record))
+
+    def __repr__(self):  # pragma: nocover
+        return f"IndexedFasta('{self.fasta_file}')"
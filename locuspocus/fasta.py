@@ -1,15 +1,503 @@
+import bz2
+import gzip
 import logging
+import lzma
+import mmap
+import os
 import re
 import reprlib
 import pprint
+import queue
+import threading
 
 import numpy as np
+import pandas as pd
 
 from minus80 import Freezable
-from minus80.RawFile import RawFile
-from collections import defaultdict
-from functools import lru_cache
+from collections import OrderedDict, defaultdict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from .chromosome import Chromosome
+from .bgzf import BgzfWriter, write_gzi
+from .codec import (
+    BASE_CLASS_LUT,
+    COMPLEMENT_LUT,
+    DECODE_TABLE,
+    DIGESTS,
+    SEQ_DTYPE,
+    STANDARD_CODE,
+    _codon_index,
+    _codon_lut,
+    _runs,
+    Nucleotide,
+    decode,
+    decode_bytes,
+    digest,
+    encode,
+    is_lower,
+    pack_2bit,
+    unpack_2bit,
+    SequenceDigest,
+)
+from .faidx import FaiRecord, IndexedFasta, write_fai
+from .loci import Loci, LocusView
+from .motifs import find_motif, kmer_counts
+from .locus import Locus
+
+
+def _open_binary(filename):
+    """
+    Open a (possibly compressed) file for reading bytes
+    """
+    filename = str(filename)
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rb")
+    elif filename.endswith("bz2"):
+        return bz2.open(filename, "rb")
+    elif filename.endswith("xz"):
+        return lzma.open(filename, "rb")
+    else:
+        return open(filename, "rb")
+
+
+CacheInfo = namedtuple(
+    "CacheInfo", ["hits", "misses", "maxbytes", "maxsize", "currbytes", "currsize"]
+)
+
+
+class _ChromosomeCache:
+    """
+    A least recently used cache of Chromosome objects bounded by
+    the total number of sequence bytes and optionally by the
+    number of chromosomes.
+    """
+
+    def __init__(self, maxbytes, maxsize=None):
+        self.maxbytes = maxbytes
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            chrom = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return chrom
+
+    def put(self, key, chrom):
+        nbytes = chrom.seq.nbytes
+        # Chromosomes larger than the cache are never stored
+        if self.maxbytes is not None and nbytes > self.maxbytes:
+            return
+        if key in self._data:
+            self._bytes -= self._data.pop(key).seq.nbytes
+        self._data[key] = chrom
+        self._bytes += nbytes
+        while (self.maxbytes is not None and self._bytes > self.maxbytes) or (
+            self.maxsize is not None and len(self._data) > self.maxsize
+        ):
+            _, evicted = self._data.popitem(last=False)
+            self._bytes -= evicted.seq.nbytes
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def info(self):
+        return CacheInfo(
+            self.hits,
+            self.misses,
+            self.maxbytes,
+            self.maxsize,
+            self._bytes,
+            len(self._data),
+        )
+
+
+def _gather(seq, starts, ends, minus):
+    """
+    Gather many intervals of an encoded sequence with a single fancy
+    index, intervals flagged in minus are reverse complemented.
+
+    Parameters
+    ----------
+    seq : np.ndarray
+        The encoded sequence
+    starts, ends : np.ndarray
+        0 indexed, half open intervals
+    minus : np.ndarray (bool)
+        The intervals to reverse complement
+
+    Returns
+    -------
+    (codes, offsets) where interval i is codes[offsets[i]:offsets[i+1]]
+    """
+    lengths = np.maximum(ends - starts, 0)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    # Position of each gathered base within its interval
+    within = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    rev = np.repeat(minus, lengths)
+    index = np.where(
+        rev,
+        np.repeat(ends - 1, lengths) - within,
+        np.repeat(starts, lengths) + within,
+    )
+    codes = seq[index]
+    codes[rev] = COMPLEMENT_LUT[codes[rev]]
+    return codes, offsets
+
+
+def _is_compressed(filename):
+    return str(filename).endswith((".gz", "bz2", "xz"))
+
+
+def _fasta_records(fasta_file):
+    """
+    Split a FASTA file into records without parsing the sequences
+
+    Yields
+    ------
+    (header, job) tuples where job is the (filename, start, end) byte
+    range of the sequence lines, or for compressed files (which cannot
+    be seeked) the raw sequence lines themselves. See `_encode_record`.
+    """
+    if _is_compressed(fasta_file):
+        with _open_binary(fasta_file) as IN:
+            header, lines = None, []
+            for line in IN:
+                if line.startswith(b">"):
+                    if header is not None:
+                        yield header, b"".join(lines)
+                    header, lines = line[1:].decode(), []
+                else:
+                    lines.append(line)
+            if header is not None:
+                yield header, b"".join(lines)
+        return
+    if os.path.getsize(fasta_file) == 0:
+        return
+    with open(fasta_file, "rb") as IN, mmap.mmap(
+        IN.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        starts = [m.start() for m in re.finditer(rb"^>", mm, re.M)]
+        for start, end in zip(starts, starts[1:] + [len(mm)]):
+            header_end = mm.find(b"\n", start, end)
+            header_end = end if header_end == -1 else header_end
+            yield mm[start + 1 : header_end].decode(), (
+                str(fasta_file),
+                header_end + 1,
+                end,
+            )
+
+
+def _stream_fasta(IN, chunk_size):
+    """
+    Read a FASTA file in blocks
+
+    Yields
+    ------
+    (header, None) for each header line and (None, data) for the
+    pieces of sequence that follow it. Sequence is passed on as soon
+    as it is read, so pieces may end within a line and are never
+    larger than chunk_size, even for unwrapped (single line) records.
+    Only header lines are put back together across blocks.
+    """
+    # The header read so far, while in the middle of a header line
+    header = None
+    line_start = True
+    while True:
+        block = IN.read(chunk_size)
+        if not block:
+            if header is not None:
+                yield header.decode(), None
+            break
+        pos = 0
+        while pos < len(block):
+            if header is not None:
+                end = block.find(b"\n", pos)
+                if end == -1:
+                    header += block[pos:]
+                    break
+                header += block[pos:end]
+                yield header.decode(), None
+                header = None
+                line_start = True
+                pos = end + 1
+            elif line_start and block.startswith(b">", pos):
+                header = bytearray()
+                line_start = False
+                pos += 1
+            else:
+                end = block.find(b"\n>", pos)
+                end = len(block) if end == -1 else end + 1
+                yield None, block[pos:end]
+                line_start = block[end - 1] == ord("\n")
+                pos = end
+
+
+def _encode_record(job, summarize=False):
+    """
+    Encode the sequence lines of a FASTA record, run in worker processes.
+    With summarize, the summary of the sequence (see `_summarize`) is
+    computed as well and (codes, summary) is returned.
+    """
+    if isinstance(job, tuple):
+        fasta_file, start, end = job
+        with open(fasta_file, "rb") as IN:
+            IN.seek(start)
+            job = IN.read(max(0, end - start))
+    elif isinstance(job, str):
+        job = job.encode()
+    codes = encode(job.translate(None, b" \t\r\n"))
+    if summarize:
+        return codes, _summarize(codes)
+    return codes
+
+
+def _chr_variants(name):
+    """
+    Returns the 'chr' prefix variants of a chromosome name
+    """
+    base = name[3:] if name[:3].lower() == "chr" else name
+    if base == "":
+        return []
+    return [x for x in (base, f"chr{base}", f"Chr{base}", f"CHR{base}") if x != name]
+
+
+def _separated(seq, starts, ends):
+    """
+    Gather intervals of an encoded sequence (see `_gather`) with an
+    invalid code (0) between them, so that no k-mer or motif hit
+    spans two intervals
+
+    Returns
+    -------
+    (codes, starts) where starts are the offsets of the intervals
+    """
+    codes, offsets = _gather(seq, starts, ends, np.zeros(len(starts), dtype=bool))
+    codes = np.insert(codes, offsets[1:-1], 0)
+    return codes, offsets[:-1] + np.arange(len(starts))
+
+
+def _group_loci(loci):
+    """
+    Group loci by chromosome
+
+    Returns
+    -------
+    A dict mapping each chromosome to a list of
+    (input position, locus, start, end, is minus strand)
+    tuples, chromosomes in the order they first appear
+    """
+    groups = defaultdict(list)
+    if isinstance(loci, Loci):
+        # Read the coordinates in one query instead of one per LocusView
+        rows = loci.m80.db.cursor().execute(
+            "SELECT LID, chromosome, start, end, strand FROM loci ORDER BY LID"
+        )
+        for i, (LID, chrom, start, end, strand) in enumerate(rows):
+            groups[chrom].append((i, LocusView(LID, loci), start, end, strand == "-"))
+    else:
+        for i, locus in enumerate(loci):
+            groups[locus.chromosome].append(
+                (i, locus, locus.start, locus.end, locus.strand == "-")
+            )
+    return groups
+
+
+def _base_counts(codes):
+    """
+    Returns the AT, GC, N and lower case counts of an encoded sequence
+    """
+    codes = np.asarray(codes, dtype=SEQ_DTYPE)
+    classes = np.bincount(BASE_CLASS_LUT[codes], minlength=3)
+    return np.append(classes, np.count_nonzero(is_lower(codes))).astype(np.int64)
+
+
+def _interval_counts(seq, starts, ends):
+    """
+    Count the composition classes of many (short) intervals of an
+    encoded sequence with one gather
+
+    Returns
+    -------
+    An (n,4) array of AT, GC, N and lower case counts
+    """
+    n = len(starts)
+    lengths = ends - starts
+    ids = np.repeat(np.arange(n), lengths)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    codes = seq[np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])]
+    classes = np.bincount(ids * 3 + BASE_CLASS_LUT[codes], minlength=3 * n)
+    lower = np.bincount(ids, weights=is_lower(codes), minlength=n)
+    return np.column_stack((classes.reshape(n, 3), lower)).astype(np.int64)
+
+
+_DECODE_LUT = np.frombuffer(DECODE_TABLE, dtype=np.uint8)
+
+
+# The codes of gap bases (N and the gap characters), see `Fasta.gaps`
+_GAP_CODES = np.array(
+    [x.value for x in (Nucleotide.N, Nucleotide.n, Nucleotide.GAP, Nucleotide.DOT)],
+    dtype=SEQ_DTYPE,
+)
+
+
+def _run_masks(codes):
+    """
+    Returns the gap and lower case masks of an encoded sequence,
+    in the order of Fasta.RUNS
+    """
+    codes = np.asarray(codes, dtype=SEQ_DTYPE)
+    return np.isin(codes, _GAP_CODES), is_lower(codes)
+
+
+class _RunCollector(object):
+    """
+    Collects the [start,end) runs of a mask given over consecutive
+    chunks of a sequence, runs spanning chunks are merged
+    """
+
+    def __init__(self):
+        self._runs = []
+        self._offset = 0
+
+    def update(self, mask):
+        runs = _runs(mask) + self._offset
+        self._offset += len(mask)
+        if len(runs) == 0:
+            return
+        if len(self._runs) > 0 and self._runs[-1][-1, 1] == runs[0, 0]:
+            self._runs[-1][-1, 1] = runs[0, 1]
+            runs = runs[1:]
+        if len(runs) > 0:
+            self._runs.append(runs)
+
+    def runs(self):
+        if len(self._runs) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+        return np.concatenate(self._runs)
+
+
+# What is recorded about a sequence when it is stored: its length,
+# base counts (see Fasta.COMPOSITION), digests (see DIGESTS) and
+# gap and soft-masked runs (see Fasta.RUNS)
+_SeqSummary = namedtuple("_SeqSummary", ["length", "counts", "digests", "runs"])
+
+
+class _Summarizer(object):
+    """
+    Builds the summary of a sequence given in consecutive chunks
+    """
+
+    def __init__(self):
+        self.length = 0
+        self.counts = np.zeros(4, dtype=np.int64)
+        self.digester = SequenceDigest()
+        # In the order of Fasta.RUNS
+        self.collectors = [_RunCollector(), _RunCollector()]
+
+    def update(self, chunk):
+        self.length += len(chunk)
+        self.counts += _base_counts(chunk)
+        self.digester.update(chunk)
+        for collector, mask in zip(self.collectors, _run_masks(chunk)):
+            collector.update(mask)
+
+    def summary(self):
+        return _SeqSummary(
+            self.length,
+            self.counts,
+            self.digester.hexdigests(),
+            [x.runs() for x in self.collectors],
+        )
+
+
+def _summarize(codes, chunk_size=2**22):
+    """
+    Returns the summary of an encoded sequence, a few MB at a time
+    """
+    summarizer = _Summarizer()
+    for start in range(0, len(codes), chunk_size):
+        summarizer.update(codes[start : start + chunk_size])
+    return summarizer.summary()
+
+
+def _complement_runs(runs, length):
+    """
+    Returns the [start,end) intervals of a sequence of a given
+    length not covered by any of the (possibly overlapping) runs
+    """
+    if len(runs) == 0:
+        return np.array([[0, length]], dtype=np.int64).reshape(-1, 2)
+    runs = runs[np.argsort(runs[:, 0], kind="stable")]
+    # Merge overlapping runs: a run starts a new block when it starts
+    # after every previous run ended
+    ends = np.maximum.accumulate(runs[:, 1])
+    new = np.concatenate(([True], runs[1:, 0] > ends[:-1]))
+    starts = runs[new, 0]
+    ends = ends[np.concatenate((np.flatnonzero(new)[1:] - 1, [len(runs) - 1]))]
+    free = np.column_stack(
+        (np.concatenate(([0], ends)), np.concatenate((starts, [length])))
+    )
+    return free[free[:, 1] > free[:, 0]].astype(np.int64)
+
+
+def _wrap(codes, line_length):
+    """
+    Decode a block of codes into FASTA lines (with newlines)
+    """
+    full = len(codes) // line_length * line_length
+    lines = np.empty((full // line_length, line_length + 1), dtype=np.uint8)
+    lines[:, :line_length] = _DECODE_LUT[codes[:full]].reshape(-1, line_length)
+    lines[:, line_length] = ord("\n")
+    data = lines.tobytes()
+    if full < len(codes):
+        data += decode_bytes(codes[full:]) + b"\n"
+    return data
+
+
+class _ThreadedWriter:
+    """
+    Hands blocks to a background thread which writes them to
+    a (compressing) file object, so decoding and compression
+    overlap. zlib releases the GIL while it compresses.
+    """
+
+    def __init__(self, handle, max_blocks=4):
+        self._handle = handle
+        self._queue = queue.Queue(maxsize=max_blocks)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            if self._error is None:
+                try:
+                    self._handle.write(data)
+                except Exception as e:  # pragma: no cover
+                    self._error = e
+
+    def write(self, data):
+        if self._error is not None:  # pragma: no cover
+            raise self._error
+        self._queue.put(data)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._handle.close()
+        if self._error is not None:  # pragma: no cover
+            raise self._error
 
 
 class Fasta(Freezable):
@@ -20,6 +508,21 @@ class Fasta(Freezable):
     >>> x = Fasta.from_file('example.fa')
     """
 
+    # The supported storage encodings for chromosome sequences
+    ENCODINGS = ("uint8", "2bit")
+
+    # The columns of the composition index (see `composition`) and
+    # the number of bases between its checkpoints
+    COMPOSITION = ("AT", "GC", "N", "lower")
+    COMPOSITION_STRIDE = 256
+    # The number of chromosomes whose (decoded) sequence and composition
+    # index are kept in memory between calls, see `_composition_index`
+    COMPOSITION_CACHE_SIZE = 4
+
+    # The kinds of runs indexed when a sequence is stored:
+    # gaps (N or gap characters) and soft-masked (lower case) bases
+    RUNS = ("gap", "masked")
+
     log = logging.getLogger(__name__)
     handler = logging.StreamHandler()
     formatter = logging.Formatter("%(asctime)s %(name)-12s %(levelname)-8s %(message)s")
@@ -29,18 +532,34 @@ class Fasta(Freezable):
         log.addHandler(handler)
         log.setLevel(logging.INFO)
 
-    def __init__(self, name, rootdir=None):
+    def __init__(self, name, rootdir=None, cache_bytes=2**30, cache_size=None):
         """
         Load a Fasta object from the Minus80.
         Parameters
         ----------
         name : str
             The name of the frozen object
+        cache_bytes : int (default: 1 GiB)
+            The maximum number of sequence bytes held by the
+            chromosome cache, None for no limit
+        cache_size : int (default: None)
+            The maximum number of chromosomes held by the
+            chromosome cache, None for no limit
         Returns
         -------
         A Fasta object
         """
         super().__init__(name, rootdir=rootdir)
+        self._chrom_cache = _ChromosomeCache(cache_bytes, cache_size)
+        # Recently queried chromosomes, see `_composition_index`
+        self._composition_cache = OrderedDict()
+        # Maps names, nicknames and chr prefix variants to chromosome
+        # names, see `_alias_map`
+        self._aliases = None
+        self._chrom_attrs = None
+        # Read only memory map of the flat sequence file, see `_map_seq`
+        self._seq_map = None
+        self._seq_map_id = None
         # Load up from the database
         self._initialize_tables()
 
@@ -82,7 +601,112 @@ class Fasta(Freezable):
         """
         )
 
-    def add_chrom(self, chrom, replace=False, cur=None):
+        # Chromosomes without an encoding were stored by older
+        # versions (one int64 per base), see `reencode`
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS encodings (
+                chrom TEXT PRIMARY KEY,
+                encoding TEXT,
+                length INTEGER
+            )
+        """
+        )
+
+        # uint8 sequences are appended to a single flat file and
+        # served as memory mapped views, see `_map_seq`
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS seq_offsets (
+                chrom TEXT PRIMARY KEY,
+                offset INTEGER,
+                length INTEGER
+            )
+        """
+        )
+
+        # The generation of the flat sequence file, bumped by `compact`
+        # in the same transaction as the offsets into the new file
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS seq_file (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                generation INTEGER
+            )
+        """
+        )
+
+        # Lengths and base counts (see COMPOSITION) recorded when a
+        # sequence is stored, see `lengths`
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chrom_stats (
+                chrom TEXT PRIMARY KEY,
+                length INTEGER,
+                AT INTEGER,
+                GC INTEGER,
+                N INTEGER,
+                lower INTEGER
+            )
+        """
+        )
+
+        # Digests of the upper case sequences (see DIGESTS) recorded
+        # when a sequence is stored, see `digests`
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS seq_digests (
+                chrom TEXT PRIMARY KEY,
+                md5 TEXT,
+                sha512t24u TEXT
+            );
+            CREATE INDEX IF NOT EXISTS seq_digests_sha512t24u
+                ON seq_digests (sha512t24u);
+        """
+        )
+
+        # The number of gap and soft-masked runs of each chromosome,
+        # the runs themselves are in the columnar store, see `runs`
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS run_index (
+                chrom TEXT PRIMARY KEY,
+                gap INTEGER,
+                masked INTEGER
+            )
+        """
+        )
+
+        # Chromosomes with a (persisted) composition index, see `composition`
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS composition_index (
+                chrom TEXT PRIMARY KEY,
+                stride INTEGER
+            )
+        """
+        )
+
+    def _seq_generation(self):
+        (generation,) = (
+            self.m80.db.cursor()
+            .execute("SELECT COALESCE(MAX(generation), 0) FROM seq_file")
+            .fetchone()
+        )
+        return generation
+
+    def _seq_path(self, generation):
+        name = "sequences.bin" if generation == 0 else f"sequences.{generation}.bin"
+        return os.path.join(self.m80.thawed_dir, name)
+
+    @property
+    def _seq_file(self):
+        """
+        The path to the flat file holding the uint8 sequences
+        """
+        return self._seq_path(self._seq_generation())
+
+    def add_chrom(self, chrom, replace=False, cur=None, encoding="uint8"):
         """
         Add a chromosome to the Fasta object.
         Parameters
@@ -94,12 +718,76 @@ class Fasta(Freezable):
             By default a chromosome can only be added
             once. If this is set, the chromosome object
             will be replaced.
+        encoding : str (default: 'uint8')
+            How the sequence is stored, one of:
+            'uint8': one byte per base, memory mapped from
+                     disk so only the pages that are read
+                     are loaded
+            '2bit': packed into 2 bits per base, non ACGT
+                    bases and soft-masked runs are stored
+                    separately. Smaller on disk, but the
+                    sequence is unpacked when accessed.
         """
+        if encoding not in self.ENCODINGS:
+            raise ValueError(f"encoding must be one of {self.ENCODINGS}")
         self.log.info(f"Adding {chrom.name}")
-        # Check for duplicates
-        if chrom.name in self:
+        self._register_chrom(chrom.name, chrom._attrs, replace, cur=cur)
+        self._store_seq(chrom.name, chrom.seq, encoding, cur=cur)
+        self.cache_clear()
+
+    def add_chrom_chunks(
+        self, name, chunks, *attrs, replace=False, cur=None, encoding="uint8"
+    ):
+        """
+        Add a chromosome from its sequence in pieces. Each chunk is
+        encoded and appended to disk as it arrives, so a chromosome
+        never needs to be held in memory at once.
+
+        Parameters
+        ----------
+        name : str
+            The name of the chromosome
+        chunks : iterable
+            The pieces of sequence, either str/bytes (whitespace
+            and newlines are ignored) or encoded arrays
+        *attrs : str
+            The chromosome attributes
+        replace : bool (default: False)
+            Replace the chromosome if it already exists
+        encoding : str (default: 'uint8')
+            See `add_chrom`. NOTE: packing into 2bit needs the
+            whole chromosome, it is streamed to disk first and
+            then re-encoded.
+        """
+        if encoding not in self.ENCODINGS:
+            raise ValueError(f"encoding must be one of {self.ENCODINGS}")
+        self.log.info(f"Adding {name}")
+        self._register_chrom(name, attrs, replace, cur=cur)
+        self._store_chunks(
+            name,
+            (x if isinstance(x, np.ndarray) else _encode_record(x) for x in chunks),
+            cur=cur,
+        )
+        if encoding == "2bit":
+            seq = self._load_seq(name)
+            self._remove_seq(name)
+            self._store_seq(name, seq, encoding, cur=cur)
+        self.cache_clear()
+
+    def _register_chrom(self, name, attrs, replace, cur=None):
+        """
+        Add a chromosome name and its attributes, or remove
+        the stored sequence of a chromosome being replaced
+        """
+        exists = (
+            self.m80.db.cursor()
+            .execute("SELECT COUNT(*) FROM added_order WHERE name = ?", (name,))
+            .fetchone()[0]
+        )
+        if exists:
             if not replace:
-                raise ValueError(f"{chrom.name} already in FASTA")
+                raise ValueError(f"{name} already in FASTA")
+            self._remove_seq(name)
         else:
             if cur is None:
                 cur = self.m80.db.cursor()
@@ -109,13 +797,10 @@ class Fasta(Freezable):
                     (name) 
                 VALUES (?)
                 """,
-                (chrom.name,),
+                (name,),
             )
-            for x in chrom._attrs:
-                self._add_attribute(chrom.name, x)
-        seqarray = chrom.seq
-        self.m80.col[chrom.name] = seqarray
-        self.cache_clear()
+            for x in attrs:
+                self._add_attribute(name, x)
 
     def del_chrom(self, chrom):
         """
@@ -129,6 +814,7 @@ class Fasta(Freezable):
             raise ValueError(f"input must be a Chromosome object or a string")
         if name not in self:
             raise ValueError(f"'{name}' not in the {self.m80.dtype}('{self.m80.name}')")
+        name = self._alias_map()[name]
         self.m80.db.cursor().execute(
             """
             DELETE FROM added_order WHERE name = ?;
@@ -137,7 +823,16 @@ class Fasta(Freezable):
         """,
             (name, name, name),
         )
-        self.m80.col.remove(name)
+        self._remove_seq(name)
+        self.m80.db.cursor().execute(
+            """
+            DELETE FROM encodings WHERE chrom = ?;
+            DELETE FROM chrom_stats WHERE chrom = ?;
+            DELETE FROM seq_digests WHERE chrom = ?;
+            """,
+            (name, name, name),
+        )
+        self.cache_clear()
 
     def chrom_names(self):
         """
@@ -158,146 +853,1107 @@ class Fasta(Freezable):
             )
         )
 
-    def cache_clear(self):
-        self.__getitem__.cache_clear()
-
-    @classmethod
-    def from_file(cls, name, fasta_file, replace=False, rootdir=None):
-        """
-        Create a Fasta object from a file.
+    def lengths(self):
         """
-        self = cls(name, rootdir=rootdir)
-        with RawFile(fasta_file) as IN, self.m80.db.bulk_transaction() as cur:
-            cur_chrom = None
-            seqs = []
-            name, attrs = None, None
-            for line in IN:
-                line = line.strip()
-                if line.startswith(">"):
-                    # Finish the last chromosome before adding a new one
-                    if len(seqs) > 0:
-                        cur_chrom = Chromosome(name, seqs, *attrs)
-                        self.add_chrom(cur_chrom, cur=cur, replace=replace)
-                        seqs = []
-                    name, *attrs = line.lstrip(">").split()
-                else:
-                    seqs += line
-                    # cur_chrom.seq = np.append(cur_chrom.seq,list(line))
-            # Add the last chromosome
-            cur_chrom = Chromosome(name, seqs, *attrs)
-            self.add_chrom(cur_chrom, cur=cur, replace=replace)
-        return self
+        Returns the length of each chromosome without loading
+        any sequence, the lengths are recorded when chromosomes
+        are added.
 
-    def __iter__(self):
-        """
-        Iterate over chromosome objects
+        Returns
+        -------
+        A dict of chromosome lengths in added order
         """
-        chroms = self.m80.db.cursor().execute(
-            "SELECT name FROM added_order ORDER BY aorder"
-        )
-        for (chrom,) in chroms:
-            yield self[chrom]
+        return dict((name, length) for name, length, *_ in self._chrom_stats())
 
-    def __len__(self):
+    def base_counts(self):
         """
-        Returns the number of chroms in the Fasta
+        Returns the base composition of each chromosome without
+        loading any sequence, see `composition` for the columns.
+
+        Returns
+        -------
+        A DataFrame indexed by chromosome name with length, AT,
+        GC, N and lower columns
         """
-        return (
+        return pd.DataFrame(
+            self._chrom_stats(), columns=("chromosome", "length") + self.COMPOSITION
+        ).set_index("chromosome")
+
+    def _chrom_stats(self):
+        stats = (
             self.m80.db.cursor()
             .execute(
                 """
-            SELECT COUNT(*) FROM added_order
-        """
+            SELECT name, length, AT, GC, N, lower FROM added_order
+            LEFT JOIN chrom_stats ON name = chrom
+            ORDER BY aorder
+            """
             )
-            .fetchone()[0]
+            .fetchall()
         )
+        missing = [name for name, length, *_ in stats if length is None]
+        if len(missing) == 0:
+            return stats
+        # Chromosomes stored by older versions are counted once
+        for name in missing:
+            self._backfill_stats(name)
+        return self._chrom_stats()
 
-    def __contains__(self, obj):
+    def _backfill_stats(self, chrom_name):
         """
-        Returns boolean indicating if a named
-        contig (chromosome) is in the fasta.
+        Record the stats and digests of a chromosome stored
+        by an older version
+        """
+        seq = self._load_seq(chrom_name)
+        self._store_stats(chrom_name, len(seq), _base_counts(seq), digest(seq))
+
+    def digests(self):
+        """
+        Returns the digests of each chromosome (see DIGESTS) without
+        loading any sequence, the digests are computed over the upper
+        case sequence when chromosomes are added. sha512t24u digests
+        are refget (GA4GH) sequence identifiers.
+
+        Returns
+        -------
+        A DataFrame indexed by chromosome name with md5 and
+        sha512t24u columns, in added order
+        """
+        query = """
+            SELECT name, md5, sha512t24u FROM added_order
+            LEFT JOIN seq_digests ON name = chrom
+            ORDER BY aorder
         """
-        if isinstance(obj, Chromosome):
-            obj = obj.name
         cur = self.m80.db.cursor()
-        # Check if in chrom names
-        in_added = cur.execute(
-            """ 
-            SELECT COUNT(*) FROM added_order
-            WHERE name = ?
-        """,
-            (obj,),
-        ).fetchone()[0]
-        if in_added == 1:
-            return True
-        # Check if in aliases
-        in_alias = cur.execute(
-            """
-            SELECT COUNT(*) FROM nicknames
-            WHERE nickname = ?
-        """,
-            (obj,),
-        ).fetchone()[0]
-        if in_alias == 1:
-            return True
-        # Otherise its not here
-        return False
-
-    @lru_cache(maxsize=128)
-    def __getitem__(self, chrom_name):
-        if chrom_name not in self:
-            raise ValueError(f"{chrom_name} not in {self.m80.name}")
-        try:
-            seq_array = self.m80.col[chrom_name]
-        except Exception as e:
-            chrom_name = self._get_nickname(chrom_name)
-            seq_array = self.m80.col[chrom_name]
-        finally:
-            attrs = [
-                x[0]
-                for x in self.m80.db.cursor().execute(
-                    """
-                SELECT attribute FROM attributes 
-                WHERE chrom = ?
-                ORDER BY rowid -- This preserves the ordering of attrs
-            """,
-                    (chrom_name,),
-                )
-            ]
-            return Chromosome(chrom_name, seq_array, *attrs)
+        rows = cur.execute(query).fetchall()
+        missing = [name for name, md5, _ in rows if md5 is None]
+        if len(missing) > 0:
+            for name in missing:
+                self._backfill_stats(name)
+            rows = cur.execute(query).fetchall()
+        return pd.DataFrame(rows, columns=("chromosome",) + DIGESTS).set_index(
+            "chromosome"
+        )
 
-    def to_fasta(self, filename, line_length=70):
+    def duplicates(self):
         """
-        Print the chromosomes to a file in FASTA format
-        Paramaters
-        ----------
-        filename : str
-            The output filename
-        line_length : int (default: 70)
-            The number of nucleotides per line
+        Find chromosomes with identical (upper case) sequences
+
         Returns
         -------
-        None
+        A list of lists of chromosome names sharing a sequence,
+        in added order
         """
-        with open(filename, "w") as OUT:
-            for chrom_name in self.chrom_names():
-                print(f"Printing out {chrom_name}")
-                chrom = self[chrom_name]
-                # easy_id = ids[chrom_name]
-                start_length = len(chrom)
-                # if easy_id == 'chrUn':
-                #    easy_id = easy_id + '_' + chrom_name
-                print(f'>{chrom_name} {"|".join(chrom._attrs)}', file=OUT)
-                printed_length = 0
-                for i in range(1, len(chrom), 70):
-                    sequence = chrom[i : (i - 1) + 70]
-                    print("".join(sequence), file=OUT)
-                    printed_length += len(sequence)
-                if printed_length != start_length:  # pragma: no cover
-                    raise ValueError("Chromosome was truncated during printing")
-        return None
+        groups = defaultdict(list)
+        for name, sha in self.digests()["sha512t24u"].items():
+            groups[sha].append(name)
+        return [names for names in groups.values() if len(names) > 1]
 
-    def _add_attribute(self, chrom_name, attr, cur=None):
+    def compare(self, other):
+        """
+        Compare the chromosomes of two Fasta objects (e.g. two genome
+        builds) by their digests, no sequence is read.
+
+        Parameters
+        ----------
+        other : Fasta
+            The Fasta to compare to
+
+        Returns
+        -------
+        A DataFrame indexed by the chromosome names of both Fasta
+        objects (this one first) with the columns:
+            length : the length in this Fasta, NaN if missing
+            other_length : the length in other, NaN if missing
+            identical : whether both have the chromosome with the
+                        same (upper case) sequence
+            other_names : the names of the chromosomes in other
+                          with the same sequence, which catches
+                          renamed chromosomes
+        """
+        mine = self.digests().join(pd.Series(self.lengths(), name="length"))
+        theirs = other.digests().join(pd.Series(other.lengths(), name="length"))
+        other_names = defaultdict(list)
+        for name, sha in theirs["sha512t24u"].items():
+            other_names[sha].append(name)
+        names = list(mine.index) + [x for x in theirs.index if x not in mine.index]
+        comparison = pd.DataFrame(index=pd.Index(names, name="chromosome"))
+        comparison["length"] = mine["length"]
+        comparison["other_length"] = theirs["length"]
+        comparison["identical"] = (
+            mine["sha512t24u"].reindex(names) == theirs["sha512t24u"].reindex(names)
+        ) & comparison["length"].eq(comparison["other_length"])
+        comparison["other_names"] = [
+            other_names.get(sha, []) for sha in mine["sha512t24u"].reindex(names)
+        ]
+        return comparison
+
+    def verify(self):
+        """
+        Check the stored sequences against the digests recorded
+        when they were added, e.g. to catch corrupted files.
+
+        Returns
+        -------
+        A list of the names of chromosomes that do not match
+        """
+        recorded = self.digests()
+        return [
+            name
+            for name in recorded.index
+            if digest(self._load_seq(name))["sha512t24u"]
+            != recorded.loc[name, "sha512t24u"]
+        ]
+
+    def cache_clear(self):
+        """
+        Empty the chromosome cache and the name resolution
+        map of this Fasta object
+        """
+        self._chrom_cache.clear()
+        self._composition_cache.clear()
+        self._aliases = None
+        self._chrom_attrs = None
+
+    def _alias_map(self):
+        """
+        Returns a dict mapping every name a chromosome can be accessed
+        by to its name: the chromosome names themselves, nicknames and
+        'chr' prefix variants (e.g. '1', 'chr1', 'Chr1' and 'CHR1').
+        Names take precedence over nicknames, which take precedence
+        over prefix variants. Variants shared by two chromosomes are
+        left out.
+
+        The map (and the chromosome attributes) are loaded once and
+        rebuilt after this object changes chromosomes, nicknames or
+        attributes (see `cache_clear`).
+        """
+        if self._aliases is None:
+            cur = self.m80.db.cursor()
+            names = [x for (x,) in cur.execute("SELECT name FROM added_order")]
+            aliases = {}
+            ambiguous = set()
+            for name in names:
+                for variant in _chr_variants(name):
+                    if aliases.get(variant, name) != name:
+                        ambiguous.add(variant)
+                    aliases[variant] = name
+            for variant in ambiguous:
+                del aliases[variant]
+            aliases.update(cur.execute("SELECT nickname, chrom FROM nicknames"))
+            aliases.update((name, name) for name in names)
+            attrs = defaultdict(list)
+            # Ordering by rowid preserves the ordering of attrs
+            for chrom, attr in cur.execute(
+                "SELECT chrom, attribute FROM attributes ORDER BY rowid"
+            ):
+                attrs[chrom].append(attr)
+            self._aliases, self._chrom_attrs = aliases, attrs
+        return self._aliases
+
+    def cache_info(self):
+        """
+        Returns the statistics of the chromosome cache as a
+        CacheInfo(hits, misses, maxbytes, maxsize, currbytes, currsize)
+        """
+        return self._chrom_cache.info()
+
+    def reencode(self, encoding="uint8"):
+        """
+        Re-store every chromosome using an encoding. This is also
+        the migration path for datasets created by older versions
+        of LocusPocus, which stored 8 bytes per base.
+
+        Parameters
+        ----------
+        encoding : str (default: 'uint8')
+            One of 'uint8' or '2bit', see `add_chrom`
+        """
+        if encoding not in self.ENCODINGS:
+            raise ValueError(f"encoding must be one of {self.ENCODINGS}")
+        for name in list(self.chrom_names()):
+            if self._get_encoding(name) == encoding and (
+                encoding == "2bit" or self._get_offset(name) is not None
+            ):
+                continue
+            self.log.info(f"Re-encoding {name} as {encoding}")
+            seq = self._load_seq(name)
+            self._remove_seq(name)
+            self._store_seq(name, seq, encoding)
+        self.cache_clear()
+
+    def compact(self):
+        """
+        Rewrite the flat sequence file without the space left
+        behind by deleted or replaced chromosomes.
+        """
+        cur = self.m80.db.cursor()
+        offsets = cur.execute(
+            "SELECT chrom, offset, length FROM seq_offsets ORDER BY offset"
+        ).fetchall()
+        generation = self._seq_generation()
+        old_file = self._seq_path(generation)
+        new_file = self._seq_path(generation + 1)
+        # The sequences are copied into a new file whose generation is
+        # committed together with the new offsets, so the offsets always
+        # point into the file they were written for
+        try:
+            with self.m80.db.bulk_transaction() as cur:
+                with open(new_file, "wb") as OUT:
+                    for chrom_name, offset, length in offsets:
+                        new_offset = OUT.tell()
+                        OUT.write(self._map_seq(offset, length))
+                        cur.execute(
+                            "UPDATE seq_offsets SET offset = ? WHERE chrom = ?",
+                            (new_offset, chrom_name),
+                        )
+                    OUT.flush()
+                    os.fsync(OUT.fileno())
+                cur.execute(
+                    "INSERT OR REPLACE INTO seq_file (id, generation) VALUES (0, ?)",
+                    (generation + 1,),
+                )
+        except BaseException:
+            if os.path.exists(new_file):
+                os.remove(new_file)
+            raise
+        # Views that are already handed out keep the old file alive
+        if os.path.exists(old_file):
+            os.remove(old_file)
+        self._seq_map = None
+        self.cache_clear()
+
+    @classmethod
+    def from_file(
+        cls,
+        name,
+        fasta_file,
+        replace=False,
+        rootdir=None,
+        encoding="uint8",
+        processes=None,
+        max_in_flight=None,
+        chunk_size=2**22,
+    ):
+        """
+        Create a Fasta object from a file.
+
+        The file is read in blocks of chunk_size bytes and each block
+        of sequence is encoded with a single table lookup and appended
+        to disk, so memory use does not depend on chromosome size.
+
+        Parameters
+        ----------
+        name : str
+            The name of the Fasta object
+        fasta_file : str
+            The path to the FASTA file
+        replace : bool (default: False)
+            Replace chromosomes that already exist
+        rootdir : str (default: None)
+            The base directory to store the files related to the dataset
+        encoding : str (default: 'uint8')
+            How to store the sequences, see `add_chrom`
+        processes : int (default: None)
+            Encode chromosomes in parallel with this many worker
+            processes. Uncompressed files are split into records by
+            their byte offsets and each worker reads its own record.
+            Chromosomes are still stored one at a time, in file order.
+        max_in_flight : int (default: 2 * processes)
+            The maximum number of chromosomes being encoded (or
+            waiting to be stored) at once, this bounds memory use
+        chunk_size : int (default: 4 MiB)
+            The number of bytes read (and encoded) at a time
+        """
+        self = cls(name, rootdir=rootdir)
+        if processes is not None and processes > 1:
+            if max_in_flight is None:
+                max_in_flight = 2 * processes
+            self._from_file_parallel(
+                fasta_file, replace, encoding, processes, max_in_flight
+            )
+            return self
+        with _open_binary(fasta_file) as IN, self.m80.db.bulk_transaction() as cur:
+            events = _stream_fasta(IN, chunk_size)
+            # Skip anything before the first header
+            header = next((h for h, _ in events if h is not None), None)
+            while header is not None:
+                next_header = []
+
+                def chunks():
+                    # The sequence blocks up to the next header
+                    for h, data in events:
+                        if h is not None:
+                            next_header.append(h)
+                            return
+                        yield data
+
+                name, *attrs = header.split()
+                self.add_chrom_chunks(
+                    name,
+                    chunks(),
+                    *attrs,
+                    replace=replace,
+                    cur=cur,
+                    encoding=encoding,
+                )
+                header = next_header[0] if next_header else None
+        return self
+
+    def _from_file_parallel(
+        self, fasta_file, replace, encoding, processes, max_in_flight
+    ):
+        """
+        Encode the records of a FASTA file in a process pool while this
+        process stores the finished chromosomes in file order
+        """
+        with ProcessPoolExecutor(
+            max_workers=processes
+        ) as pool, self.m80.db.bulk_transaction() as cur:
+            in_flight = deque()
+
+            def store_next():
+                header, future = in_flight.popleft()
+                name, *attrs = header.split()
+                codes, summary = future.result()
+                # Like add_chrom, with the summary computed by the worker
+                self.log.info(f"Adding {name}")
+                self._register_chrom(name, attrs, replace, cur=cur)
+                self._store_seq(name, codes, encoding, cur=cur, summary=summary)
+                self.cache_clear()
+
+            for header, job in _fasta_records(fasta_file):
+                in_flight.append(
+                    (header, pool.submit(_encode_record, job, summarize=True))
+                )
+                if len(in_flight) >= max_in_flight:
+                    store_next()
+            while in_flight:
+                store_next()
+
+    @staticmethod
+    def from_indexed_file(
+        fasta_file, fai_file=None, rebuild=False, gzi_file=None, cache_blocks=64
+    ):
+        """
+        Access a FASTA file directly through its samtools compatible
+        .fai index, without importing it. The index is built (and
+        written next to the file) if it does not exist yet.
+
+        Parameters
+        ----------
+        fasta_file : str
+            The path to the FASTA file, either uncompressed or
+            compressed with bgzip
+        fai_file : str (default: None)
+            The path to the index, defaults to fasta_file + '.fai'
+        rebuild : bool (default: False)
+            Rebuild the index even if it exists
+        gzi_file : str (default: None)
+            The path to the BGZF block index of a compressed
+            file, defaults to fasta_file + '.gzi'
+        cache_blocks : int (default: 64)
+            The number of decompressed BGZF blocks to cache
+
+        Returns
+        -------
+        A read only IndexedFasta object, see locuspocus.faidx
+        """
+        return IndexedFasta(
+            fasta_file,
+            fai_file=fai_file,
+            rebuild=rebuild,
+            gzi_file=gzi_file,
+            cache_blocks=cache_blocks,
+        )
+
+    def __iter__(self):
+        """
+        Iterate over chromosome objects
+        """
+        chroms = self.m80.db.cursor().execute(
+            "SELECT name FROM added_order ORDER BY aorder"
+        )
+        for (chrom,) in chroms:
+            yield self[chrom]
+
+    def __len__(self):
+        """
+        Returns the number of chroms in the Fasta
+        """
+        return (
+            self.m80.db.cursor()
+            .execute(
+                """
+            SELECT COUNT(*) FROM added_order
+        """
+            )
+            .fetchone()[0]
+        )
+
+    def __contains__(self, obj):
+        """
+        Returns boolean indicating if a named
+        contig (chromosome) is in the fasta.
+        """
+        if isinstance(obj, Chromosome):
+            obj = obj.name
+        return obj in self._alias_map()
+
+    def __getitem__(self, chrom_name):
+        chrom = self._chrom_cache.get(chrom_name)
+        if chrom is None:
+            chrom = self._get_chrom(chrom_name)
+            self._chrom_cache.put(chrom_name, chrom)
+        return chrom
+
+    def _get_chrom(self, chrom_name):
+        """
+        Build a Chromosome object from storage
+        """
+        try:
+            name = self._alias_map()[chrom_name]
+        except (KeyError, TypeError):
+            raise ValueError(f"{chrom_name} not in {self.m80.name}")
+        chrom = Chromosome(name, self._load_seq(name), *self._chrom_attrs[name])
+        result = (
+            self.m80.db.cursor()
+            .execute("SELECT md5, sha512t24u FROM seq_digests WHERE chrom = ?", (name,))
+            .fetchone()
+        )
+        if result is not None:
+            chrom._digests = dict(zip(DIGESTS, result))
+        return chrom
+
+    def extract(self, loci, stranded=True, flank=(0, 0), filename=None, line_length=70):
+        """
+        Extract the sequences of many loci at once. Loci are grouped
+        by chromosome and the sequences of each group are gathered
+        out of the chromosome array with a single fancy index.
+
+        Parameters
+        ----------
+        loci : Loci or iterable of Locus objects
+            The loci to extract
+        stranded : bool (default: True)
+            Reverse complement the sequences of loci on the - strand
+        flank : (int, int) (default: (0,0))
+            The number of bases added upstream (5') and downstream
+            (3') of each locus. When stranded, upstream of a - strand
+            locus is after its end. Flanks are clipped at the
+            chromosome ends.
+        filename : str (default: None)
+            Write the sequences to this file in FASTA format
+            instead of returning them
+        line_length : int (default: 70)
+            The number of nucleotides per line in the output file
+
+        Returns
+        -------
+        A generator of (locus, sequence) tuples, grouped by chromosome
+        in the order in which each chromosome first appears. None if
+        a filename was given.
+        """
+        pairs = self._extract(loci, stranded, flank)
+        if filename is None:
+            return pairs
+        with open(filename, "w") as OUT:
+            for locus, seq in pairs:
+                coor = f"{locus.chromosome}:{locus.start}-{locus.end}"
+                name = coor if locus.name is None else locus.name
+                print(f">{name} {coor}({locus.strand})", file=OUT)
+                for i in range(0, len(seq), line_length):
+                    print(seq[i : i + line_length], file=OUT)
+        return None
+
+    def _extract(self, loci, stranded, flank):
+        up, down = flank
+        groups = _group_loci(loci)
+        for chrom_name, group in groups.items():
+            seq = np.asarray(self[chrom_name].seq)
+            _, items, starts, ends, minus = zip(*group)
+            minus = np.array(minus, dtype=bool) & stranded
+            # 0 indexed, half open intervals including the flanks
+            starts = np.array(starts, dtype=np.int64) - np.where(minus, down, up)
+            ends = np.array(ends, dtype=np.int64) + np.where(minus, up, down)
+            starts = np.maximum(starts, 1) - 1
+            ends = np.minimum(ends, len(seq))
+            codes, offsets = _gather(seq, starts, ends, minus)
+            text = decode(codes)
+            for item, a, b in zip(items, offsets[:-1], offsets[1:]):
+                yield item, text[a:b]
+
+    def composition(self, loci, fraction=False):
+        """
+        Count the base composition of many loci: the number of A/T(U)/W,
+        G/C/S, other (N, ambiguous or gap) and lower case (soft-masked) bases.
+        Counts come from a checkpointed prefix sum index (built the first
+        time a chromosome is queried and stored with the sequence), so
+        the cost of an interval does not depend on its length.
+
+        Parameters
+        ----------
+        loci : Loci or iterable of Locus objects
+            The loci to count
+        fraction : bool (default: False)
+            Return the fraction of bases in each class instead
+            of the counts
+
+        Returns
+        -------
+        A DataFrame with chromosome, start, end, length, AT, GC, N
+        and lower columns, one row per locus in input order
+        """
+        rows = []
+        for chrom_name, group in _group_loci(loci).items():
+            order, _, starts, ends, _ = zip(*group)
+            starts = np.array(starts, dtype=np.int64)
+            ends = np.array(ends, dtype=np.int64)
+            counts = self.interval_composition(chrom_name, starts - 1, ends)
+            rows.append((np.array(order), chrom_name, starts, ends, counts))
+        return self._composition_frame(rows, fraction)
+
+    def windows(self, chrom_name, size, step=None, fraction=False):
+        """
+        Count the base composition (see `composition`) over
+        sliding windows along a chromosome.
+
+        Parameters
+        ----------
+        chrom_name : str
+            The chromosome
+        size : int
+            The window size, the last window may be shorter
+        step : int (default: size)
+            The distance between the starts of adjacent windows
+        fraction : bool (default: False)
+            Return fractions instead of counts
+
+        Returns
+        -------
+        A DataFrame with one row per window, see `composition`
+        """
+        step = size if step is None else step
+        length = len(self[chrom_name])
+        starts = np.arange(0, length, step, dtype=np.int64)
+        ends = np.minimum(starts + size, length)
+        counts = self.interval_composition(chrom_name, starts, ends)
+        rows = [(np.arange(len(starts)), chrom_name, starts + 1, ends, counts)]
+        return self._composition_frame(rows, fraction)
+
+    def interval_composition(self, chrom_name, starts, ends):
+        """
+        Count the base composition of intervals of a chromosome,
+        vectorized over arrays of intervals.
+
+        Parameters
+        ----------
+        chrom_name : str
+            The chromosome
+        starts, ends : array-like of int
+            0 indexed, half open intervals (python slices)
+
+        Returns
+        -------
+        An (n,4) int64 array of AT, GC, N and lower case counts
+        """
+        seq, index, stride = self._composition_index(chrom_name)
+        starts = np.clip(np.asarray(starts, dtype=np.int64), 0, len(seq))
+        ends = np.clip(np.asarray(ends, dtype=np.int64), starts, len(seq))
+        return self._prefix_counts(seq, index, stride, ends) - self._prefix_counts(
+            seq, index, stride, starts
+        )
+
+    @staticmethod
+    def _prefix_counts(seq, index, stride, x):
+        """
+        The counts of seq[:x] for each x, from the nearest checkpoint
+        of the index plus (or minus) the bases in between
+        """
+        k = np.minimum((x + stride // 2) // stride, len(index) - 1)
+        checkpoint = k * stride
+        edge = _interval_counts(
+            seq, np.minimum(x, checkpoint), np.maximum(x, checkpoint)
+        )
+        sign = np.where(checkpoint > x, -1, 1)[:, None]
+        return index[k].astype(np.int64) + sign * edge
+
+    def _composition_index(self, chrom_name):
+        """
+        Returns the (decoded) sequence of a chromosome and its composition
+        index: the cumulative counts of each class at every `stride`
+        bases. The index is built and stored the first time, both are
+        kept in memory for the most recently queried chromosomes.
+        """
+        cached = self._composition_cache.get(chrom_name)
+        if cached is None:
+            chrom = self[chrom_name]
+            seq = np.asarray(chrom.seq)
+            cached = (seq, *self._load_composition(chrom.name, seq))
+            self._composition_cache[chrom_name] = cached
+            while len(self._composition_cache) > self.COMPOSITION_CACHE_SIZE:
+                self._composition_cache.popitem(last=False)
+        self._composition_cache.move_to_end(chrom_name)
+        return cached
+
+    def _load_composition(self, chrom_name, seq):
+        """
+        Load (or build and store) the composition index of a chromosome
+        """
+        cur = self.m80.db.cursor()
+        (stride,) = cur.execute(
+            "SELECT stride FROM composition_index WHERE chrom = ?", (chrom_name,)
+        ).fetchone() or (None,)
+        if stride is not None:
+            return self.m80.col[f"{chrom_name}__composition"], stride
+        stride = self.COMPOSITION_STRIDE
+        n = len(seq) // stride
+        dtype = np.uint32 if len(seq) < 2**32 else np.int64
+        index = np.zeros((n + 1, 4), dtype=dtype)
+        # Count a few MB at a time
+        chunk = stride * 16384
+        for start in range(0, n * stride, chunk):
+            block = seq[start : min(start + chunk, n * stride)]
+            classes = BASE_CLASS_LUT[block].reshape(-1, stride)
+            rows = slice(1 + start // stride, 1 + (start + len(block)) // stride)
+            for c in range(3):
+                index[rows, c] = (classes == c).sum(axis=1)
+            index[rows, 3] = is_lower(block).reshape(-1, stride).sum(axis=1)
+        np.cumsum(index, axis=0, out=index)
+        self.m80.col[f"{chrom_name}__composition"] = index
+        cur.execute(
+            "INSERT OR REPLACE INTO composition_index (chrom, stride) VALUES (?,?)",
+            (chrom_name, stride),
+        )
+        return index, stride
+
+    def _remove_composition(self, chrom_name):
+        self._composition_cache.clear()
+        cur = self.m80.db.cursor()
+        if cur.execute(
+            "SELECT COUNT(*) FROM composition_index WHERE chrom = ?", (chrom_name,)
+        ).fetchone()[0]:
+            self.m80.col.remove(f"{chrom_name}__composition")
+            cur.execute("DELETE FROM composition_index WHERE chrom = ?", (chrom_name,))
+
+    def _composition_frame(self, rows, fraction):
+        order, chroms, starts, ends, counts = zip(*rows)
+        order = np.argsort(np.concatenate(order), kind="stable")
+        counts = np.vstack(counts)[order]
+        frame = pd.DataFrame(
+            {
+                "chromosome": np.repeat(chroms, [len(x) for x in starts])[order],
+                "start": np.concatenate(starts)[order],
+                "end": np.concatenate(ends)[order],
+            }
+        )
+        frame["length"] = frame["end"] - frame["start"] + 1
+        for i, name in enumerate(self.COMPOSITION):
+            if fraction:
+                frame[name] = counts[:, i] / np.maximum(frame["length"], 1)
+            else:
+                frame[name] = counts[:, i]
+        return frame
+
+    def kmer_counts(self, k, loci=None, canonical=False):
+        """
+        Count the k-mers of every chromosome, or of a set of loci
+        (on the + strand), see `motifs.kmer_counts`. Sequences are
+        not decoded.
+
+        Parameters
+        ----------
+        k : int
+            The k-mer length, at most motifs.MAX_K
+        loci : Loci or iterable of Locus objects (default: None)
+            Only count k-mers that lie within these loci
+        canonical : bool (default: False)
+            Count k-mers on both strands, under the smaller of each
+            k-mer and its reverse complement
+
+        Returns
+        -------
+        An array of 4**k counts, see `motifs.kmer_labels`
+        """
+        counts = kmer_counts(np.empty(0, dtype=SEQ_DTYPE), k)
+        if loci is None:
+            for chrom_name in self.chrom_names():
+                counts += self[chrom_name].kmer_counts(k, canonical=canonical)
+            return counts
+        for chrom_name, group in _group_loci(loci).items():
+            _, _, starts, ends, _ = zip(*group)
+            codes, _ = _separated(
+                np.asarray(self[chrom_name].seq),
+                np.array(starts, dtype=np.int64) - 1,
+                np.array(ends, dtype=np.int64),
+            )
+            counts += kmer_counts(codes, k, canonical)
+        return counts
+
+    def find_motif(self, motif, loci=None, strand="both"):
+        """
+        Find the occurrences of an (IUPAC) motif on one or both
+        strands of every chromosome, or within a set of loci, see
+        `motifs.find_motif`. Sequences are not decoded.
+
+        Parameters
+        ----------
+        motif : str
+            The motif, e.g. 'TATAWAWR'
+        loci : Loci or iterable of Locus objects (default: None)
+            Only report hits that lie within these loci
+        strand : str (default: 'both')
+            One of '+', '-' or 'both'
+
+        Returns
+        -------
+        A DataFrame with chromosome, start, end (1 indexed, inclusive)
+        and strand columns, one row per hit. With loci, the locus column
+        holds the (input) position of the locus each hit lies in, hits
+        in overlapping loci are reported once per locus.
+        """
+        length = len(motif)
+        frames = []
+        if loci is None:
+            for chrom_name in self.chrom_names():
+                positions, strands = self[chrom_name].find_motif(motif, strand=strand)
+                frames.append(
+                    pd.DataFrame(
+                        {
+                            "chromosome": chrom_name,
+                            "start": positions,
+                            "end": positions + length - 1,
+                            "strand": strands,
+                        }
+                    )
+                )
+        else:
+            for chrom_name, group in _group_loci(loci).items():
+                order, _, starts, ends, _ = zip(*group)
+                starts = np.array(starts, dtype=np.int64)
+                codes, offsets = _separated(
+                    np.asarray(self[chrom_name].seq),
+                    starts - 1,
+                    np.array(ends, dtype=np.int64),
+                )
+                hits, strands = find_motif(codes, motif, strand)
+                i = np.searchsorted(offsets, hits, side="right") - 1
+                positions = starts[i] + hits - offsets[i]
+                frames.append(
+                    pd.DataFrame(
+                        {
+                            "chromosome": chrom_name,
+                            "start": positions,
+                            "end": positions + length - 1,
+                            "strand": strands,
+                            "locus": np.array(order, dtype=np.int64)[i],
+                        }
+                    )
+                )
+        columns = ["chromosome", "start", "end", "strand"]
+        if loci is not None:
+            columns.append("locus")
+        if len(frames) == 0:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)[columns]
+
+    def runs(self, chrom_name, kind="gap"):
+        """
+        Returns the runs of gap (N, '-' or '.') or soft-masked (lower
+        case) bases of a chromosome. The runs are indexed when
+        chromosomes are added, so no sequence is read.
+
+        Parameters
+        ----------
+        chrom_name : str
+            The chromosome
+        kind : str (default: 'gap')
+            One of 'gap' or 'masked'
+
+        Returns
+        -------
+        An (n,2) int64 array of [start,end) runs (0-based, half
+        open) in sequence order
+        """
+        if kind not in self.RUNS:
+            raise ValueError(f"kind must be one of {self.RUNS}")
+        if chrom_name not in self:
+            raise ValueError(f"{chrom_name} not in {self.m80.name}")
+        chrom_name = self._alias_map()[chrom_name]
+        cur = self.m80.db.cursor()
+        if not cur.execute(
+            "SELECT COUNT(*) FROM run_index WHERE chrom = ?", (chrom_name,)
+        ).fetchone()[0]:
+            # Chromosomes stored by older versions are indexed once
+            self._store_runs(
+                chrom_name, [_runs(x) for x in _run_masks(self._load_seq(chrom_name))]
+            )
+        return np.asarray(self.m80.col[f"{chrom_name}__{kind}_runs"], dtype=np.int64)
+
+    def gaps(self, chrom_name=None):
+        """
+        Returns the runs of N bases and gap characters as Locus
+        objects (feature_type 'gap'), which can be added to a Loci.
+
+        Parameters
+        ----------
+        chrom_name : str (default: None)
+            Only return the gaps of this chromosome
+
+        Returns
+        -------
+        A list of Locus objects in chromosome and position order
+        """
+        return self._run_loci("gap", chrom_name)
+
+    def masked(self, chrom_name=None):
+        """
+        Returns the runs of soft-masked (lower case) bases as Locus
+        objects (feature_type 'masked'), see `gaps`
+        """
+        return self._run_loci("masked", chrom_name)
+
+    def _run_loci(self, kind, chrom_name):
+        names = list(self.chrom_names()) if chrom_name is None else [chrom_name]
+        return [
+            Locus(name, start + 1, end, feature_type=kind)
+            for name in names
+            for start, end in self.runs(name, kind).tolist()
+        ]
+
+    def random_intervals(self, n, length, avoid=("gap",), chrom_name=None, seed=None):
+        """
+        Sample random intervals that do not overlap gaps and/or
+        soft-masked bases. Only the run index is used, no sequence
+        is read. Each valid interval is equally likely.
+
+        Parameters
+        ----------
+        n : int
+            The number of intervals to sample (with replacement)
+        length : int
+            The length of the intervals
+        avoid : iterable (default: ('gap',))
+            The kinds of runs (see RUNS) intervals may not overlap
+        chrom_name : str (default: None)
+            Only sample intervals on this chromosome
+        seed : int (default: None)
+            Seed for the random number generator, for reproducible
+            samples
+
+        Returns
+        -------
+        A list of n Locus objects (feature_type 'interval')
+
+        Raises
+        ------
+        `ValueError` if no interval of the length fits
+        """
+        names = list(self.chrom_names()) if chrom_name is None else [chrom_name]
+        lengths = self.lengths()
+        chroms, starts, counts = [], [], []
+        for name in names:
+            runs = [self.runs(name, kind) for kind in avoid]
+            free = _complement_runs(
+                np.concatenate(runs or [np.empty((0, 2), dtype=np.int64)]),
+                lengths[self._alias_map()[name]],
+            )
+            free = free[free[:, 1] - free[:, 0] >= length]
+            chroms.append(np.full(len(free), name, dtype=object))
+            starts.append(free[:, 0])
+            counts.append(free[:, 1] - free[:, 0] - length + 1)
+        counts = np.concatenate(counts)
+        if counts.sum() == 0:
+            raise ValueError(f"No interval of length {length} avoids {avoid}")
+        # Draw a start among all the valid starts, then find its free block
+        offsets = np.cumsum(counts)
+        draws = np.random.default_rng(seed).integers(0, offsets[-1], size=n)
+        blocks = np.searchsorted(offsets, draws, side="right")
+        positions = np.concatenate(starts)[blocks] + draws - (offsets - counts)[blocks]
+        chroms = np.concatenate(chroms)[blocks]
+        return [
+            Locus(chrom, start + 1, start + length, feature_type="interval")
+            for chrom, start in zip(chroms, positions.tolist())
+        ]
+
+    def _store_runs(self, chrom_name, runs, cur=None):
+        """
+        Store the gap and soft-masked runs (in the order of RUNS)
+        of a chromosome
+        """
+        if cur is None:
+            cur = self.m80.db.cursor()
+        for kind, x in zip(self.RUNS, runs):
+            self.m80.col[f"{chrom_name}__{kind}_runs"] = x
+        cur.execute(
+            "INSERT OR REPLACE INTO run_index (chrom, gap, masked) VALUES (?,?,?)",
+            (chrom_name, *(len(x) for x in runs)),
+        )
+
+    def _remove_runs(self, chrom_name):
+        cur = self.m80.db.cursor()
+        if cur.execute(
+            "SELECT COUNT(*) FROM run_index WHERE chrom = ?", (chrom_name,)
+        ).fetchone()[0]:
+            for kind in self.RUNS:
+                self.m80.col.remove(f"{chrom_name}__{kind}_runs")
+            cur.execute("DELETE FROM run_index WHERE chrom = ?", (chrom_name,))
+
+    def spliced(
+        self, loci, feature_type="exon", translate=False, genetic_code=STANDARD_CODE
+    ):
+        """
+        Assemble the spliced sequences of all the transcripts in a
+        Loci database, e.g. mRNA sequences from their exons or coding
+        sequences from their CDS subloci. The segments of each
+        transcript are joined in strand order and gathered out of
+        the chromosome array in a single step per chromosome.
+
+        Parameters
+        ----------
+        loci : Loci
+            The Loci database with the gene models
+        feature_type : str (default: 'exon')
+            The feature type of the segments, usually 'exon' or 'CDS'.
+            The frame (phase) of the first segment of a transcript
+            is honored by skipping that many bases.
+        translate : bool (default: False)
+            Translate the sequences into protein sequences
+        genetic_code : str (default: the standard code)
+            The genetic code used to translate, see codec.translate
+
+        Returns
+        -------
+        A generator of (transcript, sequence) tuples where transcript
+        is the parent LocusView of the segments
+        """
+        # Segments with a parent sublocus (e.g. mRNA) belong to it,
+        # otherwise they belong to the top level locus
+        segments = loci.m80.db.cursor().execute(
+            """
+            SELECT parent_LID IS NOT NULL, COALESCE(parent_LID, root_LID),
+                chromosome, start, end, strand, frame
+            FROM subloci
+            WHERE feature_type = ?
+            ORDER BY chromosome
+            """,
+            (feature_type,),
+        )
+        groups = defaultdict(list)
+        for (is_sub, LID, chrom, *segment) in segments:
+            groups[chrom].append((is_sub, LID, *segment))
+        for chrom_name, group in groups.items():
+            seq = np.asarray(self[chrom_name].seq)
+            is_sub, LIDs, starts, ends, strand, frame = zip(*group)
+            parents = np.array(LIDs, dtype=np.int64) * 2 + np.array(is_sub, dtype=bool)
+            starts = np.array(starts, dtype=np.int64) - 1
+            ends = np.array(ends, dtype=np.int64)
+            minus = np.array(strand) == "-"
+            frame = np.array([0 if x is None else int(x) for x in frame])
+            # Sort the segments of each transcript in strand order
+            order = np.lexsort((np.where(minus, -starts, starts), parents))
+            parents, starts, ends, minus, frame = (
+                x[order] for x in (parents, starts, ends, minus, frame)
+            )
+            # Skip the frame of the first segment of each transcript
+            first = np.concatenate(([True], parents[1:] != parents[:-1]))
+            skip = np.where(first, frame, 0)
+            starts = starts + np.where(minus, 0, skip)
+            ends = ends - np.where(minus, skip, 0)
+            codes, offsets = _gather(seq, starts, ends, minus)
+            # Segment offsets of the first segment of each transcript
+            bounds = np.append(offsets[:-1][first], offsets[-1])
+            if translate:
+                lengths = np.diff(bounds) // 3
+                codon_bounds = np.concatenate(([0], np.cumsum(lengths)))
+                codon_starts = np.repeat(bounds[:-1], lengths) + 3 * (
+                    np.arange(codon_bounds[-1]) - np.repeat(codon_bounds[:-1], lengths)
+                )
+                lut = _codon_lut(genetic_code)
+                text = lut[_codon_index(codes, codon_starts)].tobytes().decode()
+                bounds = codon_bounds
+            else:
+                text = decode(codes)
+            for parent, a, b in zip(parents[first], bounds[:-1], bounds[1:]):
+                view = LocusView(int(parent // 2), loci, sublocus=bool(parent % 2))
+                yield view, text[a:b]
+
+    def to_fasta(
+        self,
+        filename,
+        line_length=70,
+        compression="infer",
+        index=True,
+        block_lines=16384,
+    ):
+        """
+        Write the chromosomes to a file in FASTA format. Sequences are
+        decoded and wrapped into lines a large block at a time and
+        a samtools compatible index (.fai) is written in the same pass.
+
+        Paramaters
+        ----------
+        filename : str
+            The output filename
+        line_length : int (default: 70)
+            The number of nucleotides per line
+        compression : str (default: 'infer')
+            One of None, 'gzip' or 'bgzip'. By default files ending
+            in .gz are compressed with bgzip (BGZF), which any gzip
+            reader can read and which can be accessed randomly with
+            `Fasta.from_indexed_file`. Compression runs in a
+            background thread.
+        index : bool (default: True)
+            Write the .fai index (and the .gzi index for bgzip).
+            Plain gzip files cannot be indexed.
+        block_lines : int (default: 16384)
+            The number of lines decoded at a time
+        Returns
+        -------
+        None
+        """
+        filename = str(filename)
+        if compression == "infer":
+            compression = "bgzip" if filename.endswith(".gz") else None
+        if compression == "bgzip":
+            handle = BgzfWriter(filename)
+            out = _ThreadedWriter(handle)
+        elif compression == "gzip":
+            out = _ThreadedWriter(gzip.open(filename, "wb", compresslevel=6))
+        elif compression is None:
+            out = open(filename, "wb", buffering=2**20)
+        else:
+            raise ValueError("compression must be one of None, 'gzip' or 'bgzip'")
+        records = []
+        offset = 0
+        block = line_length * block_lines
+        try:
+            for chrom_name in self.chrom_names():
+                chrom = self[chrom_name]
+                header = "".join([f">{chrom_name}"] + [f" {x}" for x in chrom._attrs])
+                header = f"{header}\n".encode()
+                out.write(header)
+                offset += len(header)
+                records.append(
+                    FaiRecord(
+                        chrom_name, len(chrom), offset, line_length, line_length + 1
+                    )
+                )
+                for start in range(0, len(chrom), block):
+                    data = _wrap(
+                        np.asarray(chrom.seq[start : start + block]), line_length
+                    )
+                    out.write(data)
+                    offset += len(data)
+        finally:
+            out.close()
+        if index and compression != "gzip":
+            write_fai(records, filename + ".fai")
+            if compression == "bgzip":
+                write_gzi(handle.index, filename + ".gzi")
+        return None
+
+    def _add_attribute(self, chrom_name, attr, cur=None):
         """
         Add an attribute the the Fasta object.
         Attributes describe chromosomes and
@@ -342,6 +1998,191 @@ class Fasta(Freezable):
             """,
             (nickname, chrom),
         )
+        self.cache_clear()
+
+    def _get_encoding(self, chrom_name):
+        """
+        Get the storage encoding of a chromosome, None
+        if the chromosome was stored by an older version
+        """
+        result = (
+            self.m80.db.cursor()
+            .execute("SELECT encoding FROM encodings WHERE chrom = ?", (chrom_name,))
+            .fetchone()
+        )
+        return None if result is None else result[0]
+
+    def _get_offset(self, chrom_name):
+        """
+        Get the offset of a chromosome in the flat sequence
+        file, None if it is stored elsewhere
+        """
+        result = (
+            self.m80.db.cursor()
+            .execute("SELECT offset FROM seq_offsets WHERE chrom = ?", (chrom_name,))
+            .fetchone()
+        )
+        return None if result is None else result[0]
+
+    def _store_seq(self, chrom_name, seq, encoding, cur=None, summary=None):
+        """
+        Store the sequence array of a chromosome, along with its
+        summary (see `_summarize`), which is computed if not given
+        """
+        if encoding != "2bit":
+            self._store_chunks(chrom_name, [seq], cur=cur, summary=summary)
+            return
+        if cur is None:
+            cur = self.m80.db.cursor()
+        self._store_summary(
+            chrom_name, _summarize(seq) if summary is None else summary, cur=cur
+        )
+        packed, exceptions, lower = pack_2bit(seq)
+        self.m80.col[f"{chrom_name}__2bit"] = packed
+        self.m80.col[f"{chrom_name}__exceptions"] = exceptions
+        self.m80.col[f"{chrom_name}__lower"] = lower
+        cur.execute(
+            """
+            INSERT OR REPLACE INTO encodings
+                (chrom, encoding, length)
+            VALUES (?,?,?)
+            """,
+            (chrom_name, encoding, len(seq)),
+        )
+
+    def _store_summary(self, chrom_name, summary, cur=None):
+        self._store_stats(
+            chrom_name, summary.length, summary.counts, summary.digests, cur=cur
+        )
+        self._store_runs(chrom_name, summary.runs, cur=cur)
+
+    def _store_stats(self, chrom_name, length, counts, digests, cur=None):
+        if cur is None:
+            cur = self.m80.db.cursor()
+        cur.execute(
+            """
+            INSERT OR REPLACE INTO chrom_stats
+                (chrom, length, AT, GC, N, lower)
+            VALUES (?,?,?,?,?,?)
+            """,
+            (chrom_name, int(length), *(int(x) for x in counts)),
+        )
+        cur.execute(
+            """
+            INSERT OR REPLACE INTO seq_digests
+                (chrom, md5, sha512t24u)
+            VALUES (?,?,?)
+            """,
+            (chrom_name, *(digests[x] for x in DIGESTS)),
+        )
+
+    def _store_chunks(self, chrom_name, chunks, cur=None, summary=None):
+        """
+        Append the encoded chunks of a chromosome to the flat
+        sequence file (uint8 encoding). The summary of the sequence
+        (see `_summarize`) is built along the way if not given.
+        """
+        if cur is None:
+            cur = self.m80.db.cursor()
+        length = 0
+        summarizer = _Summarizer() if summary is None else None
+        # Append to the end of the flat file, the space of replaced
+        # sequences is only reclaimed by `compact`
+        with open(self._seq_file, "ab") as OUT:
+            offset = OUT.seek(0, os.SEEK_END)
+            for chunk in chunks:
+                OUT.write(np.ascontiguousarray(chunk, dtype=SEQ_DTYPE).data)
+                length += len(chunk)
+                if summarizer is not None:
+                    summarizer.update(chunk)
+        if summarizer is not None:
+            summary = summarizer.summary()
+        self._store_summary(chrom_name, summary, cur=cur)
+        cur.execute(
+            """
+            INSERT OR REPLACE INTO seq_offsets
+                (chrom, offset, length)
+            VALUES (?,?,?)
+            """,
+            (chrom_name, offset, length),
+        )
+        cur.execute(
+            """
+            INSERT OR REPLACE INTO encodings
+                (chrom, encoding, length)
+            VALUES (?,?,?)
+            """,
+            (chrom_name, "uint8", length),
+        )
+
+    def _map_seq(self, offset, length):
+        """
+        Returns a read only view into the flat sequence file
+        """
+        if length == 0:
+            return np.empty(0, dtype=SEQ_DTYPE)
+        # The file only grows, except when `compact` (possibly in another
+        # instance or process) replaces it with a new file. Remap when a
+        # view reaches past the current map or the file was replaced.
+        seq_file = self._seq_file
+        stat = os.stat(seq_file)
+        if (
+            self._seq_map is None
+            or (stat.st_dev, stat.st_ino) != self._seq_map_id
+            or offset + length > len(self._seq_map)
+        ):
+            with open(seq_file, "rb") as IN:
+                stat = os.fstat(IN.fileno())
+                self._seq_map = np.memmap(IN, dtype=SEQ_DTYPE, mode="r")
+            self._seq_map_id = (stat.st_dev, stat.st_ino)
+        return self._seq_map[offset : offset + length]
+
+    def _load_seq(self, chrom_name):
+        """
+        Load the sequence array of a chromosome
+        """
+        result = (
+            self.m80.db.cursor()
+            .execute(
+                """
+                SELECT e.encoding, e.length, o.offset, o.length
+                FROM encodings e
+                LEFT JOIN seq_offsets o ON e.chrom = o.chrom
+                WHERE e.chrom = ?
+                """,
+                (chrom_name,),
+            )
+            .fetchone()
+        )
+        if result is not None and result[0] == "2bit":
+            return unpack_2bit(
+                self.m80.col[f"{chrom_name}__2bit"],
+                result[1],
+                self.m80.col[f"{chrom_name}__exceptions"],
+                self.m80.col[f"{chrom_name}__lower"],
+            )
+        if result is not None and result[2] is not None:
+            return self._map_seq(result[2], result[3])
+        # Older datasets were stored in the columnar store (as int64
+        # before the encodings table existed), the values fit in a byte
+        return np.asarray(self.m80.col[chrom_name], dtype=SEQ_DTYPE)
+
+    def _remove_seq(self, chrom_name):
+        """
+        Remove the stored sequence of a chromosome
+        """
+        self._remove_composition(chrom_name)
+        self._remove_runs(chrom_name)
+        encoding = self._get_encoding(chrom_name)
+        if encoding == "2bit":
+            for suffix in ("2bit", "exceptions", "lower"):
+                self.m80.col.remove(f"{chrom_name}__{suffix}")
+        elif self._get_offset(chrom_name) is not None:
+            self.m80.db.cursor().execute(
+                "DELETE FROM seq_offsets WHERE chrom = ?", (chrom_name,)
+            )
+        else:
+            self.m80.col.remove(chrom_name)
 
     def _get_nickname(self, nickname):
         """
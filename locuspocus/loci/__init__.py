@@ -3,11 +3,12 @@ import apsw
 import gzip
 import random
 import logging
+import time
 
 import numpy as np
 import minus80 as m80
 
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 from pathlib import Path
 from minus80 import Freezable
@@ -44,6 +45,34 @@ def accepts_loci(fn):
     return wrapped
 
 
+def _sample_rows(rng, m: int, k: int, n: int) -> np.ndarray:
+    """
+    Draw n rows of k distinct integers in [0,m) at once.
+    Rows are drawn with replacement and then only the duplicated
+    values are redrawn, which converges quickly when k is small
+    compared to m. Otherwise random keys are used.
+    """
+    if k == 0:
+        return np.empty((n, 0), dtype=np.int64)
+    if k * 2 > m:
+        # Keep the matrix of random keys to a reasonable size
+        chunk = max(1, 10_000_000 // m)
+        rows = []
+        for i in range(0, n, chunk):
+            keys = rng.random((min(chunk, n - i), m))
+            rows.append(np.argpartition(keys, k - 1, axis=1)[:, :k])
+        return np.concatenate(rows) if rows else np.empty((0, k), dtype=np.int64)
+    draws = np.sort(rng.integers(0, m, size=(n, k)), axis=1)
+    while True:
+        dups = np.zeros(draws.shape, dtype=bool)
+        dups[:, 1:] = draws[:, 1:] == draws[:, :-1]
+        num_dups = dups.sum()
+        if num_dups == 0:
+            return draws
+        draws[dups] = rng.integers(0, m, size=num_dups)
+        draws.sort(axis=1)
+
+
 # --------------------------------------------------
 #       Class Definition
 # --------------------------------------------------
@@ -56,7 +85,13 @@ class Loci(Freezable):
     live on the disk in a database.
     """
 
-    def __init__(self, name: str, rootdir: Optional[str] = None):
+    def __init__(
+        self,
+        name: str,
+        rootdir: Optional[str] = None,
+        lookup_cache: bool = False,
+        refresh_interval: float = 1.0,
+    ):
         """
         Initialize a new Locus object
 
@@ -68,20 +103,238 @@ class Loci(Freezable):
         rootdir : str
             The base directory to store the files related to the dataset
             If not specified, the default will be taken from the config file
+        lookup_cache : bool (default: False)
+            If True, the name->LID and hash->LID mappings are loaded
+            into memory on first use so that lookups by name or Locus
+            (e.g. `loci['GRMZM2G158729']`) do not hit the database.
+            Loci added through this object are written through to the
+            cache once they are committed.
+        refresh_interval : float (default: 1.0)
+            Changes committed through other connections (e.g. other
+            processes) are noticed by the caches within this many
+            seconds, or right away after `refresh`. Checking is kept
+            off the lookup path, 0 checks on every lookup. Changes
+            made through this object are always seen immediately.
         """
         # set up the freezable API
         super().__init__(name, rootdir=rootdir)
         self.name = name
         self._initialize_tables()
-        self._cached_LIDs = None
+        self.lookup_cache = lookup_cache
+        # Derived caches are stored with the version of the tables they
+        # were built from (see `_CACHE_TABLES`)
+        self._generations = {}
+        self._caches = {}
+        self.refresh_interval = refresh_interval
+        self._data_version = None
+        self._data_version_time = 0.0
+        # Loci added within a transaction that has not ended yet, they are
+        # only written through to the lookup caches once committed
+        # (see `_settle_pending`)
+        self._pending = []
+        self._pending_LIDs = {"name_LIDs": {}, "hash_LIDs": {}}
+
+    # -----------------------------------------
+    #       Caches
+    # -----------------------------------------
+
+    # The tables each derived cache is built from
+    _CACHE_TABLES = {
+        "LIDs": ("loci",),
+        "name_LIDs": ("loci",),
+        "hash_LIDs": ("loci",),
+        "columns": ("loci",),
+    }
+
+    # Every table written through this object, see `_bump_generation`
+    _TABLES = ("loci", "subloci", "loci_attrs", "subloci_attrs", "positions")
+
+    def _version(self, key: str) -> Tuple[Tuple[int, ...], int]:
+        """
+        A token that changes whenever a table the cached value
+        `key` is built from is written to.
+
+        The first value holds the generations of the tables, bumped
+        by every write made through this object (see
+        `_bump_generation`), the second is SQLite's `data_version`,
+        which changes when another connection (e.g. another process)
+        commits a change to the database. It is read at most once per
+        `refresh_interval` (see `refresh`).
+        """
+        now = time.monotonic()
+        if (
+            self._data_version is None
+            or now - self._data_version_time >= self.refresh_interval
+        ):
+            (self._data_version,) = (
+                self.m80.db.cursor().execute("PRAGMA data_version").fetchone()
+            )
+            self._data_version_time = now
+        generations = tuple(
+            self._generations.get(table, 0) for table in self._CACHE_TABLES[key]
+        )
+        return (generations, self._data_version)
+
+    def refresh(self) -> None:
+        """
+        Check for changes committed through other connections
+        (e.g. other processes) on the next lookup instead of
+        within `refresh_interval`
+        """
+        self._data_version = None
+
+    def _bump_generation(self, tables: Optional[Tuple[str, ...]] = None) -> None:
+        """
+        Mark the derived caches built from any of `tables` (default:
+        all of them) as stale. This needs to be called by every method
+        that writes to the database.
+        """
+        for table in self._TABLES if tables is None else tables:
+            self._generations[table] = self._generations.get(table, 0) + 1
+
+    def _clear_caches(self) -> None:
+        self._caches.clear()
+        self._clear_pending()
+
+    def _clear_pending(self) -> None:
+        self._pending.clear()
+        for pending in self._pending_LIDs.values():
+            pending.clear()
+
+    def _in_transaction(self, cur=None) -> bool:
+        if cur is None:
+            cur = self.m80.db.cursor()
+        return not cur.getconnection().getautocommit()
+
+    def _settle_pending(self) -> None:
+        """
+        Once the transaction loci were added in has ended, write
+        the committed loci through to the lookup caches. If it was
+        rolled back, every cache is dropped since any of them may
+        have been built from the uncommitted rows.
+        """
+        if not self._pending:
+            return
+        cur = self.m80.db.cursor()
+        if self._in_transaction(cur):
+            return
+        pending = list(self._pending)
+        LIDs = [LID for LID, _, _ in pending]
+        stored = set(
+            cur.execute(
+                "SELECT LID, hash FROM loci WHERE LID BETWEEN ? AND ?",
+                (min(LIDs), max(LIDs)),
+            )
+        )
+        if not all((LID, h) in stored for LID, _, h in pending):
+            self._clear_caches()
+            return
+        self._clear_pending()
+        for LID, name, locus_hash in pending:
+            for key, value in (("name_LIDs", name), ("hash_LIDs", locus_hash)):
+                entry = self._caches.get(key)
+                if entry is not None and value is not None:
+                    entry[1].setdefault(value, LID)
+
+    def _cached(self, key: str, build):
+        """
+        Return a derived value from the cache, rebuilding it
+        if the database has changed since it was built.
+
+        Parameters
+        ----------
+        key : str
+            The name of the cached value
+        build : callable
+            Called with no arguments to (re)build the value
+        """
+        self._settle_pending()
+        version = self._version(key)
+        entry = self._caches.get(key)
+        if entry is None or entry[0] != version:
+            entry = (version, build())
+            self._caches[key] = entry
+        return entry[1]
+
+    def _write_through(self, key: str, version: Tuple[int, int], update) -> None:
+        """
+        Update a cached value in place after a write instead of
+        invalidating it. The update is only applied if the cached
+        value was current as of `version` (the version before the
+        write), otherwise the value is stale and is left to be rebuilt.
+        """
+        entry = self._caches.get(key)
+        if entry is not None and entry[0] == version:
+            update(entry[1])
+            self._caches[key] = (self._version(key), entry[1])
 
     @property
     def _LIDs(self) -> List[int]:
-        if self._cached_LIDs is None:
-            self._cached_LIDs = [
+        return self._cached(
+            "LIDs",
+            lambda: [
                 LID for (LID,) in self.m80.db.cursor().execute("SELECT LID FROM loci")
-            ]
-        return self._cached_LIDs
+            ],
+        )
+
+    @property
+    def _name_LIDs(self) -> Dict[str, int]:
+        return self._cached(
+            "name_LIDs",
+            lambda: {
+                name: LID
+                for (name, LID) in self.m80.db.cursor().execute(
+                    # Preserve the first LID for duplicated names, like _get_LID
+                    "SELECT name, LID FROM loci WHERE name IS NOT NULL ORDER BY LID DESC"
+                )
+            },
+        )
+
+    @property
+    def _hash_LIDs(self) -> Dict[int, int]:
+        return self._cached(
+            "hash_LIDs",
+            lambda: {
+                h: LID
+                for (h, LID) in self.m80.db.cursor().execute(
+                    "SELECT hash, LID FROM loci ORDER BY LID DESC"
+                )
+            },
+        )
+
+    @property
+    def _columns(self) -> Dict[str, np.ndarray]:
+        """
+        The core locus fields as (LID ordered) numpy arrays, for
+        vectorized operations over all loci.
+        """
+
+        def build():
+            rows = (
+                self.m80.db.cursor()
+                .execute(
+                    """
+                    SELECT LID, chromosome, start, end, feature_type
+                    FROM loci ORDER BY LID
+                    """
+                )
+                .fetchall()
+            )
+            LID, chromosome, start, end, feature_type = (
+                zip(*rows) if rows else ([], [], [], [], [])
+            )
+            start = np.array(start, dtype=np.int64)
+            end = np.array(end, dtype=np.int64)
+            return {
+                "LID": np.array(LID, dtype=np.int64),
+                "chromosome": np.array(chromosome, dtype=object),
+                "start": start,
+                "end": end,
+                "length": np.abs(end - start) + 1,
+                "feature_type": np.array(feature_type, dtype=object),
+            }
+
+        return self._cached("columns", build)
 
     def __len__(self) -> int:
         """
@@ -124,6 +377,9 @@ class Loci(Freezable):
         the loci.
         """
         LID = self._get_LID(item)
+        if self.lookup_cache and isinstance(item, (str, Locus)):
+            # The LID came from the cache, no need to check it exists
+            return LocusView(LID, self)
         return self._get_locus_by_LID(LID)
 
     def __iter__(self):
@@ -162,6 +418,9 @@ class Loci(Freezable):
 
         if cur is None:
             cur = self.m80.db.cursor()
+        versions = {
+            key: self._version(key) for key in ("LIDs", "name_LIDs", "hash_LIDs")
+        }
         # insert the core feature data
         core, attrs = locus.as_record()
         cur.execute(
@@ -197,6 +456,28 @@ class Loci(Freezable):
             """,
             (LID, locus.start, locus.end, locus.chromosome),
         )
+        self._bump_generation()
+        name, locus_hash = core[7], core[8]
+        if self._in_transaction(cur):
+            # The transaction can still be rolled back, keep the LID out of
+            # the lookup caches until it ends (see `_settle_pending`)
+            self._pending.append((LID, name, locus_hash))
+            if name is not None:
+                self._pending_LIDs["name_LIDs"].setdefault(name, LID)
+            self._pending_LIDs["hash_LIDs"].setdefault(locus_hash, LID)
+            for key in ("name_LIDs", "hash_LIDs"):
+                self._write_through(key, versions[key], lambda x: None)
+            self._caches.pop("LIDs", None)
+            return LID
+        # Write through to the lookup caches (if they have been loaded)
+        if name is not None:
+            self._write_through(
+                "name_LIDs", versions["name_LIDs"], lambda x: x.setdefault(name, LID)
+            )
+        self._write_through(
+            "hash_LIDs", versions["hash_LIDs"], lambda x: x.setdefault(locus_hash, LID)
+        )
+        self._write_through("LIDs", versions["LIDs"], lambda x: x.append(LID))
         return LID
 
     def import_gff(
@@ -259,16 +540,132 @@ class Loci(Freezable):
                 current_locus.add_sublocus(locus, find_parent=True)
         log.info((f"Found {len(loci)} loci, adding to database"))
         IN.close()
-        with self.m80.db.bulk_transaction() as cur:
-            for l in loci:
-                self.add_locus(l, cur=cur)
+        try:
+            with self.m80.db.bulk_transaction() as cur:
+                for l in loci:
+                    self.add_locus(l, cur=cur)
+        except Exception as e:
+            # The transaction was rolled back, drop any written through values
+            self._clear_caches()
+            raise e
         log.info("Done!")
         return None
 
-    def rand(self, n: int = 1, distinct: bool = True, autopop: bool = True):
+    def set_attr(
+        self,
+        key: str,
+        values,
+        /,
+        loci=None,
+        sublocus: bool = False,
+    ) -> int:
+        """
+        Set an attribute for many loci at once. All the values
+        are written in a single bulk transaction, which is much
+        faster than setting attrs one LocusView at a time.
+
+        Parameters
+        ----------
+        key : str
+            The attr key to set, e.g. 'pval'
+        values : dict, pandas.Series, or array-like
+            The attr values. If a dict or Series, the keys (index)
+            are used to identify the loci. Otherwise, `loci` must
+            also be provided and be the same length as `values`.
+        loci : array-like of (int,str,Locus) (default: None)
+            The LIDs, names or Locus objects corresponding to
+            `values`. Only used when values is not a dict or
+            Series.
+        sublocus : bool (default: False)
+            If True, the LIDs/names refer to subloci instead of
+            (top level) loci. NOTE: sublocus names are not
+            guaranteed to be unique, values set by name are applied
+            to each sublocus with that name.
+
+        Returns
+        -------
+        The number of attrs that were written
+
+        Raises
+        ------
+        `MissingLocusError` if a name or LID cannot be found
+        """
+        if isinstance(values, dict):
+            loci, values = list(values.keys()), list(values.values())
+        elif hasattr(values, "index") and hasattr(values, "values"):
+            # pandas Series
+            loci, values = list(values.index), list(values.values)
+        else:
+            if loci is None:
+                raise ValueError("loci must be provided if values is not a mapping")
+            loci, values = list(loci), list(values)
+            if len(loci) != len(values):
+                raise ValueError("loci and values must be the same length")
+        table = "subloci" if sublocus else "loci"
+        cur = self.m80.db.cursor()
+        # Resolve the LIDs in bulk
+        valid_LIDs = None
+        name_map = None
+        records = []
+        for locus, val in zip(loci, values):
+            # NumPy scalars need to be converted to python types
+            if isinstance(val, np.generic):
+                val = val.item()
+            if isinstance(locus, np.generic):
+                locus = locus.item()
+            if isinstance(locus, str):
+                if name_map is None:
+                    name_map = {}
+                    for LID, name in cur.execute(f"SELECT LID, name FROM {table}"):
+                        name_map.setdefault(name, []).append(LID)
+                if locus not in name_map:
+                    raise MissingLocusError(f"Cannot find LID for Locus: {locus}")
+                records.extend((LID, key, val) for LID in name_map[locus])
+            elif isinstance(locus, int):
+                if valid_LIDs is None:
+                    valid_LIDs = set(
+                        LID for (LID,) in cur.execute(f"SELECT LID FROM {table}")
+                    )
+                if locus not in valid_LIDs:
+                    raise MissingLocusError(f"Cannot find Locus for LID: {locus}")
+                records.append((locus, key, val))
+            elif isinstance(locus, Locus) and not sublocus:
+                records.append((self._get_LID(locus, cursor=cur), key, val))
+            else:
+                raise MissingLocusError(f"Cannot find LID for Locus: {locus}")
+        with self.m80.db.bulk_transaction() as cur:
+            cur.executemany(
+                f"""
+                INSERT OR REPLACE INTO {table}_attrs
+                    (LID,key,val)
+                    VALUES (?,?,?)
+                """,
+                records,
+            )
+        self._bump_generation((f"{table}_attrs",))
+        return len(records)
+
+    def rand(
+        self,
+        n: int = 1,
+        distinct: bool = True,
+        autopop: bool = True,
+        seed: Optional[int] = None,
+        feature_type: Optional[str] = None,
+        chromosome: Optional[str] = None,
+        min_length: Optional[int] = None,
+        max_length: Optional[int] = None,
+        attrs: Optional[Dict[str, str]] = None,
+    ):
         """
         Fetch random Loci
 
+        The sampling is done on rowids directly when the matching
+        LIDs are contiguous, otherwise while streaming LIDs out of the
+        database (reservoir sampling), so the full list of LIDs is
+        never held in memory. Optionally, the loci can be restricted to those
+        matching some criteria.
+
         Parameters
         ----------
         n : int (default=1)
@@ -282,24 +679,178 @@ class Loci(Freezable):
         autopop : bool (default: True)
             If true and only 1 locus is requested, a Locus object
             will be returned instead of a list (with a single element)
+        seed : int (default: None)
+            Seed for the random number generator, for reproducible
+            samples.
+        feature_type : str (default: None)
+            Only sample loci with this feature_type (e.g. 'gene')
+        chromosome : str (default: None)
+            Only sample loci on this chromosome
+        min_length : int (default: None)
+            Only sample loci at least this long (in bp)
+        max_length : int (default: None)
+            Only sample loci at most this long (in bp)
+        attrs : dict (default: None)
+            Only sample loci whose attrs match all of the key/value
+            pairs, e.g. {'biotype':'protein_coding'}
 
         Returns
         -------
         A list of n Locus objects
 
         """
-        loci = set()
-        if n > len(self._LIDs):
+        rng = random.Random(seed)
+        query, params = self._filter_query(
+            feature_type=feature_type,
+            chromosome=chromosome,
+            min_length=min_length,
+            max_length=max_length,
+            attrs=attrs,
+        )
+        cur = self.m80.db.cursor()
+        (num_loci, min_LID, max_LID) = cur.execute(
+            f"SELECT COUNT(*), MIN(LID), MAX(LID) FROM ({query})", params
+        ).fetchone()
+        if n > num_loci and (distinct or num_loci == 0):
             raise ValueError("More than the maximum loci in the database was requested")
-        if distinct == True:
-            LIDs = random.sample(self._LIDs, n)
+        if num_loci > 0 and num_loci == max_LID - min_LID + 1:
+            # The matching LIDs are contiguous, sample the rowids directly
+            LID_range = range(min_LID, max_LID + 1)
+            if distinct:
+                LIDs = rng.sample(LID_range, n)
+            else:
+                LIDs = rng.choices(LID_range, k=n)
+        elif distinct:
+            # Reservoir sampling (Algorithm R)
+            LIDs = []
+            for i, (LID,) in enumerate(cur.execute(query, params)):
+                if i < n:
+                    LIDs.append(LID)
+                else:
+                    j = rng.randint(0, i)
+                    if j < n:
+                        LIDs[j] = LID
+            rng.shuffle(LIDs)
         else:
-            LIDs = random.choices(self._LIDs, n)
-        loci = [self._get_locus_by_LID(x) for x in LIDs]
+            # Draw the row numbers first, then pick them out of the stream
+            ranks = sorted(rng.randrange(num_loci) for _ in range(n))
+            LIDs = []
+            k = 0
+            for i, (LID,) in enumerate(cur.execute(query, params)):
+                while k < n and ranks[k] == i:
+                    LIDs.append(LID)
+                    k += 1
+                if k == n:
+                    break
+            rng.shuffle(LIDs)
+        # The LIDs came straight from the table, no need to validate them
+        loci = [LocusView(x, self) for x in LIDs]
         if autopop and len(loci) == 1:
             loci = loci[0]
         return loci
 
+    def rand_sets(
+        self,
+        n_sets: int,
+        /,
+        size: Optional[int] = None,
+        query=None,
+        match: Optional[Union[str, List[str]]] = None,
+        length_bins: int = 10,
+        feature_type: Optional[str] = None,
+        seed: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Draw many random sets of loci at once, e.g. to build a null
+        distribution for permutation tests. Instead of Locus objects,
+        the sets are returned as a matrix of LIDs so that thousands of
+        sets can be drawn in one vectorized operation.
+
+        The random sets can optionally be matched to a query set of
+        loci, so that each random set has the same distribution of
+        locus lengths and/or chromosomes as the query set.
+
+        >>> null = loci.rand_sets(10000, query=genes, match='length')
+        >>> null.shape
+        (10000, len(genes))
+
+        Parameters
+        ----------
+        n_sets : int
+            The number of random sets to draw
+        size : int (default: None)
+            The number of loci in each set. Defaults to the number
+            of loci in `query`.
+        query : iterable of (Locus,str,int) (default: None)
+            A set of loci (or their names or LIDs) that the random
+            sets will be matched to. Required if `match` is set.
+        match : str or list of str (default: None)
+            One or both of 'length' and 'chromosome'. Random sets are
+            drawn so that they contain the same number of loci from
+            each length bin and/or chromosome as the query set.
+        length_bins : int (default: 10)
+            The number of (quantile) bins used to match on length.
+        feature_type : str (default: None)
+            Only draw loci with this feature_type (e.g. 'gene')
+        seed : int (default: None)
+            Seed for the random number generator
+
+        Returns
+        -------
+        A (n_sets, size) numpy array of LIDs. Loci are distinct within
+        each set (row).
+        """
+        rng = np.random.default_rng(seed)
+        cols = self._columns
+        background = np.arange(len(cols["LID"]))
+        if feature_type is not None:
+            background = background[cols["feature_type"][background] == feature_type]
+        if isinstance(match, str):
+            match = [match]
+        match = [] if match is None else list(match)
+        for m in match:
+            if m not in ("length", "chromosome"):
+                raise ValueError(f"Cannot match on '{m}', use 'length' or 'chromosome'")
+        if query is not None:
+            query = self._LID_index(query)
+            if size is None:
+                size = len(query)
+            elif size != len(query):
+                raise ValueError("size must match the number of query loci")
+        elif match:
+            raise ValueError("A query set is required to match random sets")
+        if size is None:
+            raise ValueError("Either size or query must be specified")
+        # Assign each locus to a stratum, unmatched sets use a single stratum
+        strata = np.zeros(len(cols["LID"]), dtype=np.int64)
+        if "chromosome" in match:
+            _, chrom_codes = np.unique(cols["chromosome"], return_inverse=True)
+            strata = chrom_codes.astype(np.int64)
+        if "length" in match:
+            lengths = cols["length"]
+            edges = np.unique(
+                np.quantile(lengths[background], np.linspace(0, 1, length_bins + 1))
+            )
+            length_codes = np.searchsorted(edges[1:-1], lengths, side="right")
+            strata = strata * (len(edges) + 1) + length_codes
+        if match:
+            query_strata, query_counts = np.unique(strata[query], return_counts=True)
+        else:
+            query_strata, query_counts = np.array([0]), np.array([size])
+        sets = np.empty((n_sets, size), dtype=np.int64)
+        offset = 0
+        for stratum, k in zip(query_strata, query_counts):
+            pool = background[strata[background] == stratum]
+            if k > len(pool):
+                raise ValueError(
+                    f"Not enough loci to match the query set "
+                    f"(need {k} loci from a pool of {len(pool)})"
+                )
+            draws = _sample_rows(rng, len(pool), k, n_sets)
+            sets[:, offset : offset + k] = cols["LID"][pool[draws]]
+            offset += k
+        return sets
+
     @accepts_loci
     def within(self, locus, partial=False, ignore_strand=False, same_strand=False):
         """
@@ -413,6 +964,7 @@ class Loci(Freezable):
         partial=False,
         same_strand=False,
         force_strand=None,
+        chrom_lengths: Optional[Dict[str, int]] = None,
     ):
         """
         Find loci upstream of a locus.
@@ -465,9 +1017,17 @@ class Loci(Freezable):
                 as the input locus will be returned,
                 otherwise, the method will return loci
                 on either strand.
+            chrom_lengths : dict (default: None)
+                Chromosome lengths (e.g. from Fasta.lengths), the
+                search region is clipped at the chromosome end
         """
+        chrom_length = (
+            None if chrom_lengths is None else chrom_lengths[locus.chromosome]
+        )
         # calculate the start and stop anchors
-        start, end = sorted([locus.stranded_start, locus.upstream(max_distance)])
+        start, end = sorted(
+            [locus.stranded_start, locus.upstream(max_distance, chrom_length)]
+        )
         # The dummy locus needs to have the opposite "strand" so the loci
         # are returned in the correct order
         dummy_strand = "+" if locus.strand == "-" else "-"
@@ -496,6 +1056,7 @@ class Loci(Freezable):
         partial=False,
         ignore_strand=False,
         same_strand=False,
+        chrom_lengths: Optional[Dict[str, int]] = None,
     ):
         """
         Returns loci downstream of a locus.
@@ -550,9 +1111,17 @@ class Loci(Freezable):
                 as the input locus will be returned,
                 otherwise, the method will return loci
                 on either strand.
+            chrom_lengths : dict (default: None)
+                Chromosome lengths (e.g. from Fasta.lengths), the
+                search region is clipped at the chromosome end
         """
+        chrom_length = (
+            None if chrom_lengths is None else chrom_lengths[locus.chromosome]
+        )
         # calculate the start and stop anchors
-        start, end = sorted([locus.stranded_end, locus.downstream(max_distance)])
+        start, end = sorted(
+            [locus.stranded_end, locus.downstream(max_distance, chrom_length)]
+        )
         # The dummy locus needs to have the same strand so that
         # are returned in the correct order
         dummy_strand = "+" if locus.strand == "+" else "-"
@@ -668,6 +1237,64 @@ class Loci(Freezable):
                 root_LID=root_LID, parent_LID=LID, subloci=l.subloci, cur=cur
             )
 
+    def _LID_index(self, loci) -> np.ndarray:
+        """
+        Convert loci (Locus objects, names or LIDs) into
+        their row indices in `_columns`
+        """
+        LIDs = []
+        for l in loci:
+            if isinstance(l, (int, np.integer)):
+                LIDs.append(int(l))
+            else:
+                LIDs.append(self._get_LID(l))
+        LIDs = np.array(LIDs, dtype=np.int64)
+        all_LIDs = self._columns["LID"]
+        index = np.searchsorted(all_LIDs, LIDs)
+        index[index == len(all_LIDs)] = 0
+        if len(all_LIDs) == 0 or np.any(all_LIDs[index] != LIDs):
+            raise MissingLocusError("Cannot find Locus for some of the LIDs")
+        return index
+
+    def _filter_query(
+        self,
+        feature_type: Optional[str] = None,
+        chromosome: Optional[str] = None,
+        min_length: Optional[int] = None,
+        max_length: Optional[int] = None,
+        attrs: Optional[Dict[str, str]] = None,
+    ) -> Tuple[str, tuple]:
+        """
+        Build a query (and its parameters) that selects the LIDs
+        of loci matching the criteria, in LID order.
+        """
+        clauses = []
+        params = []
+        if feature_type is not None:
+            clauses.append("l.feature_type = ?")
+            params.append(feature_type)
+        if chromosome is not None:
+            clauses.append("l.chromosome = ?")
+            params.append(str(chromosome))
+        if min_length is not None:
+            clauses.append("(ABS(l.end - l.start) + 1) >= ?")
+            params.append(int(min_length))
+        if max_length is not None:
+            clauses.append("(ABS(l.end - l.start) + 1) <= ?")
+            params.append(int(max_length))
+        if attrs is not None:
+            for key, val in attrs.items():
+                clauses.append(
+                    "EXISTS (SELECT 1 FROM loci_attrs a "
+                    "WHERE a.LID = l.LID AND a.key = ? AND a.val = ?)"
+                )
+                params.extend([key, val])
+        query = "SELECT l.LID FROM loci l"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY l.LID"
+        return query, tuple(params)
+
     def _get_locus_by_LID(self, LID: int) -> LocusView:
         """
         Get a locus by its LID
@@ -712,6 +1339,19 @@ class Loci(Freezable):
         An integer Locus ID (LID)
 
         """
+        if self.lookup_cache and isinstance(locus, (str, Locus)):
+            if isinstance(locus, str):
+                key, LIDs = locus, self._name_LIDs
+            else:
+                key, LIDs = hash(locus), self._hash_LIDs
+            LID = LIDs.get(key)
+            if LID is None:
+                # Loci added in the current (still open) transaction
+                kind = "name_LIDs" if isinstance(locus, str) else "hash_LIDs"
+                LID = self._pending_LIDs[kind].get(key)
+            if LID is None:
+                raise MissingLocusError(f"Cannot find LID for Locus: {locus}")
+            return LID
         if cursor is None:
             cur = self.m80.db.cursor()
         else:
@@ -753,6 +1393,7 @@ class Loci(Freezable):
                 DROP TABLE IF EXISTS positions;
             """
         )
+        self._bump_generation()
         self._initialize_tables()
 
     def _initialize_tables(self):
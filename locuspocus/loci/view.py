@@ -80,6 +80,7 @@ class AttrsView(LocusAttrs):
         """,
             (self.parent._LID, key, val),
         )
+        self.parent._ref._bump_generation((self.table,))
 
     def __repr__(self):
         return "{" + ",".join([":".join([x, y]) for x, y in self.items()]) + "}"
@@ -226,7 +226,7 @@ class Locus:
         """
         return (self.start, self.end)
 
-    def upstream(self, distance: int) -> int:
+    def upstream(self, distance: int, chrom_length: Optional[int] = None) -> int:
         """
         Calculates a base pair position 5' of the
         locus.
@@ -235,13 +235,17 @@ class Locus:
         ----------
         distance : int
             The distance upstream of the locus
+        chrom_length : int (default: None)
+            The length of the chromosome, if given the position
+            will not be past the end of the chromosome
+            (see Fasta.lengths)
         """
         if self.strand == "+":
             return max(0, self.start - distance)
         elif self.strand == "-":
-            return self.end + distance
+            return self._clip(self.end + distance, chrom_length)
 
-    def downstream(self, distance: int) -> int:
+    def downstream(self, distance: int, chrom_length: Optional[int] = None) -> int:
         """
         Calculates a base pair position 3' of the
         locus
@@ -250,12 +254,21 @@ class Locus:
         ----------
         distance : int
             The distance downstream of the locus
+        chrom_length : int (default: None)
+            The length of the chromosome, if given the position
+            will not be past the end of the chromosome
+            (see Fasta.lengths)
         """
         if self.strand == "+":
-            return self.end + distance
+            return self._clip(self.end + distance, chrom_length)
         elif self.strand == "-":
-            return max(0, self.start) - distance
-        # return self.end + distance
+            return max(0, self.start - distance)
+
+    @staticmethod
+    def _clip(position, chrom_length):
+        if chrom_length is None:
+            return position
+        return min(position, chrom_length)
 
     @property
     def center(self):
@@ -0,0 +1,183 @@
+"""
+K-mer counting and motif scanning over encoded sequences.
+
+Both work directly on code arrays (see Nucleotide) without decoding
+them: bases are mapped to small integers (or bit masks) with a
+single table lookup and every position of the sequence is handled
+at once. Long sequences are processed a few MB at a time.
+"""
+
+import numpy as np
+
+from itertools import product
+
+from .codec import SEQ_DTYPE, Nucleotide, _CODON_INDEX
+
+__all__ = ["MAX_K", "IUPAC", "kmer_counts", "kmer_labels", "find_motif"]
+
+# The largest k for which counts are kept for all 4**k k-mers
+MAX_K = 12
+
+# The bases matched by each IUPAC code, as bits: A=1, C=2, G=4, T(U)=8
+IUPAC = {
+    "A": 1,
+    "C": 2,
+    "G": 4,
+    "T": 8,
+    "U": 8,
+    "R": 5,
+    "Y": 10,
+    "S": 6,
+    "W": 9,
+    "K": 12,
+    "M": 3,
+    "B": 14,
+    "D": 13,
+    "H": 11,
+    "V": 7,
+    "N": 15,
+}
+
+# Maps a code to its bit (see IUPAC), 0 for bases that never match
+_BASE_BITS = np.zeros(256, dtype=np.uint8)
+for _base in "ACGTU":
+    _BASE_BITS[Nucleotide[_base].value] = IUPAC[_base]
+    _BASE_BITS[Nucleotide[_base.lower()].value] = IUPAC[_base]
+
+_CHUNK_SIZE = 2**22
+
+
+def _chunks(length, overlap, chunk_size):
+    """
+    Yields the starts of chunks that overlap by enough bases
+    that no window is split between two chunks
+    """
+    step = max(chunk_size - overlap, 1)
+    return range(0, max(length - overlap, 1), step)
+
+
+def kmer_counts(codes, k, canonical=False, chunk_size=_CHUNK_SIZE):
+    """
+    Count the k-mers of an encoded sequence. Each k-mer is the
+    integer made of its bases (A=0, C=1, G=2, T/U=3, 2 bits each,
+    first base in the highest bits), case is ignored and k-mers
+    containing other bases (e.g. N) are not counted.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        The encoded sequence (see Nucleotide)
+    k : int
+        The k-mer length, at most MAX_K
+    canonical : bool (default: False)
+        Count each k-mer together with its reverse complement,
+        under the smaller of the two (counts on both strands)
+
+    Returns
+    -------
+    An int64 array of 4**k counts, see `kmer_labels` for the k-mers
+    """
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}")
+    codes = np.asarray(codes, dtype=SEQ_DTYPE)
+    counts = np.zeros(4**k, dtype=np.int64)
+    for start in _chunks(len(codes), k - 1, chunk_size):
+        bases = _CODON_INDEX[codes[start : start + chunk_size]]
+        n = len(bases) - k + 1
+        if n <= 0:
+            continue
+        # Roll the 2 bit values of the bases into one integer per position
+        index = np.zeros(n, dtype=np.int64)
+        for j in range(k):
+            index <<= 2
+            index |= bases[j : j + n] & 3
+        invalid = np.concatenate(([0], np.cumsum(bases == 4)))
+        valid = invalid[k:] == invalid[:-k]
+        counts += np.bincount(index[valid], minlength=4**k)
+    if canonical:
+        index = np.arange(4**k)
+        rc = _reverse_complement_index(index, k)
+        counts = np.where(
+            index < rc, counts + counts[rc], np.where(index == rc, counts, 0)
+        )
+    return counts
+
+
+def _reverse_complement_index(index, k):
+    rc = np.zeros_like(index)
+    for j in range(k):
+        rc = (rc << 2) | (3 - ((index >> (2 * j)) & 3))
+    return rc
+
+
+def kmer_labels(k):
+    """
+    Returns the k-mers in the order of `kmer_counts`
+    """
+    return np.array(["".join(x) for x in product("ACGT", repeat=k)])
+
+
+def _motif_bits(motif):
+    try:
+        return np.array([IUPAC[x] for x in motif.upper()], dtype=np.uint8)
+    except KeyError as e:
+        raise ValueError(f"Invalid IUPAC code in motif: {e.args[0]}")
+
+
+def _complement_bits(bits):
+    # Swap A<->T and C<->G
+    return ((bits & 1) << 3) | ((bits & 2) << 1) | ((bits & 4) >> 1) | ((bits & 8) >> 3)
+
+
+def find_motif(codes, motif, strand="both", chunk_size=_CHUNK_SIZE):
+    """
+    Find the occurrences of an (IUPAC) motif in an encoded sequence.
+    Case is ignored, N (and other ambiguous bases) in the sequence
+    never match.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        The encoded sequence (see Nucleotide)
+    motif : str
+        The motif, e.g. 'TATAWAWR'
+    strand : str (default: 'both')
+        Scan the '+' strand, the '-' strand (the reverse complement
+        of the motif) or 'both'
+
+    Returns
+    -------
+    (starts, strands): the 0 indexed starts of the hits (the leftmost
+    base, on either strand) and a '+'/'-' array, sorted by start
+    """
+    if strand not in ("+", "-", "both"):
+        raise ValueError("strand must be one of '+', '-' or 'both'")
+    forward = _motif_bits(motif)
+    if len(forward) == 0:
+        raise ValueError("motif cannot be empty")
+    patterns = []
+    if strand in ("+", "both"):
+        patterns.append(("+", forward))
+    if strand in ("-", "both"):
+        patterns.append(("-", _complement_bits(forward)[::-1]))
+    codes = np.asarray(codes, dtype=SEQ_DTYPE)
+    m = len(forward)
+    starts, strands = [], []
+    for start in _chunks(len(codes), m - 1, chunk_size):
+        bits = _BASE_BITS[codes[start : start + chunk_size]]
+        n = len(bits) - m + 1
+        if n <= 0:
+            continue
+        for sign, pattern in patterns:
+            hits = np.ones(n, dtype=bool)
+            for j, b in enumerate(pattern):
+                hits &= (bits[j : j + n] & b) != 0
+            hits = np.flatnonzero(hits) + start
+            starts.append(hits)
+            strands.append(np.full(len(hits), sign))
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype="<U1")
+    starts = np.concatenate(starts).astype(np.int64)
+    strands = np.concatenate(strands).astype("<U1")
+    order = np.lexsort((strands, starts))
+    return starts[order], strands[order]
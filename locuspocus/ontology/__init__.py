@@ -35,6 +35,9 @@ class Ontology(Freezable):
     Parameters
     ----------
     name : unique identifier
+    lookup_cache : bool (default: False)
+        Use the in-memory lookup cache for the Ontology's loci,
+        see Loci
 
     Returns
     -------
@@ -42,8 +45,9 @@ class Ontology(Freezable):
 
     """
 
-    def __init__(self, name, rootdir: Optional[str] = None):
+    def __init__(self, name, rootdir: Optional[str] = None, lookup_cache: bool = False):
         super().__init__(name, rootdir=rootdir)
+        self.lookup_cache = lookup_cache
         self._initialize_tables()
         self.metadata = self.m80.doc.table("metadata")
 
@@ -66,7 +70,11 @@ class Ontology(Freezable):
     def loci(self) -> Loci:
         # lazy evaluation
         if self._loci is None:
-            self._loci = Loci(self.m80.name, rootdir=self.m80.thawed_dir)
+            self._loci = Loci(
+                self.m80.name,
+                rootdir=self.m80.thawed_dir,
+                lookup_cache=self.lookup_cache,
+            )
         return self._loci
 
     # -----------------------------------------
@@ -0,0 +1,209 @@
+"""
+Sharing the chromosomes of a Fasta between processes.
+
+The encoded chromosomes are copied once into a shared memory file
+(in /dev/shm where available) together with a small header that
+describes them. Other processes attach to the file by name and read
+the chromosomes as zero copy, read only memory mapped views, so any
+number of workers share a single copy of the genome.
+
+Layout of the file:
+
+    uint64 header length
+    header (JSON): the chromosome names, offsets, lengths and
+                   attributes and the name resolution map
+    sequences, starting at the first multiple of 64 after the header
+"""
+
+import json
+import os
+import secrets
+import struct
+import tempfile
+import weakref
+
+import numpy as np
+
+from .chromosome import Chromosome
+from .codec import SEQ_DTYPE
+from .fasta import Fasta
+
+__all__ = ["SharedFasta"]
+
+
+def _shared_dir():
+    # /dev/shm is memory backed, elsewhere the page cache is shared
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _data_offset(header_length):
+    return -(-(8 + header_length) // 64) * 64
+
+
+class SharedFasta(object):
+    """
+    A read only Fasta whose chromosomes live in shared memory.
+
+    >>> from locuspocus import Fasta, SharedFasta
+    >>> shared = SharedFasta.from_fasta(Fasta('example'))
+    >>> # In a worker process
+    >>> x = SharedFasta.attach(shared.name)
+    >>> x['chr1'][1000:2000]
+
+    SharedFasta objects can also be passed to workers directly (e.g.
+    as arguments to Pool.map), they are attached when unpickled. The
+    process that created the shared copy removes it when closed, when
+    it is garbage collected or at the latest when the process exits.
+    """
+
+    def __init__(self, path, owner=False):
+        """
+        Attach to a shared copy, see `from_fasta` and `attach`
+        """
+        self.path = str(path)
+        self._owner = owner
+        # The owner's shared copy does not outlive it (weakref.finalize
+        # also runs at interpreter exit)
+        self._finalizer = weakref.finalize(self, _remove, self.path) if owner else None
+        self._map = np.memmap(self.path, dtype=SEQ_DTYPE, mode="r")
+        (header_length,) = struct.unpack("<Q", self._map[:8].tobytes())
+        header = json.loads(self._map[8 : 8 + header_length].tobytes())
+        offset = _data_offset(header_length)
+        self._records = {
+            name: (offset + start, length, attrs)
+            for name, start, length, attrs in header["chroms"]
+        }
+        self._aliases = header["aliases"]
+
+    @property
+    def name(self):
+        """
+        The name workers attach by
+        """
+        return os.path.basename(self.path)
+
+    @classmethod
+    def from_fasta(cls, fasta, name=None, directory=None):
+        """
+        Copy the chromosomes of a Fasta into shared memory
+
+        Parameters
+        ----------
+        fasta : Fasta
+            The Fasta to share
+        name : str (default: None)
+            The name of the shared copy, a unique name is
+            generated by default
+        directory : str (default: None)
+            Where the shared copy is kept, defaults to /dev/shm
+            (or the temporary directory where it does not exist)
+
+        Returns
+        -------
+        The SharedFasta, which owns the shared copy
+        """
+        if name is None:
+            name = f"locuspocus_{secrets.token_hex(8)}"
+        path = os.path.join(_shared_dir() if directory is None else directory, name)
+        if os.path.exists(path):
+            raise ValueError(f"{path} already exists")
+        aliases = dict(fasta._alias_map())
+        lengths = fasta.lengths()
+        chroms = []
+        start = 0
+        for chrom_name, length in lengths.items():
+            chroms.append((chrom_name, start, length, fasta._chrom_attrs[chrom_name]))
+            start += length
+        header = json.dumps({"chroms": chroms, "aliases": aliases}).encode()
+        with open(path, "wb") as OUT:
+            OUT.write(struct.pack("<Q", len(header)))
+            OUT.write(header)
+            OUT.write(bytes(_data_offset(len(header)) - 8 - len(header)))
+            for chrom_name in lengths:
+                seq = fasta._load_seq(chrom_name)
+                OUT.write(np.ascontiguousarray(seq, dtype=SEQ_DTYPE).data)
+        return cls(path, owner=True)
+
+    @classmethod
+    def attach(cls, name, directory=None):
+        """
+        Attach to a shared copy by name (or path)
+
+        Raises
+        ------
+        `ValueError` if there is no shared copy with that name
+        """
+        if os.path.dirname(name):
+            path = name
+        else:
+            path = os.path.join(_shared_dir() if directory is None else directory, name)
+        if not os.path.exists(path):
+            raise ValueError(f"No shared Fasta named {name}")
+        return cls(path)
+
+    def __reduce__(self):
+        # Workers attach to the shared copy instead of copying it
+        return (SharedFasta.attach, (self.path,))
+
+    def close(self):
+        """
+        Release the memory map. The owner also removes the shared
+        copy, processes (and views) still attached keep their
+        mapping until they are done with it.
+        """
+        self._map = None
+        if self._finalizer is not None:
+            self._finalizer()
+        self._owner = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def chrom_names(self):
+        """
+        Returns an iterable of chromosome names in added order
+        """
+        return iter(self._records)
+
+    def lengths(self):
+        """
+        Returns a dict of chromosome lengths in added order
+        """
+        return {name: length for name, (_, length, _) in self._records.items()}
+
+    def __iter__(self):
+        for name in self._records:
+            yield self[name]
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, obj):
+        if isinstance(obj, Chromosome):
+            obj = obj.name
+        return obj in self._aliases
+
+    def __getitem__(self, chrom_name):
+        try:
+            name = self._aliases[chrom_name]
+        except (KeyError, TypeError):
+            raise ValueError(f"{chrom_name} not in {self.name}")
+        if self._map is None:
+            raise ValueError(f"{self.name} is closed")
+        offset, length, attrs = self._records[name]
+        return Chromosome(name, self._map[offset : offset + length], *attrs)
+
+    # Sequences are extracted just like from the Fasta
+    extract = Fasta.extract
+    _extract = Fasta._extract
+
+    def __repr__(self):  # pragma: nocover
+        return f"SharedFasta('{self.name}')"
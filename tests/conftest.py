@@ -92,6 +92,15 @@ def testRefGen():
     return x
 
 
+@pytest.fixture(scope="module")
+def smallLoci():
+    """A small Loci built from the maize_small GFF"""
+    m80.delete("Loci", "smallLoci")
+    gff = os.path.join("raw", "maize_small.gff")
+    x = lp.Loci.from_gff("smallLoci", gff, skip_feature_types=["chromosome"])
+    return x
+
+
 @pytest.fixture(scope="module")
 def m80_Fasta():
     """
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from locuspocus import Chromosome
 
 
@@ -58,5 +59,65 @@ def test_N_in_chromosome():
 
 def test_bad_nucleotide_in_chromosome_seq():
     with pytest.raises(KeyError):
-        Chromosome("test", "abcd")
+        Chromosome("test", "abzd")
     assert True
+
+
+def test_seq_is_uint8(chr1):
+    assert chr1.seq.dtype == np.uint8
+    assert chr1.seq.nbytes == 500000
+
+
+def test_init_from_int64_array():
+    x = Chromosome("chr1", np.array([1, 3, 5, 7], dtype=np.int64))
+    assert x.seq.dtype == np.uint8
+    assert x[1:4] == "ACGT"
+
+
+def test_init_from_bytes():
+    x = Chromosome("chr1", b"ACGTn")
+    assert x[1:5] == "ACGTn"
+
+
+def test_fetch_str():
+    x = Chromosome("chr1", "AAACCCTTTGGGn")
+    assert x.fetch(4, 6) == "CCC"
+    assert x.fetch(10) == "GGGn"
+
+
+def test_fetch_bytes():
+    x = Chromosome("chr1", "AAACCCTTTGGGn")
+    assert x.fetch(4, 6, output="bytes") == b"CCC"
+
+
+def test_fetch_array():
+    x = Chromosome("chr1", "AAACCCTTTGGGn")
+    assert np.array_equal(x.fetch(4, 6, output="array"), Chromosome("y", "CCC").seq)
+
+
+def test_fetch_bad_output():
+    x = Chromosome("chr1", "AAACCCTTTGGGn")
+    with pytest.raises(ValueError):
+        x.fetch(1, 2, output="list")
+
+
+def test_open_ended_slice():
+    x = Chromosome("chr1", "AAACCCTTTGGGn")
+    assert x[10:] == "GGGn"
+
+
+def test_kmer_counts():
+    x = Chromosome("x", "ACGTNacgtA")
+    counts = x.kmer_counts(2)
+    assert counts.sum() == 7
+    # AC: 4*0 + 1
+    assert counts[1] == 2
+    assert x.kmer_counts(2, start=6).sum() == 4
+
+
+def test_find_motif():
+    x = Chromosome("x", "TTGATCAAGATC")
+    positions, strands = x.find_motif("GATC")
+    assert positions.tolist() == [3, 3, 9, 9]
+    positions, strands = x.find_motif("TGA", start=2, strand="+")
+    assert positions.tolist() == [2]
@@ -0,0 +1,94 @@
+import pytest
+import numpy as np
+
+from locuspocus import Chromosome
+from locuspocus.codec import (
+    Nucleotide,
+    decode,
+    encode,
+    pack_2bit,
+    reverse_complement,
+    translate,
+    unpack_2bit,
+)
+
+
+def test_pack_roundtrip():
+    seq = Chromosome("x", "ACGTacgtNNNnnAUuCG").seq
+    packed, exceptions, lower = pack_2bit(seq)
+    assert np.array_equal(unpack_2bit(packed, len(seq), exceptions, lower), seq)
+
+
+def test_pack_size():
+    seq = Chromosome("x", "ACGT" * 1000).seq
+    packed, exceptions, lower = pack_2bit(seq)
+    assert len(packed) == 1000
+    assert len(exceptions) == 0
+    assert len(lower) == 0
+
+
+def test_pack_exception_runs():
+    seq = Chromosome("x", "ACNNNUUGT").seq
+    packed, exceptions, lower = pack_2bit(seq)
+    assert exceptions.tolist() == [
+        [2, 5, Nucleotide.N.value],
+        [5, 7, Nucleotide.U.value],
+    ]
+
+
+def test_pack_lower_runs():
+    seq = Chromosome("x", "ACgtnNac").seq
+    packed, exceptions, lower = pack_2bit(seq)
+    assert lower.tolist() == [[2, 5], [6, 8]]
+
+
+def test_pack_empty():
+    seq = Chromosome("x", "").seq
+    packed, exceptions, lower = pack_2bit(seq)
+    assert len(unpack_2bit(packed, 0, exceptions, lower)) == 0
+
+
+def test_reverse_complement():
+    assert decode(reverse_complement(encode("AACGTnU"))) == "AnACGTT"
+
+
+def test_translate():
+    assert translate(encode("ATGgccTAAuu")) == "MA*"
+    assert translate(encode("ATGNCCTGA")) == "MX*"
+    assert translate(encode("AT")) == ""
+
+
+def test_iupac_roundtrip():
+    seq = "ACGTURYSWKMBDHVNacgturyswkmbdhvn-."
+    assert decode(encode(seq)) == seq
+    assert encode("-").tolist() == [Nucleotide.GAP.value]
+
+
+def test_iupac_lower_codes_are_even():
+    from locuspocus.codec import is_lower
+
+    codes = encode("RYKMBDHV-.ryk")
+    assert is_lower(codes).tolist() == [False] * 10 + [True] * 3
+
+
+def test_iupac_reverse_complement():
+    assert decode(reverse_complement(encode("ARyKmBdHvS-W."))) == ".W-SbDhVkMrYT"
+
+
+def test_iupac_pack_roundtrip():
+    seq = Chromosome("x", "ACRRyy-..NNacgKKt").seq
+    packed, exceptions, lower = pack_2bit(seq)
+    assert np.array_equal(unpack_2bit(packed, len(seq), exceptions, lower), seq)
+    assert exceptions[:, 2].tolist() == [
+        Nucleotide.R.value,
+        Nucleotide.Y.value,
+        Nucleotide.GAP.value,
+        Nucleotide.DOT.value,
+        Nucleotide.N.value,
+        Nucleotide.K.value,
+    ]
+
+
+def test_iupac_invalid():
+    with pytest.raises(KeyError):
+        encode("ACGTX")
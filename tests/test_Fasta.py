@@ -1,10 +1,14 @@
 """
     Tests
 """
+import os
+import re
 import pytest
 import locuspocus as lp
 import minus80 as m80
 
+from locuspocus.codec import translate
+
 
 def test_init(smpl_fasta):
     assert len(smpl_fasta["chr1"]) == 500000
@@ -170,5 +174,812 @@ def test_to_Fasta_file(smpl_fasta):
     fasta_copy = lp.Fasta.from_file("copy", tfile.name)
     for chrom in smpl_fasta:
         assert chrom in fasta_copy
+        assert fasta_copy[chrom.name]._attrs == chrom._attrs
     m80.delete("Fasta", "copy")
     # Delete the copy
+
+
+def test_add_chrom_2bit(smpl_fasta):
+    chrom = lp.Chromosome("packed", "ACGTNNacgtn" * 10)
+    smpl_fasta.add_chrom(chrom, encoding="2bit")
+    assert smpl_fasta._get_encoding("packed") == "2bit"
+    assert smpl_fasta["packed"] == chrom
+    smpl_fasta.del_chrom("packed")
+    assert "packed" not in smpl_fasta
+
+
+def test_add_chrom_bad_encoding(smpl_fasta):
+    with pytest.raises(ValueError):
+        smpl_fasta.add_chrom(lp.Chromosome("bad", "ACGT"), encoding="4bit")
+
+
+def test_replace_chrom_encoding(smpl_fasta):
+    smpl_fasta.add_chrom(lp.Chromosome("packed", "ACGT"), encoding="2bit")
+    smpl_fasta.add_chrom(lp.Chromosome("packed", "TTTT"), replace=True)
+    assert smpl_fasta._get_encoding("packed") == "uint8"
+    assert smpl_fasta["packed"][1:4] == "TTTT"
+    smpl_fasta.del_chrom("packed")
+
+
+def test_reencode_legacy(smpl_fasta):
+    import numpy as np
+
+    chrom = lp.Chromosome("legacy", "ACGTN" * 10)
+    smpl_fasta.add_chrom(chrom)
+    # Simulate a chromosome stored by an older version
+    smpl_fasta.m80.col["legacy"] = chrom.seq.astype(np.int64)
+    smpl_fasta.m80.db.cursor().execute(
+        """
+        DELETE FROM encodings WHERE chrom = 'legacy';
+        DELETE FROM seq_offsets WHERE chrom = 'legacy';
+        """
+    )
+    smpl_fasta.cache_clear()
+    assert smpl_fasta._get_encoding("legacy") is None
+    assert smpl_fasta["legacy"].seq.dtype == np.uint8
+    smpl_fasta.reencode("2bit")
+    assert smpl_fasta._get_encoding("legacy") == "2bit"
+    assert smpl_fasta["legacy"] == chrom
+    smpl_fasta.reencode("uint8")
+    assert smpl_fasta._get_encoding("legacy") == "uint8"
+    assert smpl_fasta["legacy"] == chrom
+    smpl_fasta.del_chrom("legacy")
+
+
+def test_chrom_is_memory_mapped(smpl_fasta):
+    import numpy as np
+
+    chrom = smpl_fasta["chr1"]
+    assert isinstance(chrom.seq, np.memmap)
+    assert len(chrom) == 500000
+    with pytest.raises(ValueError):
+        chrom.seq[0] = 1
+
+
+def test_compact(smpl_fasta):
+    chrom = lp.Chromosome("compact", "ACGTN" * 10)
+    smpl_fasta.add_chrom(chrom)
+    smpl_fasta.add_chrom(lp.Chromosome("compact", "TTTT"), replace=True)
+    chr1 = smpl_fasta["chr1"]
+    smpl_fasta.compact()
+    (live,) = (
+        smpl_fasta.m80.db.cursor()
+        .execute("SELECT SUM(length) FROM seq_offsets")
+        .fetchone()
+    )
+    assert os.path.getsize(smpl_fasta._seq_file) == live
+    assert smpl_fasta["compact"][1:4] == "TTTT"
+    assert smpl_fasta["chr1"] == chr1
+    smpl_fasta.del_chrom("compact")
+
+
+def test_compact_seen_by_other_instances():
+    m80.delete("Fasta", "compact_shared")
+    a = lp.Fasta("compact_shared")
+    for name, base in [("c1", "A"), ("c2", "C"), ("c3", "G")]:
+        a.add_chrom(lp.Chromosome(name, base * 1000))
+    b = lp.Fasta("compact_shared")
+    assert b["c1"][1:5] == "AAAAA"
+    a.del_chrom("c1")
+    a.compact()
+    # b still holds a map of the replaced file
+    assert b["c3"][1:5] == "GGGGG"
+    assert b["c2"][1:5] == "CCCCC"
+    m80.delete("Fasta", "compact_shared")
+
+
+def test_compact_failure_keeps_offsets(monkeypatch):
+    m80.delete("Fasta", "compact_failure")
+    f = lp.Fasta("compact_failure")
+    for name, base in [("c1", "A"), ("c2", "C"), ("c3", "G")]:
+        f.add_chrom(lp.Chromosome(name, base * 1000))
+    f.del_chrom("c1")
+    seq_file = f._seq_file
+
+    def fail(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "fsync", fail)
+    with pytest.raises(OSError):
+        f.compact()
+    monkeypatch.undo()
+    # Neither the offsets nor the file were changed, nothing is left behind
+    assert f._seq_file == seq_file
+    assert not any(x.startswith("sequences.1") for x in os.listdir(f.m80.thawed_dir))
+    f.cache_clear()
+    assert f["c2"][1:5] == "CCCCC"
+    assert f["c3"][1:5] == "GGGGG"
+    f.compact()
+    assert not os.path.exists(seq_file)
+    assert f["c3"][1:5] == "GGGGG"
+    m80.delete("Fasta", "compact_failure")
+
+
+def test_cache_hits(smpl_fasta):
+    smpl_fasta.cache_clear()
+    before = smpl_fasta.cache_info()
+    x = smpl_fasta["chr1"]
+    assert smpl_fasta["chr1"] is x
+    info = smpl_fasta.cache_info()
+    assert info.misses == before.misses + 1
+    assert info.hits == before.hits + 1
+    assert info.currsize == 1
+    assert info.currbytes == x.seq.nbytes
+
+
+def test_cache_is_bounded_by_bytes(m80_Fasta):
+    f = lp.Fasta("ACGT", cache_bytes=1500)
+    f.add_chrom(lp.Chromosome("c1", "A" * 1000))
+    f.add_chrom(lp.Chromosome("c2", "C" * 1000))
+    f["c1"]
+    f["c2"]
+    info = f.cache_info()
+    assert info.currsize == 1
+    assert info.currbytes == 1000
+    # c1 was evicted
+    f["c1"]
+    assert f.cache_info().misses == info.misses + 1
+    f.del_chrom("c1")
+    f.del_chrom("c2")
+
+
+def test_cache_is_bounded_by_size(m80_Fasta):
+    f = lp.Fasta("ACGT", cache_size=2)
+    for name in f.chrom_names():
+        f[name]
+    assert f.cache_info().currsize == min(2, len(f))
+
+
+def test_cache_is_per_instance(smpl_fasta):
+    other = lp.Fasta("smpl_fasta")
+    smpl_fasta["chr1"]
+    other["chr1"]
+    smpl_fasta.cache_clear()
+    assert smpl_fasta.cache_info().currsize == 0
+    assert other.cache_info().currsize == 1
+
+
+def test_cache_invalidated_on_replace(smpl_fasta):
+    smpl_fasta.add_chrom(lp.Chromosome("cached", "AAAA"))
+    assert smpl_fasta["cached"][1:4] == "AAAA"
+    smpl_fasta.add_chrom(lp.Chromosome("cached", "CCCC"), replace=True)
+    assert smpl_fasta["cached"][1:4] == "CCCC"
+    smpl_fasta.del_chrom("cached")
+    assert "cached" not in smpl_fasta
+    with pytest.raises(ValueError):
+        smpl_fasta["cached"]
+
+
+def test_cache_invalidated_on_nickname(smpl_fasta):
+    with pytest.raises(ValueError):
+        smpl_fasta["chr2_nick"]
+    smpl_fasta._add_nickname("chr2", "chr2_nick")
+    assert smpl_fasta["chr2_nick"] == smpl_fasta["chr2"]
+
+
+def test_from_file_gzipped(tmp_path):
+    import gzip
+
+    fasta_file = tmp_path / "test.fa.gz"
+    with gzip.open(fasta_file, "wt") as OUT:
+        print(">chrA desc\nACGTN\nacgtn\n>chrB\nTTTT", file=OUT)
+    if m80.exists("Fasta", "gzipped"):
+        m80.delete("Fasta", "gzipped")
+    f = lp.Fasta.from_file("gzipped", str(fasta_file))
+    assert f["chrA"][1:10] == "ACGTNacgtn"
+    assert f["chrA"]._attrs == ["desc"]
+    assert f["chrB"][1:4] == "TTTT"
+    m80.delete("Fasta", "gzipped")
+
+
+def test_from_file_bad_nucleotide(tmp_path):
+    fasta_file = tmp_path / "bad.fa"
+    fasta_file.write_text(">chrA\nACGT\nAC!T\n")
+    if m80.exists("Fasta", "bad"):
+        m80.delete("Fasta", "bad")
+    with pytest.raises(KeyError):
+        lp.Fasta.from_file("bad", str(fasta_file))
+    m80.delete("Fasta", "bad")
+
+
+def _revcomp(seq):
+    return seq[::-1].translate(str.maketrans("ACGTNacgtn", "TGCANtgcan"))
+
+
+def test_extract(smpl_fasta):
+    seq = "AACCGGTTNNacgtACGTAC"
+    smpl_fasta.add_chrom(lp.Chromosome("extract", seq))
+    loci = [
+        lp.Locus("extract", 3, 8, strand="+", name="plus"),
+        lp.Locus("extract", 3, 8, strand="-", name="minus"),
+        lp.Locus("chr1", 1, 4, strand="+"),
+        lp.Locus("extract", 11, 14, strand="-"),
+    ]
+    result = list(smpl_fasta.extract(loci))
+    # Grouped by chromosome
+    assert [l for l, _ in result] == [loci[0], loci[1], loci[3], loci[2]]
+    assert result[0][1] == seq[2:8]
+    assert result[1][1] == _revcomp(seq[2:8])
+    assert result[2][1] == "acgt"
+    assert result[3][1] == "AAAA"
+    unstranded = dict(smpl_fasta.extract(loci[:2], stranded=False))
+    assert unstranded[loci[1]] == seq[2:8]
+    smpl_fasta.del_chrom("extract")
+
+
+def test_extract_flank(smpl_fasta):
+    seq = "AACCGGTTNNacgtACGTAC"
+    smpl_fasta.add_chrom(lp.Chromosome("extract", seq))
+    plus = lp.Locus("extract", 5, 8, strand="+")
+    minus = lp.Locus("extract", 5, 8, strand="-")
+    (_, x), (_, y) = smpl_fasta.extract([plus, minus], flank=(2, 1))
+    assert x == seq[2:9]
+    assert y == _revcomp(seq[3:10])
+    # Flanks are clipped at the chromosome ends
+    (_, x), (_, y) = smpl_fasta.extract([plus, minus], flank=(100, 0))
+    assert x == seq[:8]
+    assert y == _revcomp(seq[4:])
+    smpl_fasta.del_chrom("extract")
+
+
+def test_extract_loci(smallLoci, loci_fasta, tmp_path):
+    f, seq = loci_fasta
+    result = list(f.extract(smallLoci))
+    assert len(result) == len(smallLoci)
+    for locus, x in result:
+        expected = seq[locus.start - 1 : locus.end]
+        assert x == (_revcomp(expected) if locus.strand == "-" else expected)
+    out = tmp_path / "genes.fa"
+    f.extract(smallLoci, filename=str(out))
+    lines = out.read_text().splitlines()
+    assert lines[0] == ">GRMZM2G354611 9:66347-68582(-)"
+    assert "".join(lines[1:33]) == result[0][1]
+
+
+@pytest.fixture(scope="module")
+def loci_fasta():
+    import numpy as np
+
+    if m80.exists("Fasta", "loci_fasta"):
+        m80.delete("Fasta", "loci_fasta")
+    f = lp.Fasta("loci_fasta")
+    seq = "".join(np.random.default_rng(0).choice(list("ACGT"), 320000))
+    f.add_chrom(lp.Chromosome("9", seq))
+    yield f, seq
+    m80.delete("Fasta", "loci_fasta")
+
+
+def test_spliced_exons(smallLoci, loci_fasta):
+    f, seq = loci_fasta
+    result = {t.name: x for t, x in f.spliced(smallLoci)}
+    assert len(result) == 5
+    # Minus strand, 5 exons
+    exons = [(66347, 66534), (66607, 66670), (67067, 67141), (67887, 68432)]
+    exons.append((68562, 68582))
+    expected = "".join(seq[s - 1 : e] for s, e in exons)
+    assert result["GRMZM2G354611_T01"] == _revcomp(expected)
+    assert result["GRMZM2G100965_T01"] == seq[169102:170546]
+
+
+def test_spliced_cds(smallLoci, loci_fasta):
+    f, seq = loci_fasta
+    result = {t.name: x for t, x in f.spliced(smallLoci, feature_type="CDS")}
+    assert result["GRMZM2G100965_T01"] == seq[169861:170245]
+    proteins = dict((t.name, x) for t, x in f.spliced(smallLoci, "CDS", translate=True))
+    assert len(proteins["GRMZM2G100965_T01"]) == 384 // 3
+    assert proteins["GRMZM2G100965_T01"] == translate(
+        lp.Chromosome("x", result["GRMZM2G100965_T01"]).seq
+    )
+
+
+def test_spliced_frame():
+    if m80.exists("Fasta", "frame"):
+        m80.delete("Fasta", "frame")
+    if m80.exists("Loci", "frame"):
+        m80.delete("Loci", "frame")
+    f = lp.Fasta("frame")
+    #                                      CDS 1         CDS 2
+    f.add_chrom(lp.Chromosome("1", "CCCCC" "GGATGGCC" "TTTTT" "AAATAGCC"))
+    gene = lp.Locus("1", 1, 26, feature_type="gene", strand="+", name="g")
+    mrna = lp.Locus("1", 1, 26, feature_type="mRNA", strand="+", name="g.1")
+    mrna.add_sublocus(lp.Locus("1", 6, 13, feature_type="CDS", strand="+", frame=2))
+    mrna.add_sublocus(lp.Locus("1", 19, 26, feature_type="CDS", strand="+", frame=2))
+    gene.add_sublocus(mrna)
+    loci = lp.Loci("frame")
+    loci.add_locus(gene)
+    ((transcript, cds),) = f.spliced(loci, "CDS")
+    assert transcript.name == "g.1"
+    # Only the frame of the first segment is skipped
+    assert cds == "ATGGCCAAATAGCC"
+    ((_, protein),) = f.spliced(loci, "CDS", translate=True)
+    assert protein == "MAK*"
+    m80.delete("Fasta", "frame")
+    m80.delete("Loci", "frame")
+
+
+def _composition(seq):
+    return [
+        sum(seq.upper().count(x) for x in "ATU"),
+        sum(seq.upper().count(x) for x in "GC"),
+        sum(not x.upper() in "ACGTU" for x in seq),
+        sum(x.islower() for x in seq),
+    ]
+
+
+@pytest.fixture(scope="module")
+def composition_fasta():
+    import numpy as np
+
+    if m80.exists("Fasta", "composition"):
+        m80.delete("Fasta", "composition")
+    f = lp.Fasta("composition")
+    seq = "".join(np.random.default_rng(2).choice(list("ACGTNacgtn"), 5000))
+    f.add_chrom(lp.Chromosome("c", seq))
+    yield f, seq
+    m80.delete("Fasta", "composition")
+
+
+def test_interval_composition(composition_fasta):
+    import numpy as np
+
+    f, seq = composition_fasta
+    rng = np.random.default_rng(3)
+    starts = rng.integers(0, 5000, 200)
+    ends = np.minimum(starts + rng.integers(0, 2000, 200), 5000)
+    starts = np.append(starts, [0, 0, 4999, 5000])
+    ends = np.append(ends, [5000, 0, 5000, 5000])
+    counts = f.interval_composition("c", starts, ends)
+    for (s, e), x in zip(zip(starts, ends), counts):
+        assert list(x) == _composition(seq[s:e])
+
+
+def test_composition_loci(composition_fasta):
+    f, seq = composition_fasta
+    loci = [lp.Locus("c", 100, 1000), lp.Locus("c", 1, 5000), lp.Locus("c", 7, 7)]
+    df = f.composition(loci)
+    assert list(df["length"]) == [901, 5000, 1]
+    for (_, row), locus in zip(df.iterrows(), loci):
+        expected = _composition(seq[locus.start - 1 : locus.end])
+        assert list(row[["AT", "GC", "N", "lower"]]) == expected
+    fractions = f.composition(loci, fraction=True)
+    assert fractions["GC"][1] == pytest.approx(_composition(seq)[1] / 5000)
+
+
+def test_composition_windows(composition_fasta):
+    f, seq = composition_fasta
+    df = f.windows("c", 1000, step=500)
+    assert list(df["start"]) == list(range(1, 5000, 500))
+    assert df["end"].iloc[-1] == 5000
+    assert list(df.iloc[3][["AT", "GC", "N", "lower"]]) == _composition(seq[1500:2500])
+
+
+def test_composition_index_is_persisted(composition_fasta):
+    f, seq = composition_fasta
+    f.interval_composition("c", [0], [10])
+    assert "c__composition" in f.m80.col
+    f.add_chrom(lp.Chromosome("c", seq.upper()), replace=True)
+    assert "c__composition" not in f.m80.col
+    assert f.interval_composition("c", [0], [5000])[0, 3] == 0
+    f.add_chrom(lp.Chromosome("c", seq), replace=True)
+
+
+def test_composition_index_is_cached(monkeypatch):
+    import numpy as np
+    from locuspocus import fasta
+
+    if m80.exists("Fasta", "composition_cached"):
+        m80.delete("Fasta", "composition_cached")
+    f = lp.Fasta("composition_cached", cache_bytes=0)
+    seq = "".join(np.random.default_rng(7).choice(list("ACGTNacgt"), 3000))
+    f.add_chrom(lp.Chromosome("c", seq), encoding="2bit")
+    expected = f.interval_composition("c", [0, 100], [3000, 2000])
+
+    def fail(*args, **kwargs):
+        raise AssertionError("reloaded")
+
+    # Neither the sequence nor the index are loaded again
+    monkeypatch.setattr(fasta, "unpack_2bit", fail)
+    monkeypatch.setattr(f, "_load_composition", fail)
+    for _ in range(3):
+        counts = f.interval_composition("c", [0, 100], [3000, 2000])
+        assert np.array_equal(counts, expected)
+    monkeypatch.undo()
+    f.add_chrom(lp.Chromosome("c", seq.upper()), replace=True, encoding="2bit")
+    assert f.interval_composition("c", [0], [3000])[0, 3] == 0
+    m80.delete("Fasta", "composition_cached")
+
+
+def test_to_fasta_line_length(composition_fasta, tmp_path):
+    from locuspocus.faidx import build_fai, read_fai
+
+    f, seq = composition_fasta
+    out = tmp_path / "out.fa"
+    f.to_fasta(out, line_length=60, block_lines=7)
+    lines = out.read_text().splitlines()
+    assert lines[0] == ">c"
+    assert all(len(x) == 60 for x in lines[1:-1])
+    assert "".join(lines[1:]) == seq
+    assert read_fai(str(out) + ".fai") == build_fai(str(out))
+
+
+def test_to_fasta_bgzip(smpl_fasta, tmp_path):
+    out = tmp_path / "out.fa.gz"
+    smpl_fasta.to_fasta(out)
+    indexed = lp.Fasta.from_indexed_file(str(out))
+    assert list(indexed.chrom_names()) == list(smpl_fasta.chrom_names())
+    for chrom in smpl_fasta:
+        assert indexed[chrom.name][1:] == chrom[1:]
+
+
+def test_to_fasta_gzip(composition_fasta, tmp_path):
+    import gzip
+
+    f, seq = composition_fasta
+    out = tmp_path / "out.fa.gz"
+    f.to_fasta(out, compression="gzip")
+    with gzip.open(out, "rt") as IN:
+        assert "".join(IN.read().splitlines()[1:]) == seq
+    assert not os.path.exists(str(out) + ".fai")
+    with pytest.raises(ValueError):
+        f.to_fasta(out, compression="zip")
+
+
+@pytest.mark.parametrize("suffix", [".fa", ".fa.gz"])
+def test_from_file_parallel(tmp_path, suffix):
+    import gzip
+    import numpy as np
+
+    rng = np.random.default_rng(4)
+    seqs = {
+        f"chr{i}": "".join(rng.choice(list("ACGTNacgtn"), rng.integers(0, 3000)))
+        for i in range(7)
+    }
+    text = "".join(
+        f">{name} attr{name}\n"
+        + "".join(seq[i : i + 61] + "\n" for i in range(0, len(seq), 61))
+        for name, seq in seqs.items()
+    )
+    fasta_file = tmp_path / f"parallel{suffix}"
+    opener = gzip.open if suffix.endswith(".gz") else open
+    with opener(fasta_file, "wt") as OUT:
+        OUT.write(text)
+    if m80.exists("Fasta", "parallel"):
+        m80.delete("Fasta", "parallel")
+    f = lp.Fasta.from_file("parallel", str(fasta_file), processes=2, max_in_flight=3)
+    assert list(f.chrom_names()) == list(seqs)
+    for name, seq in seqs.items():
+        assert f[name].fetch(1) == seq
+        assert f[name]._attrs == [f"attr{name}"]
+    m80.delete("Fasta", "parallel")
+
+
+@pytest.mark.parametrize("encoding", ["uint8", "2bit"])
+def test_from_file_parallel_summarized_by_workers(tmp_path, monkeypatch, encoding):
+    import numpy as np
+    from locuspocus import fasta
+
+    rng = np.random.default_rng(5)
+    seqs = {
+        f"chr{i}": "".join(rng.choice(list("ACGTNacgtn"), rng.integers(1, 3000)))
+        for i in range(5)
+    }
+    fasta_file = tmp_path / "summarized.fa"
+    fasta_file.write_text("".join(f">{k}\n{v}\n" for k, v in seqs.items()))
+    for name in ("serial", "summarized"):
+        if m80.exists("Fasta", name):
+            m80.delete("Fasta", name)
+    serial = lp.Fasta.from_file("serial", str(fasta_file), encoding=encoding)
+    # The stats, digests and runs are only computed in the workers
+    parent = os.getpid()
+    update = fasta._Summarizer.update
+
+    def worker_update(self, chunk):
+        assert os.getpid() != parent
+        update(self, chunk)
+
+    monkeypatch.setattr(fasta._Summarizer, "update", worker_update)
+    f = lp.Fasta.from_file(
+        "summarized", str(fasta_file), processes=2, encoding=encoding
+    )
+    monkeypatch.undo()
+    assert f.base_counts().equals(serial.base_counts())
+    assert f.digests().equals(serial.digests())
+    for name, seq in seqs.items():
+        assert f[name].fetch(1) == seq
+        for kind in ("gap", "masked"):
+            assert np.array_equal(f.runs(name, kind), serial.runs(name, kind))
+    m80.delete("Fasta", "serial")
+    m80.delete("Fasta", "summarized")
+
+
+def test_from_file_parallel_bad_nucleotide(tmp_path):
+    fasta_file = tmp_path / "bad.fa"
+    fasta_file.write_text(">chrA\nACGT\n>chrB\nAC!T\n")
+    if m80.exists("Fasta", "bad"):
+        m80.delete("Fasta", "bad")
+    with pytest.raises(KeyError):
+        lp.Fasta.from_file("bad", str(fasta_file), processes=2)
+    m80.delete("Fasta", "bad")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 2**22])
+def test_from_file_chunked(tmp_path, chunk_size):
+    text = ">chrA desc\nACGTN\nacgtn\nAC\n>chrB\n>chrC a b\r\nTTTT\r\nGG"
+    fasta_file = tmp_path / "chunked.fa"
+    fasta_file.write_text(text)
+    if m80.exists("Fasta", "chunked"):
+        m80.delete("Fasta", "chunked")
+    f = lp.Fasta.from_file("chunked", str(fasta_file), chunk_size=chunk_size)
+    assert list(f.chrom_names()) == ["chrA", "chrB", "chrC"]
+    assert f["chrA"].fetch(1) == "ACGTNacgtnAC"
+    assert f["chrA"]._attrs == ["desc"]
+    assert len(f["chrB"]) == 0
+    assert f["chrC"].fetch(1) == "TTTTGG"
+    assert f["chrC"]._attrs == ["a", "b"]
+    m80.delete("Fasta", "chunked")
+
+
+def test_stream_unwrapped_record():
+    import io
+    from locuspocus.fasta import _stream_fasta
+
+    seq = b"ACGTN" * 2000
+    events = list(_stream_fasta(io.BytesIO(b">long\n" + seq + b"\n>next\nAC"), 64))
+    # Sequence is passed on in pieces of at most chunk_size, not once per line
+    assert all(len(data) <= 64 for h, data in events if h is None)
+    assert [h for h, _ in events if h is not None] == ["long", "next"]
+    long = b"".join(data for h, data in events[1:-2] if h is None)
+    assert long == seq + b"\n"
+
+
+def test_from_file_unwrapped(tmp_path):
+    seq = "ACGTNacgtn" * 1000
+    fasta_file = tmp_path / "unwrapped.fa"
+    fasta_file.write_text(f">chrA\n{seq}\n>chrB\n{seq[::-1]}")
+    m80.delete("Fasta", "unwrapped")
+    f = lp.Fasta.from_file("unwrapped", str(fasta_file), chunk_size=100)
+    assert f["chrA"].fetch(1) == seq
+    assert f["chrB"].fetch(1) == seq[::-1]
+    m80.delete("Fasta", "unwrapped")
+
+
+def test_add_chrom_chunks(smpl_fasta):
+    chunks = ["ACGT\n", b"NNNN", lp.Chromosome("x", "acgt").seq]
+    smpl_fasta.add_chrom_chunks("chunks", iter(chunks), "attr")
+    assert smpl_fasta["chunks"].fetch(1) == "ACGTNNNNacgt"
+    assert smpl_fasta["chunks"]._attrs == ["attr"]
+    with pytest.raises(ValueError):
+        smpl_fasta.add_chrom_chunks("chunks", ["A"])
+    smpl_fasta.add_chrom_chunks("chunks", chunks, replace=True, encoding="2bit")
+    assert smpl_fasta._get_encoding("chunks") == "2bit"
+    assert smpl_fasta["chunks"].fetch(1) == "ACGTNNNNacgt"
+    smpl_fasta.del_chrom("chunks")
+
+
+def test_lengths(smpl_fasta):
+    lengths = smpl_fasta.lengths()
+    assert list(lengths) == list(smpl_fasta.chrom_names())
+    assert lengths["chr1"] == 500000
+
+
+def test_base_counts(composition_fasta):
+    f, seq = composition_fasta
+    counts = f.base_counts()
+    assert counts.loc["c", "length"] == len(seq)
+    assert list(counts.loc["c", ["AT", "GC", "N", "lower"]]) == _composition(seq)
+
+
+def test_lengths_legacy_chrom(smpl_fasta):
+    smpl_fasta.add_chrom(lp.Chromosome("legacy_len", "ACGTn"), encoding="2bit")
+    smpl_fasta.m80.db.cursor().execute(
+        "DELETE FROM chrom_stats WHERE chrom = 'legacy_len'"
+    )
+    assert smpl_fasta.lengths()["legacy_len"] == 5
+    assert smpl_fasta.base_counts().loc["legacy_len", "lower"] == 1
+    smpl_fasta.del_chrom("legacy_len")
+    assert "legacy_len" not in smpl_fasta.lengths()
+
+
+def test_downstream_loci_chrom_lengths(smallLoci, loci_fasta):
+    f, seq = loci_fasta
+    gene = smallLoci["GRMZM2G100965"]
+    lengths = f.lengths()
+    found = [x.name for x in smallLoci.downstream_loci(gene, chrom_lengths=lengths)]
+    assert found == [
+        x.name for x in smallLoci.downstream_loci(gene, max_distance=len(seq))
+    ]
+    assert "GRMZM2G310569" in found
+
+
+def test_chr_prefix_variants(smpl_fasta):
+    assert "1" in smpl_fasta
+    assert "Chr2" in smpl_fasta
+    assert smpl_fasta["1"].name == "chr1"
+    assert smpl_fasta["CHR3"][1:3] == "GGG"
+    assert "chr5" not in smpl_fasta
+
+
+def test_alias_map_is_reused(smpl_fasta):
+    smpl_fasta["chr1"]
+    assert smpl_fasta._alias_map() is smpl_fasta._alias_map()
+
+
+def test_alias_map_invalidated(smpl_fasta):
+    smpl_fasta.add_chrom(lp.Chromosome("Chr9", "ACGT"))
+    assert smpl_fasta["9"].name == "Chr9"
+    # A real chromosome name wins over a prefix variant
+    smpl_fasta.add_chrom(lp.Chromosome("9", "TTTT"))
+    assert smpl_fasta["9"][1:4] == "TTTT"
+    assert smpl_fasta["Chr9"][1:4] == "ACGT"
+    # Variants shared by two chromosomes are ambiguous
+    assert "chr9" not in smpl_fasta
+    smpl_fasta._add_nickname("9", "nine")
+    assert smpl_fasta["nine"][1:4] == "TTTT"
+    smpl_fasta.del_chrom("nine")
+    assert "nine" not in smpl_fasta
+    assert smpl_fasta["9"].name == "Chr9"
+    smpl_fasta.del_chrom("Chr9")
+    assert "9" not in smpl_fasta
+
+
+def test_digests(composition_fasta):
+    import base64
+    import hashlib
+
+    f, seq = composition_fasta
+    digests = f.digests()
+    normalized = seq.upper().encode()
+    assert digests.loc["c", "md5"] == hashlib.md5(normalized).hexdigest()
+    assert (
+        digests.loc["c", "sha512t24u"]
+        == base64.urlsafe_b64encode(hashlib.sha512(normalized).digest()[:24]).decode()
+    )
+    assert f["c"].digest("md5") == digests.loc["c", "md5"]
+    assert f.verify() == []
+
+
+def test_digests_refget():
+    # The refget specification example
+    chrom = lp.Chromosome("x", "ACGT")
+    assert chrom.digest() == "aKF498dAxcJAqme6QYQ7EZ07-fiw8Kw2"
+    assert chrom.digest("md5") == "f1f8f4bf413b16ad135722aa4591043e"
+    with pytest.raises(ValueError):
+        chrom.digest("sha1")
+
+
+def test_eq_digest_short_circuit(smpl_fasta):
+    chrom = smpl_fasta["chr1"]
+    other = lp.Chromosome("chr1", "C" * 500000)
+    other._digests = {"sha512t24u": "differs"}
+    assert not chrom == other
+    # Digests ignore case, the sequences are still compared
+    lower = lp.Chromosome("chr1", "a" * 500000)
+    lower.digest()
+    assert not chrom == lower
+    assert chrom == lp.Chromosome("chr1", "A" * 500000)
+
+
+def test_duplicates(smpl_fasta):
+    smpl_fasta.add_chrom(lp.Chromosome("dup", "c" * 500000))
+    assert smpl_fasta.duplicates() == [["chr2", "dup"]]
+    smpl_fasta.del_chrom("dup")
+    assert smpl_fasta.duplicates() == []
+
+
+def test_compare(smpl_fasta):
+    m80.delete("Fasta", "smpl_fasta_build2")
+    other = lp.Fasta("smpl_fasta_build2")
+    other.add_chrom(lp.Chromosome("chr1", "A" * 500000))
+    other.add_chrom(lp.Chromosome("chr2", "A" * 500000))
+    other.add_chrom(lp.Chromosome("2", "C" * 500000))
+    comparison = smpl_fasta.compare(other)
+    assert list(comparison.index) == ["chr1", "chr2", "chr3", "chr4", "2"]
+    assert list(comparison["identical"]) == [True, False, False, False, False]
+    assert comparison.loc["chr2", "other_names"] == ["2"]
+    assert comparison.loc["chr3", "other_names"] == []
+    assert comparison["other_length"].isna().sum() == 2
+    m80.delete("Fasta", "smpl_fasta_build2")
+
+
+def test_digests_legacy_chrom(smpl_fasta):
+    smpl_fasta.add_chrom(lp.Chromosome("legacy_digest", "ACGT"))
+    smpl_fasta.m80.db.cursor().execute(
+        "DELETE FROM seq_digests WHERE chrom = 'legacy_digest'"
+    )
+    digests = smpl_fasta.digests()
+    assert digests.loc["legacy_digest", "sha512t24u"] == (
+        "aKF498dAxcJAqme6QYQ7EZ07-fiw8Kw2"
+    )
+    smpl_fasta.del_chrom("legacy_digest")
+
+
+def test_runs(composition_fasta):
+    f, seq = composition_fasta
+    gaps = f.runs("c", "gap")
+    masked = f.runs("c", "masked")
+    assert gaps.tolist() == [list(m.span()) for m in re.finditer("[Nn]+", seq)]
+    assert masked.tolist() == [list(m.span()) for m in re.finditer("[a-z]+", seq)]
+    with pytest.raises(ValueError):
+        f.runs("c", "repeats")
+
+
+def test_runs_span_chunks(smpl_fasta):
+    seq = "ACGTNNNNNNacgtnnnnAC"
+    smpl_fasta.add_chrom_chunks("run_chunks", [seq[i : i + 3] for i in range(0, 20, 3)])
+    assert smpl_fasta.runs("run_chunks", "gap").tolist() == [[4, 10], [14, 18]]
+    assert smpl_fasta.runs("run_chunks", "masked").tolist() == [[10, 18]]
+    gaps = smpl_fasta.gaps("run_chunks")
+    assert [(x.chromosome, x.start, x.end) for x in gaps] == [
+        ("run_chunks", 5, 10),
+        ("run_chunks", 15, 18),
+    ]
+    assert all(x.feature_type == "gap" for x in gaps)
+    assert len(smpl_fasta.masked("run_chunks")) == 1
+    smpl_fasta.del_chrom("run_chunks")
+    assert "run_chunks__gap_runs" not in smpl_fasta.m80.col
+
+
+def test_runs_legacy_chrom(smpl_fasta):
+    smpl_fasta.add_chrom(lp.Chromosome("legacy_runs", "AANNa"), encoding="2bit")
+    smpl_fasta._remove_runs("legacy_runs")
+    assert smpl_fasta.runs("legacy_runs").tolist() == [[2, 4]]
+    smpl_fasta.del_chrom("legacy_runs")
+
+
+def test_random_intervals(smpl_fasta):
+    seq = "N" * 100 + "A" * 10 + "n" * 50 + "ACGTACGTACGT"
+    smpl_fasta.add_chrom(lp.Chromosome("sample", seq))
+    intervals = smpl_fasta.random_intervals(200, 10, chrom_name="sample", seed=1)
+    assert len(intervals) == 200
+    for x in intervals:
+        assert "N" not in smpl_fasta["sample"][x.start : x.end].upper()
+    assert {x.start for x in intervals} == {101} | set(range(161, 164))
+    # Reproducible
+    again = smpl_fasta.random_intervals(200, 10, chrom_name="sample", seed=1)
+    assert [x.start for x in again] == [x.start for x in intervals]
+    with pytest.raises(ValueError):
+        smpl_fasta.random_intervals(1, 13, chrom_name="sample")
+    smpl_fasta.del_chrom("sample")
+
+
+def test_kmer_counts(loci_fasta, smallLoci):
+    import numpy as np
+    from locuspocus.motifs import kmer_counts
+
+    f, seq = loci_fasta
+    assert np.array_equal(f.kmer_counts(3), kmer_counts(lp.Chromosome("x", seq).seq, 3))
+    genes = [x for x in smallLoci if x.chromosome == "9"][:5]
+    expected = sum(
+        kmer_counts(lp.Chromosome("x", seq[x.start - 1 : x.end]).seq, 3) for x in genes
+    )
+    assert np.array_equal(f.kmer_counts(3, loci=genes), expected)
+
+
+def test_find_motif(loci_fasta, smallLoci):
+    f, seq = loci_fasta
+    hits = f.find_motif("GAATTC")
+    assert list(hits.columns) == ["chromosome", "start", "end", "strand"]
+    assert hits["start"].tolist() == [
+        m.start() + 1 for m in re.finditer("(?=GAATTC)", seq) for _ in "+-"
+    ]
+    genes = [x for x in smallLoci if x.chromosome == "9"][:5]
+    hits = f.find_motif("TATA", loci=genes, strand="+")
+    for gene, start in zip(hits["locus"], hits["start"]):
+        locus = genes[gene]
+        assert locus.start <= start and start + 3 <= locus.end
+        assert seq[start - 1 : start + 3] == "TATA"
+    assert len(hits) == sum(
+        len(re.findall("(?=TATA)", seq[x.start - 1 : x.end])) for x in genes
+    )
+
+
+def test_from_file_iupac(tmp_path):
+    fasta_file = tmp_path / "iupac.fa"
+    fasta_file.write_text(">chrA\nACGTRYKM\nswbdhvN-\n")
+    m80.delete("Fasta", "iupac")
+    f = lp.Fasta.from_file("iupac", str(fasta_file))
+    assert f["chrA"][1:] == "ACGTRYKMswbdhvN-"
+    assert f.runs("chrA", "gap").tolist() == [[14, 16]]
+    counts = f.base_counts().loc["chrA"]
+    assert (counts["AT"], counts["GC"], counts["N"]) == (3, 3, 10)
+    m80.delete("Fasta", "iupac")
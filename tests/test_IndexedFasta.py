@@ -0,0 +1,156 @@
+"""
+    Tests
+"""
+import pytest
+import numpy as np
+import locuspocus as lp
+
+from locuspocus.faidx import build_fai, read_fai
+
+
+SEQS = {
+    "chr1": "ACGTNacgtn" * 7 + "ACG",
+    "chr2": "TTTTT",
+    "chr3": "GATTACA" * 3,
+}
+
+
+@pytest.fixture
+def fasta_file(tmp_path):
+    fasta_file = tmp_path / "indexed.fa"
+    with open(fasta_file, "w") as OUT:
+        for name, seq in SEQS.items():
+            print(f">{name} some description", file=OUT)
+            for i in range(0, len(seq), 10):
+                print(seq[i : i + 10], file=OUT)
+    return str(fasta_file)
+
+
+def test_build_fai(fasta_file):
+    records = build_fai(fasta_file)
+    assert [r.name for r in records] == list(SEQS)
+    assert [r.length for r in records] == [len(x) for x in SEQS.values()]
+    assert records[0].offset == len(">chr1 some description\n")
+    assert records[0].linebases == 10
+    assert records[0].linewidth == 11
+
+
+def test_fai_written(fasta_file):
+    lp.Fasta.from_indexed_file(fasta_file)
+    assert read_fai(fasta_file + ".fai") == build_fai(fasta_file)
+
+
+def test_slices_match_sequence(fasta_file):
+    f = lp.Fasta.from_indexed_file(fasta_file)
+    for name, seq in SEQS.items():
+        chrom = f[name]
+        assert len(chrom) == len(seq)
+        assert chrom[1:] == seq
+        for start, end in [(1, 1), (5, 15), (10, 11), (11, 20), (3, len(seq))]:
+            assert chrom[start:end] == seq[start - 1 : end]
+        assert chrom[len(seq)] == seq[-1]
+
+
+def test_equal_to_imported(fasta_file):
+    f = lp.Fasta.from_indexed_file(fasta_file)
+    assert f["chr1"] == lp.Chromosome("chr1", SEQS["chr1"])
+    assert np.array_equal(
+        np.asarray(f["chr3"].seq), lp.Chromosome("x", SEQS["chr3"]).seq
+    )
+
+
+def test_fetch_array(fasta_file):
+    f = lp.Fasta.from_indexed_file(fasta_file)
+    assert np.array_equal(
+        f["chr1"].fetch(3, 12, output="array"),
+        lp.Chromosome("x", SEQS["chr1"][2:12]).seq,
+    )
+
+
+def test_contains_and_len(fasta_file):
+    f = lp.Fasta.from_indexed_file(fasta_file)
+    assert "chr2" in f
+    assert "chr4" not in f
+    assert len(f) == 3
+    assert list(f.chrom_names()) == list(SEQS)
+
+
+def test_missing_chrom(fasta_file):
+    f = lp.Fasta.from_indexed_file(fasta_file)
+    with pytest.raises(ValueError):
+        f["chr4"]
+
+
+def test_crlf_line_endings(tmp_path):
+    fasta_file = tmp_path / "crlf.fa"
+    fasta_file.write_bytes(b">chrA\r\nACGT\r\nTT\r\n")
+    f = lp.Fasta.from_indexed_file(str(fasta_file))
+    assert f["chrA"][1:] == "ACGTTT"
+    assert f["chrA"][4:5] == "TT"
+
+
+def test_uneven_lines(tmp_path):
+    fasta_file = tmp_path / "uneven.fa"
+    fasta_file.write_text(">chrA\nACGT\nAC\nACGT\n")
+    with pytest.raises(ValueError):
+        lp.Fasta.from_indexed_file(str(fasta_file))
+
+
+# Large enough to span several 64 KiB BGZF blocks
+BIG_SEQS = {
+    "chrA": "".join(np.random.default_rng(1).choice(list("ACGTNacgt"), 200000)),
+    "chrB": "GATTACA" * 20000,
+}
+
+
+@pytest.fixture
+def bgzf_file(tmp_path):
+    from locuspocus.bgzf import BgzfWriter
+
+    bgzf_file = tmp_path / "indexed.fa.gz"
+    with BgzfWriter(bgzf_file) as OUT:
+        for name, seq in BIG_SEQS.items():
+            OUT.write(f">{name}\n".encode())
+            for i in range(0, len(seq), 60):
+                OUT.write(f"{seq[i : i + 60]}\n".encode())
+    return str(bgzf_file)
+
+
+def test_bgzf_slices(bgzf_file):
+    f = lp.Fasta.from_indexed_file(bgzf_file)
+    for name, seq in BIG_SEQS.items():
+        chrom = f[name]
+        assert len(chrom) == len(seq)
+        for start, end in [(1, 10), (65000, 67000), (1, len(seq)), (len(seq), None)]:
+            assert chrom[start:end] == seq[start - 1 : end]
+
+
+def test_bgzf_gzi_written(bgzf_file):
+    import gzip
+    from locuspocus.bgzf import read_gzi, build_gzi
+
+    lp.Fasta.from_indexed_file(bgzf_file)
+    index = read_gzi(bgzf_file + ".gzi")
+    assert np.array_equal(index, build_gzi(bgzf_file))
+    assert len(index) > 2
+    # The file is still readable as plain gzip
+    with gzip.open(bgzf_file, "rt") as IN:
+        assert IN.readline() == ">chrA\n"
+
+
+def test_bgzf_block_cache(bgzf_file):
+    f = lp.Fasta.from_indexed_file(bgzf_file, cache_blocks=2)
+    chrom = f["chrA"]
+    chrom[1:200000]
+    assert len(f._bgzf._cache) == 2
+    assert chrom[100:110] == BIG_SEQS["chrA"][99:110]
+
+
+def test_plain_gzip_is_rejected(tmp_path):
+    import gzip
+
+    fasta_file = tmp_path / "plain.fa.gz"
+    with gzip.open(fasta_file, "wt") as OUT:
+        print(">chrA\nACGT", file=OUT)
+    with pytest.raises(ValueError):
+        lp.Fasta.from_indexed_file(str(fasta_file))
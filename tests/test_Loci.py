@@ -366,3 +366,244 @@ def test_import_gff_gzipped():
     x = Loci("ZmSmall")
     x.import_gff(gff)
     m80.delete("Loci", "ZmSmall")
+
+
+def test_set_attr_dict(smallLoci):
+    n = smallLoci.set_attr("pval", {"GRMZM2G354611": 0.01, "GRMZM2G100965": 0.5})
+    assert n == 2
+    assert float(smallLoci["GRMZM2G354611"]["pval"]) == 0.01
+    assert float(smallLoci["GRMZM2G100965"]["pval"]) == 0.5
+
+
+def test_set_attr_arrays(smallLoci):
+    import numpy as np
+
+    names = np.array(["GRMZM2G354611", "GRMZM5G833275"])
+    vals = np.array([1, 2])
+    smallLoci.set_attr("rank", vals, loci=names)
+    assert smallLoci["GRMZM5G833275"]["rank"] == "2"
+
+
+def test_set_attr_by_LID_replaces(smallLoci):
+    LID = smallLoci._get_LID("GRMZM2G100979")
+    smallLoci.set_attr("expr", {LID: "low"})
+    smallLoci.set_attr("expr", {LID: "high"})
+    assert smallLoci["GRMZM2G100979"]["expr"] == "high"
+
+
+def test_set_attr_series(smallLoci):
+    pd = pytest.importorskip("pandas")
+    s = pd.Series({"GRMZM2G310569": 3.5})
+    smallLoci.set_attr("score2", s)
+    assert float(smallLoci["GRMZM2G310569"]["score2"]) == 3.5
+
+
+def test_set_attr_subloci(smallLoci):
+    smallLoci.set_attr("tag", {"GRMZM2G100965_T01": "mrna"}, sublocus=True)
+    (mrna,) = smallLoci["GRMZM2G100965"].subloci
+    assert mrna["tag"] == "mrna"
+
+
+def test_set_attr_missing(smallLoci):
+    with pytest.raises(MissingLocusError):
+        smallLoci.set_attr("pval", {"DoesNotExist": 1})
+
+
+def test_set_attr_length_mismatch(smallLoci):
+    with pytest.raises(ValueError):
+        smallLoci.set_attr("pval", [1, 2], loci=["GRMZM2G354611"])
+
+
+def test_lookup_cache(smallLoci):
+    cached = Loci("smallLoci", lookup_cache=True)
+    assert "GRMZM2G354611" in cached
+    assert "DoesNotExist" not in cached
+    assert cached["GRMZM2G354611"] == smallLoci["GRMZM2G354611"]
+    assert cached._get_LID(smallLoci["GRMZM2G100965"]) == smallLoci._get_LID(
+        "GRMZM2G100965"
+    )
+
+
+def test_lookup_cache_write_through():
+    if m80.exists("Loci", "empty"):
+        m80.delete("Loci", "empty")
+    empty = Loci("empty", lookup_cache=True)
+    assert "foo" not in empty
+    x = Locus("1", 1, 100, name="foo")
+    LID = empty.add_locus(x)
+    assert empty._get_LID("foo") == LID
+    assert empty._get_LID(x) == LID
+    m80.delete("Loci", "empty")
+
+
+def test_lookup_cache_rollback():
+    if m80.exists("Loci", "empty"):
+        m80.delete("Loci", "empty")
+    empty = Loci("empty", lookup_cache=True)
+    assert "PHANTOM" not in empty
+    with pytest.raises(RuntimeError):
+        with empty.m80.db.bulk_transaction() as cur:
+            empty.add_locus(Locus("1", 1, 100, name="PHANTOM"), cur=cur)
+            # Visible within the transaction
+            assert "PHANTOM" in empty
+            raise RuntimeError("roll back")
+    assert "PHANTOM" not in empty
+    assert len(empty._LIDs) == 0
+    m80.delete("Loci", "empty")
+
+
+def test_lookup_cache_commit():
+    if m80.exists("Loci", "empty"):
+        m80.delete("Loci", "empty")
+    empty = Loci("empty", lookup_cache=True)
+    assert "foo" not in empty
+    with empty.m80.db.bulk_transaction() as cur:
+        LIDs = [
+            empty.add_locus(Locus("1", i, i + 10, name=f"foo{i}"), cur=cur)
+            for i in range(1, 4)
+        ]
+    assert [empty._get_LID(f"foo{i}") for i in range(1, 4)] == LIDs
+    assert empty["foo2"].start == 2
+    assert empty._pending == []
+    m80.delete("Loci", "empty")
+
+
+def test_LIDs_cache_invalidated_on_add():
+    if m80.exists("Loci", "empty"):
+        m80.delete("Loci", "empty")
+    empty = Loci("empty")
+    assert len(empty._LIDs) == 0
+    LID = empty.add_locus(Locus("1", 1, 100, name="foo"))
+    assert empty._LIDs == [LID]
+    m80.delete("Loci", "empty")
+
+
+def test_cache_invalidated_by_write(smallLoci):
+    version = smallLoci._version("name_LIDs")
+    smallLoci._bump_generation()
+    assert smallLoci._version("name_LIDs") != version
+
+
+def test_attr_write_keeps_lookup_cache(smallLoci):
+    cached = Loci("smallLoci", lookup_cache=True)
+    name_LIDs = cached._name_LIDs
+    columns = cached._columns
+    cached["GRMZM2G354611"].attrs["foo"] = "bar"
+    cached.set_attr("foo", {"GRMZM2G354611": "baz"})
+    assert cached._name_LIDs is name_LIDs
+    assert cached._columns is columns
+    assert cached["GRMZM2G354611"].attrs["foo"] == "baz"
+
+
+def test_cache_invalidated_by_other_connection():
+    if m80.exists("Loci", "empty"):
+        m80.delete("Loci", "empty")
+    cached = Loci("empty", lookup_cache=True)
+    assert "other_connection" not in cached
+    # Write through a different object (i.e. database connection)
+    other = Loci("empty")
+    other.add_locus(Locus("9", 1, 10, name="other_connection"))
+    cached.refresh()
+    assert "other_connection" in cached
+    m80.delete("Loci", "empty")
+
+
+def test_other_connection_checked_per_interval():
+    if m80.exists("Loci", "empty"):
+        m80.delete("Loci", "empty")
+    cached = Loci("empty", lookup_cache=True, refresh_interval=3600)
+    assert "other_connection" not in cached
+    other = Loci("empty")
+    other.add_locus(Locus("9", 1, 10, name="other_connection"))
+    # Not checked again within the interval
+    assert "other_connection" not in cached
+    cached.refresh_interval = 0
+    assert "other_connection" in cached
+    m80.delete("Loci", "empty")
+
+
+def test_rand_seed(smallLoci):
+    a = [x._LID for x in smallLoci.rand(3, seed=42)]
+    b = [x._LID for x in smallLoci.rand(3, seed=42)]
+    assert a == b
+
+
+def test_rand_with_replacement(smallLoci):
+    loci = smallLoci.rand(20, distinct=False, seed=1)
+    assert len(loci) == 20
+    assert len(set(x._LID for x in loci)) <= len(smallLoci)
+
+
+def test_rand_chromosome_filter(smallLoci):
+    assert len(smallLoci.rand(5, chromosome="9")) == 5
+    with pytest.raises(ValueError):
+        smallLoci.rand(1, chromosome="1")
+
+
+def test_rand_length_filter(smallLoci):
+    for x in smallLoci.rand(2, min_length=500, max_length=1500, autopop=False):
+        assert 500 <= len(x) <= 1500
+    with pytest.raises(ValueError):
+        smallLoci.rand(3, min_length=500, max_length=1500)
+
+
+def test_rand_feature_type_filter(smallLoci):
+    assert smallLoci.rand(feature_type="gene").feature_type == "gene"
+    with pytest.raises(ValueError):
+        smallLoci.rand(feature_type="mRNA")
+
+
+def test_rand_attrs_filter(smallLoci):
+    x = smallLoci.rand(attrs={"Name": "GRMZM2G100965"})
+    assert x.name == "GRMZM2G100965"
+
+
+def test_rand_sparse_LIDs(smallLoci):
+    # Filter out the short genes in the middle so the LIDs are not contiguous
+    loci = smallLoci.rand(3, seed=3, min_length=1000)
+    assert len(set(x._LID for x in loci)) == 3
+    loci = smallLoci.rand(10, distinct=False, seed=3, min_length=1000)
+    assert len(loci) == 10
+    assert all(len(x) >= 1000 for x in loci)
+
+
+def test_rand_sets_shape(smallLoci):
+    sets = smallLoci.rand_sets(100, 3, seed=1)
+    assert sets.shape == (100, 3)
+    # loci are distinct within a set
+    assert all(len(set(row)) == 3 for row in sets)
+
+
+def test_rand_sets_size_keyword(smallLoci):
+    sets = smallLoci.rand_sets(5, size=2, seed=1)
+    assert sets.shape == (5, 2)
+    assert (sets == smallLoci.rand_sets(5, 2, seed=1)).all()
+
+
+def test_rand_sets_all_loci(smallLoci):
+    sets = smallLoci.rand_sets(10, len(smallLoci), seed=1)
+    assert all(set(row) == set(smallLoci._LIDs) for row in sets)
+
+
+def test_rand_sets_match_chromosome(smallLoci):
+    query = ["GRMZM2G354611", "GRMZM2G100965"]
+    sets = smallLoci.rand_sets(50, query=query, match="chromosome", seed=2)
+    assert sets.shape == (50, 2)
+
+
+def test_rand_sets_match_length(smallLoci):
+    query = [smallLoci["GRMZM2G310569"]]
+    longest = smallLoci._get_LID("GRMZM2G310569")
+    sets = smallLoci.rand_sets(20, query=query, match="length", length_bins=5)
+    # The query locus is the only one in its length bin
+    assert (sets == longest).all()
+
+
+def test_rand_sets_requires_query_to_match(smallLoci):
+    with pytest.raises(ValueError):
+        smallLoci.rand_sets(10, 2, match="length")
+
+
+def test_rand_sets_too_large(smallLoci):
+    with pytest.raises(ValueError):
+        smallLoci.rand_sets(10, len(smallLoci) + 1)
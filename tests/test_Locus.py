@@ -83,6 +83,19 @@ def test_downstream_minus_strand(simple_Locus):
     assert l.downstream(50) == 50
 
 
+def test_downstream_minus_strand_past_start():
+    l = Locus("1", 100, 200, strand="-")
+    assert l.downstream(150) == 0
+
+
+def test_upstream_downstream_chrom_length():
+    plus = Locus("1", 100, 200, strand="+")
+    minus = Locus("1", 100, 200, strand="-")
+    assert plus.downstream(50, chrom_length=220) == 220
+    assert plus.downstream(50, chrom_length=1000) == 250
+    assert minus.upstream(50, chrom_length=220) == 220
+
+
 def test_center():
     l = Locus("1", 100, 200, strand="-")
     assert l.center == 150.5
@@ -0,0 +1,99 @@
+"""
+    Tests
+"""
+import re
+import pytest
+import numpy as np
+
+from itertools import product
+
+from locuspocus.codec import encode
+from locuspocus.motifs import kmer_counts, kmer_labels, find_motif
+
+SEQ = "".join(np.random.default_rng(7).choice(list("ACGTNacgtn"), 5000))
+
+
+def _revcomp(seq):
+    return seq[::-1].translate(str.maketrans("ACGTNacgtn", "TGCANtgcan"))
+
+
+def _naive_kmers(seq, k):
+    seq = seq.upper()
+    counts = dict.fromkeys(("".join(x) for x in product("ACGT", repeat=k)), 0)
+    for i in range(len(seq) - k + 1):
+        if seq[i : i + k] in counts:
+            counts[seq[i : i + k]] += 1
+    return np.array(list(counts.values()))
+
+
+@pytest.mark.parametrize("k", [1, 3, 5])
+def test_kmer_counts(k):
+    assert np.array_equal(kmer_counts(encode(SEQ), k), _naive_kmers(SEQ, k))
+
+
+def test_kmer_counts_chunks():
+    # Windows spanning chunk boundaries are counted once
+    assert np.array_equal(
+        kmer_counts(encode(SEQ), 4, chunk_size=37), _naive_kmers(SEQ, 4)
+    )
+
+
+def test_kmer_counts_canonical():
+    k = 3
+    counts = dict(zip(kmer_labels(k), _naive_kmers(SEQ, k)))
+    canonical = dict(zip(kmer_labels(k), kmer_counts(encode(SEQ), k, canonical=True)))
+    for kmer, count in canonical.items():
+        rc = _revcomp(kmer)
+        if kmer < rc:
+            assert count == counts[kmer] + counts[rc]
+        elif kmer == rc:
+            assert count == counts[kmer]
+        else:
+            assert count == 0
+
+
+def test_kmer_counts_bad_k():
+    with pytest.raises(ValueError):
+        kmer_counts(encode(SEQ), 0)
+    with pytest.raises(ValueError):
+        kmer_counts(encode(SEQ), 13)
+
+
+def test_kmer_counts_short_sequence():
+    assert kmer_counts(encode("AC"), 3).sum() == 0
+
+
+def _naive_motif(seq, pattern):
+    seq = seq.upper()
+    return [m.start() for m in re.finditer(f"(?=({pattern}))", seq)]
+
+
+def test_find_motif_exact():
+    starts, strands = find_motif(encode(SEQ), "ACG", strand="+")
+    assert starts.tolist() == _naive_motif(SEQ, "ACG")
+    assert set(strands) == {"+"}
+
+
+def test_find_motif_iupac_both_strands():
+    starts, strands = find_motif(encode(SEQ), "RCW", chunk_size=101)
+    plus = _naive_motif(SEQ, "[AG]C[AT]")
+    minus = _naive_motif(SEQ, "[AT]G[CT]")
+    assert starts[strands == "+"].tolist() == plus
+    assert starts[strands == "-"].tolist() == minus
+    assert np.all(np.diff(starts) >= 0)
+
+
+def test_find_motif_n_never_matches():
+    starts, _ = find_motif(encode("ANGNNN"), "NN")
+    assert len(starts) == 0
+    starts, strands = find_motif(encode("acgt"), "ACGT")
+    # A palindrome hits both strands
+    assert starts.tolist() == [0, 0]
+    assert strands.tolist() == ["+", "-"]
+
+
+def test_find_motif_invalid():
+    with pytest.raises(ValueError):
+        find_motif(encode(SEQ), "AXG")
+    with pytest.raises(ValueError):
+        find_motif(encode(SEQ), "ACG", strand="+-")
@@ -25,6 +25,14 @@ def test_iter(testOnt):
 def test_access_loci(testOnt):
     assert isinstance(testOnt.loci, lp.Loci)
 
+def test_loci_lookup_cache_is_opt_in():
+    try:
+        x = lp.Ontology("empty")
+        assert not x.loci.lookup_cache
+        assert lp.Ontology("empty", lookup_cache=True).loci.lookup_cache
+    finally:
+        m80.delete("Ontology","empty")
+
 def test_add_term():
     try:
         x = lp.Ontology("empty")
@@ -0,0 +1,123 @@
+"""
+    Tests
+"""
+import os
+import pickle
+import pytest
+import numpy as np
+import locuspocus as lp
+import minus80 as m80
+
+from concurrent.futures import ProcessPoolExecutor
+
+
+@pytest.fixture(scope="module")
+def shared_source():
+    m80.delete("Fasta", "shared_source")
+    f = lp.Fasta("shared_source")
+    f.add_chrom(lp.Chromosome("chr1", "ACGTNacgtn" * 100, "attr1"))
+    f.add_chrom(lp.Chromosome("chr2", "GATTACA" * 50), encoding="2bit")
+    f._add_nickname("chr2", "second")
+    yield f
+    m80.delete("Fasta", "shared_source")
+
+
+def _read(args):
+    shared, name, start, end = args
+    return shared[name][start:end]
+
+
+def test_shared_matches_fasta(shared_source):
+    with lp.SharedFasta.from_fasta(shared_source) as shared:
+        assert len(shared) == 2
+        assert list(shared.chrom_names()) == ["chr1", "chr2"]
+        assert shared.lengths() == shared_source.lengths()
+        for chrom in shared_source:
+            assert shared[chrom.name] == chrom
+        assert shared["chr1"]._attrs == ["attr1"]
+        assert "second" in shared
+        assert shared["2"][1:7] == "GATTACA"
+
+
+def test_shared_views_are_read_only(shared_source):
+    with lp.SharedFasta.from_fasta(shared_source) as shared:
+        seq = shared["chr1"].seq
+        assert isinstance(seq, np.memmap)
+        with pytest.raises(ValueError):
+            seq[0] = 1
+
+
+def test_attach_by_name(shared_source, tmp_path):
+    with lp.SharedFasta.from_fasta(
+        shared_source, name="attach_me", directory=str(tmp_path)
+    ) as shared:
+        other = lp.SharedFasta.attach("attach_me", directory=str(tmp_path))
+        assert other["chr2"] == shared["chr2"]
+        other.close()
+        # Only the owner removes the shared copy
+        assert os.path.exists(shared.path)
+        with pytest.raises(ValueError):
+            lp.SharedFasta.from_fasta(
+                shared_source, name="attach_me", directory=str(tmp_path)
+            )
+    assert not os.path.exists(shared.path)
+    with pytest.raises(ValueError):
+        lp.SharedFasta.attach("attach_me", directory=str(tmp_path))
+
+
+def test_owner_removes_when_collected(shared_source, tmp_path):
+    import gc
+
+    shared = lp.SharedFasta.from_fasta(shared_source, directory=str(tmp_path))
+    path = shared.path
+    seq = shared["chr1"].seq
+    del shared
+    gc.collect()
+    assert not os.path.exists(path)
+    # Views outlive the shared copy
+    assert len(seq) == 1000
+
+
+def test_owner_removes_at_exit(shared_source, tmp_path):
+    import subprocess
+    import sys
+
+    shared = lp.SharedFasta.from_fasta(shared_source, directory=str(tmp_path))
+    shared._finalizer.detach()
+    script = (
+        "import sys, locuspocus as lp\n"
+        # Still referenced when the interpreter exits
+        "x = lp.SharedFasta(sys.argv[1], owner=True)\n"
+    )
+    subprocess.run([sys.executable, "-c", script, shared.path], check=True)
+    assert not os.path.exists(shared.path)
+
+
+def test_pickle_attaches(shared_source):
+    with lp.SharedFasta.from_fasta(shared_source) as shared:
+        copy = pickle.loads(pickle.dumps(shared))
+        assert copy.path == shared.path
+        assert not copy._owner
+        assert len(pickle.dumps(shared)) < 1000
+
+
+def test_workers(shared_source):
+    with lp.SharedFasta.from_fasta(shared_source) as shared:
+        jobs = [(shared, "chr1", i, i + 9) for i in range(1, 100, 10)]
+        with ProcessPoolExecutor(2) as pool:
+            results = list(pool.map(_read, jobs))
+        assert results == [shared_source["chr1"][i : i + 9] for i in range(1, 100, 10)]
+
+
+def test_shared_extract(shared_source):
+    loci = [lp.Locus("chr1", 1, 5), lp.Locus("chr2", 2, 4, strand="-")]
+    with lp.SharedFasta.from_fasta(shared_source) as shared:
+        assert [x[1] for x in shared.extract(loci)] == [
+            x[1] for x in shared_source.extract(loci)
+        ]
+
+
+def test_missing_chrom(shared_source):
+    with lp.SharedFasta.from_fasta(shared_source) as shared:
+        with pytest.raises(ValueError):
+            shared["chr3"]